@@ -0,0 +1,362 @@
+"""
+Headless analysis for CI: scan -> parse -> graph -> cluster (plus the opt-in
+stages) on a path without starting the web server, then a snapshot, a
+compact summary and threshold checks.
+
+    python -m backend.cli analyze PATH [--summary summary.json] [--csv clusters.csv]
+                                       [--baseline SNAPSHOT_DIR | --no-baseline]
+                                       [--max-cycles N] [--max-new-cycles N]
+                                       [--max-coupling-growth F] [--max-cluster-coupling-growth N]
+    python -m backend.cli diff BASE HEAD [--limit 100] [--summary diff.json] [thresholds as above]
+
+The baseline is the repository's previous snapshot (or --baseline, e.g. one
+restored from the main branch's CI cache). Clustering is warm-started from it,
+so cluster ids line up and their coupling can be compared. A call cycle is
+new when its functions were not already all in one cycle of the baseline.
+diff compares two snapshots (see graph.diff.graph_diff), e.g. main's and a
+refactor branch's analysed under different --repo keys; analyse the branch
+with --baseline pointing at main's snapshot so that its clustering starts
+from main's and the reported migrations are changes rather than noise.
+
+Exit status: 0 all thresholds held, 1 a threshold was exceeded, 2 bad
+arguments, 3 the analysis failed, 130 interrupted.
+Imports are deferred until the arguments are parsed, and the stages only
+import what they use (networkx, sentence-transformers, faiss), so --help and
+argument errors return immediately.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+EXIT_OK = 0
+EXIT_THRESHOLD = 1
+EXIT_USAGE = 2
+EXIT_FAILED = 3
+EXIT_INTERRUPTED = 130
+
+CLUSTER_COLUMNS = ("id", "name", "size", "loc", "complexity_mean", "complexity_max", "fan_in", "fan_out",
+                   "cohesion", "afferent", "efferent", "instability", "risk", "risk_score")
+
+
+def log(message: str):
+    print(message, file=sys.stderr, flush=True)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m backend.cli", description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    analyze = commands.add_parser("analyze", help="analyse a source tree and check thresholds")
+    analyze.add_argument("path")
+    analyze.add_argument("--repo", help="key the snapshot is stored under (default: the absolute path)")
+    analyze.add_argument("--language", default="java", help='"java", "cpp", "python", a comma-separated mix or "auto"')
+    analyze.add_argument("--exclude", action="append", default=[], help="gitignore-style glob (repeatable)")
+    analyze.add_argument("--max-file-size", type=int, default=2 * 1024 * 1024)
+    analyze.add_argument("--no-gitignore", action="store_true")
+    analyze.add_argument("--git-index", action="store_true", help="list tracked files from the git index")
+    analyze.add_argument("--workers", type=int, help="parse worker processes (default: all cores)")
+    analyze.add_argument("--max-fanout", type=int, default=5)
+    analyze.add_argument("--cluster-backend", default="auto")
+    analyze.add_argument("--cluster-seed", type=int, default=0)
+    analyze.add_argument("--cluster-resolution", type=float, default=1.0)
+    analyze.add_argument("--history", action="store_true", help="mine the git history")
+    analyze.add_argument("--clones", action="store_true", help="detect near-duplicate functions")
+    analyze.add_argument("--embed", action="store_true", help="embed function bodies (sentence-transformers)")
+    analyze.add_argument("--cache-dir", help="parse cache and snapshots (default: CODE_ARC_CACHE_DIR)")
+    analyze.add_argument("--no-snapshot", action="store_true", help="do not write the result snapshot")
+
+    output = analyze.add_argument_group("output")
+    output.add_argument("--summary", default="-", help="JSON summary file (default: stdout)")
+    output.add_argument("--csv", help="per-cluster metrics as CSV")
+    output.add_argument("--quiet", action="store_true", help="no progress on stderr")
+    checks = add_thresholds(analyze)
+    baseline = checks.add_mutually_exclusive_group()
+    baseline.add_argument("--baseline", help="snapshot directory to compare with (default: the previous snapshot)")
+    baseline.add_argument("--no-baseline", action="store_true")
+
+    diff = commands.add_parser("diff", help="compare two snapshots (e.g. main and a branch)")
+    diff.add_argument("base", help="snapshot directory, or the repo key / path of a snapshot in the cache")
+    diff.add_argument("head", help="same, for the changed version")
+    diff.add_argument("--cache-dir", help="where repo keys are looked up (default: CODE_ARC_CACHE_DIR)")
+    diff.add_argument("--limit", type=int, default=100, help="entries per list in the report")
+    diff.add_argument("--summary", default="-", help="JSON report file (default: stdout)")
+    diff.add_argument("--quiet", action="store_true", help="no result line on stderr")
+    add_thresholds(diff)
+    return parser
+
+
+def add_thresholds(command: argparse.ArgumentParser):
+    checks = command.add_argument_group("thresholds (exit status 1 when exceeded)")
+    checks.add_argument("--max-cycles", type=int, help="call cycles of two or more functions")
+    checks.add_argument("--max-new-cycles", type=int, help="cycles not present in the baseline")
+    checks.add_argument("--max-coupling-growth", type=float,
+                        help="growth of the share of call weight crossing clusters, e.g. 0.02")
+    checks.add_argument("--max-cluster-coupling-growth", type=int,
+                        help="growth of any cluster's afferent + efferent cluster count")
+    return checks
+
+
+def analysis_params(args) -> dict:
+    """The /analyze parameters (see main.AnalysisRequest) for the arguments."""
+    return {
+        "path": os.path.abspath(args.path),
+        "language": args.language,
+        "exclude": args.exclude,
+        "max_file_size": args.max_file_size,
+        "use_gitignore": not args.no_gitignore,
+        "git_index": args.git_index,
+        "workers": args.workers,
+        "max_fanout": args.max_fanout,
+        "cluster_backend": args.cluster_backend,
+        "cluster_seed": args.cluster_seed,
+        "cluster_resolution": args.cluster_resolution,
+        "history": args.history,
+        "clones": args.clones,
+        "embed": args.embed,
+        "snapshot": not args.no_snapshot,
+    }
+
+
+def validate(parser: argparse.ArgumentParser, args):
+    from .parsing import PARSERS
+    from .clustering.backends import BACKENDS
+
+    if not os.path.isdir(args.path):
+        parser.error(f"path does not exist: {args.path}")
+    languages = [name.strip() for name in args.language.lower().split(",")]
+    if args.language.lower() != "auto" and any(name not in PARSERS for name in languages):
+        parser.error(f"unsupported language: {args.language}")
+    if args.cluster_backend not in ("auto",) + tuple(BACKENDS):
+        parser.error(f"unknown cluster backend: {args.cluster_backend}")
+
+
+def load_baseline(args, repo: str):
+    """(directory, state) of the snapshot to compare with, or (None, None)."""
+    from .storage import load_snapshot, snapshot_dir
+
+    if args.no_baseline:
+        return None, None
+    directory = args.baseline or snapshot_dir(repo)
+    loaded = load_snapshot(directory)
+    if loaded is None:
+        if args.baseline:
+            log(f"No usable snapshot in {directory}; not comparing")
+        return None, None
+    return directory, loaded[1]
+
+
+def run(job_manager, repo: str, params: dict, quiet: bool):
+    """Runs the analysis job, reporting stage progress on stderr; returns the finished job."""
+    job = job_manager.submit(repo, params)
+    shown = None
+    try:
+        while not job.done.wait(1.0):
+            running = [(name, s) for name, s in job.stages.items() if s["status"] == "RUNNING"]
+            line = ", ".join(f"{name} {s['done']}" + (f"/{s['total']}" if s["total"] else "") for name, s in running)
+            if line and line != shown and not quiet:
+                log(line)
+                shown = line
+    except KeyboardInterrupt:
+        job.cancel()
+        job.done.wait()
+    return job
+
+
+def cycle_report(graph, diff=None):
+    """Call cycle counts of graph, with the cycles that are new since the baseline when diff is given."""
+    import numpy as np
+
+    labels = graph.cycles()
+    sizes = np.bincount(labels[labels >= 0], minlength=int(labels.max(initial=-1)) + 1)
+    report = {"count": len(sizes), "functions": int(sizes.sum()), "largest": int(sizes.max(initial=0))}
+    if diff is not None:
+        cycles = diff["cycles"]
+        report.update({"baseline_count": cycles["old_count"], "new": cycles["new"], "removed": cycles["removed"],
+                       "new_cycles": cycles["new_cycles"]})
+    return report
+
+
+def change_counts(diff) -> dict:
+    """The counts of a graph diff, without its lists."""
+    return {section: {k: v for k, v in diff[section].items() if not isinstance(v, list)}
+            for section in ("nodes", "links", "clusters")}
+
+
+def coupling_report(graph, clusters, baseline):
+    """Cross-cluster share of the call weight, and per-cluster coupling growth against the baseline."""
+    from .clustering.metrics import coupling_ratio
+
+    ratio = coupling_ratio(graph)
+    report = {"ratio": round(ratio, 4)}
+    if baseline is None:
+        return report
+    base_ratio = coupling_ratio(baseline["graph"])
+    coupled = lambda c: c["metrics"]["afferent"] + c["metrics"]["efferent"]
+    before = {c["id"]: coupled(c) for c in baseline["clusters"] if "metrics" in c}
+    growth = sorted(
+        ({"id": c["id"], "name": c.get("name"), "coupling": coupled(c), "growth": coupled(c) - before[c["id"]]}
+         for c in clusters if "metrics" in c and c["id"] in before),
+        key=lambda g: -g["growth"],
+    )
+    report.update({
+        "baseline_ratio": round(base_ratio, 4),
+        "growth": round(ratio - base_ratio, 4),
+        "max_cluster_growth": growth[0]["growth"] if growth else 0,
+        "clusters": [g for g in growth[:10] if g["growth"] > 0],
+    })
+    return report
+
+
+def check_thresholds(args, cycles, coupling):
+    """Human-readable violations; thresholds needing a baseline are skipped without one."""
+    violations = []
+    if args.max_cycles is not None and cycles["count"] > args.max_cycles:
+        violations.append(f"{cycles['count']} call cycles (max {args.max_cycles})")
+    if args.max_new_cycles is not None and cycles.get("new", 0) > args.max_new_cycles:
+        violations.append(f"{cycles['new']} new call cycles (max {args.max_new_cycles})")
+    if args.max_coupling_growth is not None and coupling.get("growth", 0) > args.max_coupling_growth:
+        violations.append(f"cross-cluster coupling grew by {coupling['growth']} (max {args.max_coupling_growth})")
+    if (args.max_cluster_coupling_growth is not None
+            and coupling.get("max_cluster_growth", 0) > args.max_cluster_coupling_growth):
+        violations.append(f"a cluster's coupling grew by {coupling['max_cluster_growth']} "
+                          f"(max {args.max_cluster_coupling_growth})")
+    return violations
+
+
+def write_csv(path: str, clusters):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CLUSTER_COLUMNS)
+        for cluster in clusters:
+            values = {**cluster.get("metrics", {}), **cluster}
+            writer.writerow([values.get(name, "") for name in CLUSTER_COLUMNS])
+
+
+def write_summary(path: str, summary: dict):
+    text = json.dumps(summary, indent=2)
+    if path == "-":
+        print(text, flush=True)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+def analyze(parser: argparse.ArgumentParser, args) -> int:
+    if args.cache_dir:
+        # Read by the parse cache, snippet store and snapshots as they are created
+        os.environ["CODE_ARC_CACHE_DIR"] = os.path.abspath(args.cache_dir)
+    validate(parser, args)
+    from .jobs import JobManager, run_analysis
+
+    params = analysis_params(args)
+    repo = args.repo or params["path"]
+    baseline_dir, baseline = load_baseline(args, repo)
+
+    started = time.perf_counter()
+    jobs = JobManager(run_analysis, max_workers=1)
+    if baseline is not None:
+        # Only the graph: enough to warm-start clustering, while everything else is rebuilt
+        jobs.restore(repo, {"path": params["path"], "graph": baseline["graph"]})
+    job = run(jobs, repo, params, args.quiet)
+    jobs.shutdown()
+    if job.status == "CANCELLED":
+        log("Interrupted")
+        return EXIT_INTERRUPTED
+    if job.status != "COMPLETED":
+        log(f"Analysis failed: {job.error}")
+        return EXIT_FAILED
+
+    state = jobs.repo_state(repo)
+    diff = None
+    if baseline is not None:
+        from .graph.diff import graph_diff
+        diff = graph_diff(baseline["graph"], state["graph"], baseline["clusters"], state["clusters"], limit=20)
+    cycles = cycle_report(state["graph"], diff)
+    coupling = coupling_report(state["graph"], state["clusters"], baseline)
+    violations = check_thresholds(args, cycles, coupling)
+    summary = {
+        "repo": repo,
+        "path": params["path"],
+        "status": "failed" if violations else "ok",
+        "violations": violations,
+        "snapshot": state.get("snapshot"),
+        "baseline": baseline_dir,
+        "seconds": round(time.perf_counter() - started, 3),
+        **state["summary"],
+        "cycles": cycles,
+        "coupling": coupling,
+        "changes": None if diff is None else change_counts(diff),
+        "history": None if state.get("history") is None else {
+            k: state["history"].get(k) for k in ("head", "commits", "new_commits")},
+        "clones": None if state.get("clones") is None else len(state["clones"]["pairs"]),
+        "stages": job.trace.to_dict()["stages"],
+    }
+
+    write_summary(args.summary, summary)
+    if args.csv:
+        write_csv(args.csv, state["clusters"])
+    if not args.quiet:
+        log(f"{summary['node_count']} functions, {summary['edge_count']} calls, {summary['cluster_count']} clusters, "
+            f"{cycles['count']} cycles in {summary['seconds']}s")
+        for violation in violations:
+            log(f"FAILED: {violation}")
+    return EXIT_THRESHOLD if violations else EXIT_OK
+
+
+def load_side(parser: argparse.ArgumentParser, which: str):
+    """A diff argument as (snapshot directory, state): a directory, or a repo key or path in the cache."""
+    from .storage import load_snapshot, snapshot_dir
+
+    for directory in (which, snapshot_dir(which), snapshot_dir(os.path.abspath(which))):
+        loaded = load_snapshot(directory) if os.path.isdir(directory) else None
+        if loaded is not None:
+            return directory, loaded[1]
+    parser.error(f"no snapshot for {which}")
+
+
+def diff(parser: argparse.ArgumentParser, args) -> int:
+    if args.cache_dir:
+        os.environ["CODE_ARC_CACHE_DIR"] = os.path.abspath(args.cache_dir)
+    from .graph.diff import graph_diff
+
+    base_dir, base = load_side(parser, args.base)
+    head_dir, head = load_side(parser, args.head)
+    started = time.perf_counter()
+    report = graph_diff(base["graph"], head["graph"], base["clusters"], head["clusters"], limit=args.limit)
+    seconds = round(time.perf_counter() - started, 3)
+    cycles = cycle_report(head["graph"], report)
+    coupling = coupling_report(head["graph"], head["clusters"], base)
+    violations = check_thresholds(args, cycles, coupling)
+    write_summary(args.summary, {
+        "base": base_dir,
+        "head": head_dir,
+        "status": "failed" if violations else "ok",
+        "violations": violations,
+        "seconds": seconds,
+        **report,
+        "coupling": coupling,
+    })
+    if not args.quiet:
+        nodes, links, cycles = report["nodes"], report["links"], report["cycles"]
+        log(f"+{nodes['added']}/-{nodes['removed']} functions, +{links['added']}/-{links['removed']} calls, "
+            f"{report['clusters']['migrated']} migrated, +{cycles['new']}/-{cycles['removed']} cycles in {seconds}s")
+        for violation in violations:
+            log(f"FAILED: {violation}")
+    return EXIT_THRESHOLD if violations else EXIT_OK
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "analyze":
+        return analyze(parser, args)
+    if args.command == "diff":
+        return diff(parser, args)
+    return EXIT_USAGE
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+import os
+import zlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ..graph.compact import CompactGraph
+from ..parsing.languages import ParserRegistry
+
+# Leaves that stand for a value; all of them become one token
+LITERAL_TYPES = {"string", "number", "integer", "float", "true", "false", "null", "none", "char_literal",
+                 "concatenated_string", "raw_string_literal", "user_defined_literal", "nullptr"}
+IDENTIFIER_TOKEN = "$id"
+LITERAL_TOKEN = "$lit"
+
+_MASK = np.uint64(0xFFFFFFFF)
+_SHINGLE_MULT = np.uint64(0x100000001B3)
+
+# Each worker process owns its own tree-sitter parsers
+_WORKER_PARSER = None
+
+
+def _init_worker():
+    global _WORKER_PARSER
+    _WORKER_PARSER = ParserRegistry()
+
+
+def normalized_tokens(node) -> List[str]:
+    """
+    The token stream of a syntax subtree with names and values abstracted:
+    identifiers become "$id", literals "$lit", comments are dropped and every
+    other leaf (keywords, operators, punctuation) is kept as its node type.
+    Renaming variables or changing constants therefore leaves it unchanged.
+    """
+    tokens = []
+    cursor = node.walk()
+    while True:
+        current = cursor.node
+        kind = current.type
+        descend = False
+        if "comment" in kind:
+            pass
+        elif kind.endswith("literal") or kind in LITERAL_TYPES:
+            tokens.append(LITERAL_TOKEN)
+        elif current.child_count:
+            descend = True
+        elif current.is_named and "identifier" in kind:
+            tokens.append(IDENTIFIER_TOKEN)
+        else:
+            tokens.append(kind)
+        if descend and cursor.goto_first_child():
+            continue
+        while not cursor.goto_next_sibling():
+            if not cursor.goto_parent():
+                return tokens
+
+
+class MinHasher:
+    """
+    MinHash signatures of token k-gram (shingle) sets: num_perm universal
+    hash functions ((a * x + b) >> 32 over 64-bit shingle hashes), the
+    minimum of each over the set. The share of equal positions in two
+    signatures estimates the Jaccard similarity of the two sets.
+    """
+
+    def __init__(self, num_perm: int = 64, shingle: int = 5, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle = shingle
+        self.a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+        self._ids: Dict[str, int] = {}
+
+    def _token_ids(self, tokens: Sequence[str]) -> np.ndarray:
+        ids = self._ids
+        out = np.empty(len(tokens), dtype=np.uint64)
+        for k, token in enumerate(tokens):
+            value = ids.get(token)
+            if value is None:
+                value = ids[token] = zlib.crc32(token.encode("utf-8")) + 1
+            out[k] = value
+        return out
+
+    def signature(self, tokens: Sequence[str]) -> np.ndarray:
+        ids = self._token_ids(tokens)
+        count = max(1, len(ids) - self.shingle + 1)
+        shingles = np.zeros(count, dtype=np.uint64)
+        for j in range(min(self.shingle, len(ids))):
+            shingles = shingles * _SHINGLE_MULT + ids[j:j + count]
+        shingles = np.unique(shingles)
+        hashed = (self.a[:, None] * shingles[None, :] + self.b[:, None]) >> np.uint64(32)
+        return (hashed.min(axis=1) & _MASK).astype(np.uint32)
+
+
+def _file_signatures(path: str, ranges: Sequence[Tuple[int, int]], min_tokens: int,
+                     hasher: MinHasher, registry: ParserRegistry) -> List[Optional[np.ndarray]]:
+    """One signature per (start_byte, end_byte) function range; None when too short or unreadable."""
+    try:
+        with open(path, "rb") as f:
+            source = f.read()
+    except OSError:
+        return [None] * len(ranges)
+    tree = registry.parser_for(path).parser.parse(source)
+    out = []
+    for start, end in ranges:
+        node = tree.root_node.descendant_for_byte_range(start, end) if start >= 0 else None
+        tokens = normalized_tokens(node) if node is not None else []
+        out.append(hasher.signature(tokens) if len(tokens) >= min_tokens else None)
+    return out
+
+
+def _signature_batch(tasks, min_tokens: int, num_perm: int, shingle: int):
+    hasher = MinHasher(num_perm, shingle)
+    return [_file_signatures(path, ranges, min_tokens, hasher, _WORKER_PARSER) for path, ranges in tasks]
+
+
+class CloneDetector:
+    """
+    Near-duplicate functions of a graph in about linear time:
+    1. every function's token stream is normalised (see normalized_tokens)
+       and reduced to a MinHash signature, file by file on a process pool;
+    2. LSH banding: signatures are cut into bands of rows; functions equal
+       on a whole band land in one bucket, and only bucket neighbours are
+       compared (each member with the bucket's first and with its successor),
+       so no all-pairs comparison happens even for huge buckets;
+    3. candidate pairs whose estimated similarity reaches threshold are kept
+       and joined into clone groups (connected components).
+    Signatures are cached per file (by size and mtime) on the detector, so a
+    rerun after an edit only re-tokenises the changed files.
+    """
+
+    def __init__(self, threshold: float = 0.8, min_tokens: int = 50, num_perm: int = 64, bands: int = 16,
+                 shingle: int = 5, workers: Optional[int] = None, batch_size: int = 64):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.min_tokens = min_tokens
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle = shingle
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        # file -> ((size, mtime_ns), {start_byte: signature or None})
+        self._signatures: Dict[str, Tuple[tuple, Dict[int, Optional[np.ndarray]]]] = {}
+
+    def signatures(self, graph: CompactGraph) -> Tuple[np.ndarray, np.ndarray]:
+        """(node indices with a signature, their signatures as an (n, num_perm) uint32 matrix)."""
+        by_file: Dict[int, List[int]] = {}
+        for i, fi in enumerate(graph.file_idx.tolist()):
+            by_file.setdefault(fi, []).append(i)
+
+        stale = []
+        for fi, members in by_file.items():
+            path = graph.files[fi]
+            try:
+                st = os.stat(path)
+                stamp = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                stamp = None
+            cached = self._signatures.get(path)
+            wanted = {int(graph.start_byte[i]) for i in members}
+            if stamp is None or cached is None or cached[0] != stamp or not wanted <= cached[1].keys():
+                ranges = sorted({(int(graph.start_byte[i]), int(graph.end_byte[i])) for i in members})
+                stale.append((path, stamp, ranges))
+        for path in set(self._signatures) - set(graph.files):
+            del self._signatures[path]
+
+        tasks = [(path, ranges) for path, _, ranges in stale]
+        for (path, stamp, ranges), sigs in zip(stale, self._compute(tasks)):
+            self._signatures[path] = (stamp, {start: sig for (start, _), sig in zip(ranges, sigs)})
+
+        idx, rows = [], []
+        for fi, members in by_file.items():
+            cached = self._signatures[graph.files[fi]][1]
+            for i in members:
+                sig = cached.get(int(graph.start_byte[i]))
+                if sig is not None:
+                    idx.append(i)
+                    rows.append(sig)
+        matrix = np.vstack(rows) if rows else np.empty((0, self.num_perm), dtype=np.uint32)
+        return np.array(idx, dtype=np.int64), matrix
+
+    def _compute(self, tasks):
+        batches = [tasks[k:k + self.batch_size] for k in range(0, len(tasks), self.batch_size)]
+        if self.workers <= 1 or len(batches) <= 1:
+            _init_worker()
+            return [sigs for batch in batches
+                    for sigs in _signature_batch(batch, self.min_tokens, self.num_perm, self.shingle)]
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(batches)), initializer=_init_worker) as pool:
+            results = pool.map(_signature_batch, batches, [self.min_tokens] * len(batches),
+                               [self.num_perm] * len(batches), [self.shingle] * len(batches))
+            return [sigs for batch in results for sigs in batch]
+
+    def candidates(self, signatures: np.ndarray) -> np.ndarray:
+        """Candidate pairs (rows of signatures) from LSH banding, as a (m, 2) array with lo < hi."""
+        n = len(signatures)
+        rows = self.num_perm // self.bands
+        pairs = []
+        for band in range(self.bands):
+            block = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64)
+            key = np.zeros(n, dtype=np.uint64)
+            for column in range(rows):
+                key = key * _SHINGLE_MULT + block[:, column]
+            order = np.argsort(key, kind="stable")
+            same = key[order][1:] == key[order][:-1]
+            if not same.any():
+                continue
+            # Bucket of every sorted position: the index of its first member
+            starts = np.flatnonzero(np.r_[True, ~same])
+            head = np.repeat(starts, np.diff(np.r_[starts, n]))
+            follower = np.flatnonzero(np.r_[False, same])
+            pairs.append(np.stack((order[head[follower]], order[follower]), axis=1))  # with the first
+            pairs.append(np.stack((order[follower - 1], order[follower]), axis=1))    # with the previous
+        if not pairs:
+            return np.empty((0, 2), dtype=np.int64)
+        pairs = np.sort(np.concatenate(pairs), axis=1)
+        keys = np.unique(pairs[:, 0] * n + pairs[:, 1])
+        return np.stack((keys // n, keys % n), axis=1)
+
+    def detect(self, graph: CompactGraph) -> Dict[str, Any]:
+        """
+        Returns {"group": clone group per node (-1: none), "pairs": (m, 2)
+        node index pairs, "similarity": estimated Jaccard similarity per pair}.
+        """
+        idx, signatures = self.signatures(graph)
+        group = np.full(graph.number_of_nodes(), -1, dtype=np.int32)
+        candidates = self.candidates(signatures)
+        similarity = np.empty(len(candidates), dtype=np.float32)
+        for start in range(0, len(candidates), 1 << 20):
+            chunk = candidates[start:start + (1 << 20)]
+            similarity[start:start + len(chunk)] = (signatures[chunk[:, 0]] == signatures[chunk[:, 1]]).mean(axis=1)
+        keep = similarity >= self.threshold
+        pairs, similarity = idx[candidates[keep]], similarity[keep]
+
+        if len(pairs):
+            from scipy.sparse import coo_matrix
+            from scipy.sparse.csgraph import connected_components
+
+            n = graph.number_of_nodes()
+            adjacency = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(n, n))
+            _, labels = connected_components(adjacency, directed=False)
+            members = np.zeros(n, dtype=bool)
+            members[pairs.ravel()] = True
+            # Dense group ids, in order of each group's first node
+            _, dense = np.unique(labels[members], return_inverse=True)
+            group[members] = dense
+        return {"group": group, "pairs": pairs.astype(np.int32), "similarity": similarity}
+
+
+def clone_groups(graph: CompactGraph, clones: Dict[str, Any], node: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Clone groups for the API, largest duplicated volume (members x lines)
+    first; only the group of node if given.
+    """
+    group = clones["group"]
+    if node is not None:
+        i = graph.index.get(node)
+        if i is None or group[i] < 0:
+            return []
+        members = np.flatnonzero(group == group[i])
+    else:
+        members = np.flatnonzero(group >= 0)
+    members = members[np.argsort(group[members], kind="stable")]
+    gids, starts = np.unique(group[members], return_index=True)
+    pairs = clones["pairs"]
+    pair_group = group[pairs[:, 0]] if len(pairs) else np.empty(0, dtype=np.int32)
+    sim_sum = np.bincount(pair_group, weights=clones["similarity"], minlength=len(gids) and int(gids.max()) + 1)
+    sim_count = np.bincount(pair_group, minlength=len(sim_sum))
+
+    out = []
+    for gid, group_members in zip(gids.tolist(), np.split(members, starts[1:])):
+        out.append({
+            "id": gid,
+            "size": len(group_members),
+            "similarity": round(float(sim_sum[gid] / sim_count[gid]), 3) if sim_count[gid] else None,
+            "loc": int(graph.loc[group_members].sum()),
+            "files": len(np.unique(graph.file_idx[group_members])),
+            "members": [
+                {"id": graph.node_ids[i], "name": graph.names[i], "file": graph.file_of(i),
+                 "start_line": int(graph.start_line[i]), "end_line": int(graph.end_line[i])}
+                for i in group_members.tolist()
+            ],
+        })
+    out.sort(key=lambda g: (-g["size"] * g["loc"], g["id"]))
+    return out
@@ -0,0 +1,121 @@
+import numpy as np
+from typing import Callable, Dict, Optional
+
+# Every backend clusters an undirected weighted graph given as integer edge
+# arrays (u, v, w) over nodes 0..n-1 and returns one label per node.
+# init is an optional starting label per node (warm start); -1 = no label.
+
+
+def louvain(n: int, u: np.ndarray, v: np.ndarray, w: np.ndarray, seed: int = 0,
+            resolution: float = 1.0, init: Optional[np.ndarray] = None) -> np.ndarray:
+    """python-louvain (pure Python): the reference, fine up to tens of thousands of nodes."""
+    import networkx as nx
+    import community.community_louvain as community_louvain
+
+    graph = nx.Graph()
+    graph.add_nodes_from(range(n))
+    graph.add_weighted_edges_from(zip(u.tolist(), v.tolist(), w.tolist()))
+    partition = None
+    if init is not None:
+        partition = dict(enumerate(_fill_unlabelled(init).tolist()))
+    result = community_louvain.best_partition(graph, partition=partition, resolution=resolution,
+                                              random_state=seed)
+    return np.fromiter((result[i] for i in range(n)), dtype=np.int64, count=n)
+
+
+def leiden(n: int, u: np.ndarray, v: np.ndarray, w: np.ndarray, seed: int = 0,
+           resolution: float = 1.0, init: Optional[np.ndarray] = None) -> np.ndarray:
+    """Leiden (C++, needs the optional igraph and leidenalg packages)."""
+    import igraph
+    import leidenalg
+
+    graph = igraph.Graph(n=n, edges=np.column_stack([u, v]).tolist())
+    partition = leidenalg.find_partition(
+        graph, leidenalg.RBConfigurationVertexPartition,
+        weights=w.tolist(), resolution_parameter=resolution, seed=seed,
+        initial_membership=_fill_unlabelled(init).tolist() if init is not None else None,
+    )
+    return np.asarray(partition.membership, dtype=np.int64)
+
+
+def label_propagation(n: int, u: np.ndarray, v: np.ndarray, w: np.ndarray, seed: int = 0,
+                      resolution: float = 1.0, init: Optional[np.ndarray] = None,
+                      max_iter: int = 50, tol: float = 1e-3) -> np.ndarray:
+    """
+    Weighted label propagation, vectorised over the edge arrays: each round a
+    random 90% of the nodes (fully synchronous updates oscillate) take the
+    label with the largest summed edge weight among their neighbours. Ties
+    keep the current label, then go to the label with the higher seeded
+    random priority. Stops once fewer than tol * n nodes would still move.
+    Near-linear and dependency-free; resolution is not used.
+    """
+    rng = np.random.default_rng(seed)
+    labels = _fill_unlabelled(init) if init is not None else np.arange(n, dtype=np.int64)
+    src = np.concatenate([u, v]).astype(np.int64)
+    dst = np.concatenate([v, u]).astype(np.int64)
+    weight = np.concatenate([w, w]).astype(np.float64)
+    if src.size == 0:
+        return labels
+    span = int(labels.max()) + 1
+    # A fixed random priority per label: ties resolve the same way every round,
+    # so neighbourhoods agree on a label quickly instead of flip-flopping
+    priority = rng.random(span)
+
+    for _ in range(max_iter):
+        keys, inverse = np.unique(src * span + labels[dst], return_inverse=True)
+        scores = np.bincount(inverse, weights=weight)
+        node, label = keys // span, keys % span
+        # keys are sorted, so each node's candidate labels are contiguous: pick
+        # the best per group, nudging exact ties towards the current label, then at random
+        current = label == labels[node]
+        adjusted = scores * (1.0 + 1e-9 * (2.0 * current + priority[label]))
+        starts = np.flatnonzero(np.r_[True, node[1:] != node[:-1]])
+        best = np.maximum.reduceat(adjusted, starts)
+        winners = np.flatnonzero(adjusted == np.repeat(best, np.diff(np.r_[starts, len(keys)])))
+        winners = winners[np.r_[True, node[winners][1:] != node[winners][:-1]]]
+        best_node, best_label = node[winners], label[winners]
+
+        wants = best_label != labels[best_node]
+        if wants.sum() <= tol * n:
+            break
+        move = wants & (rng.random(len(best_node)) < 0.9)
+        labels[best_node[move]] = best_label[move]
+    return labels
+
+
+def _fill_unlabelled(init: np.ndarray) -> np.ndarray:
+    """Gives every node without a starting label (-1) a singleton label of its own."""
+    labels = np.asarray(init, dtype=np.int64).copy()
+    missing = labels < 0
+    start = int(labels.max()) + 1 if (~missing).any() else 0
+    labels[missing] = np.arange(start, start + int(missing.sum()))
+    return labels
+
+
+def _leiden_available() -> bool:
+    try:
+        import igraph  # noqa: F401
+        import leidenalg  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+BACKENDS: Dict[str, Callable[..., np.ndarray]] = {
+    "louvain": louvain,
+    "leiden": leiden,
+    "lpa": label_propagation,
+}
+
+# "auto": pure-Python Louvain stops being practical beyond this many nodes
+AUTO_LOUVAIN_MAX_NODES = 50000
+
+
+def resolve_backend(name: str, n: int) -> str:
+    if name == "auto":
+        if _leiden_available():
+            return "leiden"
+        return "louvain" if n <= AUTO_LOUVAIN_MAX_NODES else "lpa"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown clustering backend: {name}")
+    return name
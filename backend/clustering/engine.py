@@ -1,56 +1,303 @@
-import networkx as nx
-from typing import List, Dict, Any
-import community.community_louvain as community_louvain # python-louvain
+import numpy as np
+from typing import List, Dict, Any, Iterable, Optional, Sequence, Tuple
 
-class ClusteringEngine:
-    def __init__(self):
-        pass
+from ..graph.compact import CompactGraph
+from .backends import BACKENDS, resolve_backend
 
-    def cluster_graph(self, graph: nx.DiGraph) -> Dict[str, Any]:
+class ClusteringEngine:
+    def __init__(self, backend: str = "auto", seed: int = 0, resolution: float = 1.0, max_levels: int = 3):
         """
-        Groups nodes into clusters using Louvain Community Detection.
+        backend: "louvain" (python-louvain), "leiden" (needs igraph + leidenalg),
+            "lpa" (numpy label propagation) or "auto" (leiden if installed,
+            else louvain for small graphs and lpa for large ones).
+        seed: fixed so that the same graph always gets the same clusters.
+        max_levels: depth of the cluster hierarchy (1 = flat clusters only).
         """
-        # Louvain needs an undirected graph
-        undirected_g = graph.to_undirected()
-        
+        self.backend = backend
+        self.seed = seed
+        self.resolution = resolution
+        self.max_levels = max_levels
+        self.levels: List[Dict[str, Any]] = []  # hierarchy of the last cluster_graph call
+        self.used_backend: Optional[str] = None
+
+    def _adjacency(self, graph) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """Undirected integer edge arrays; no node metadata is copied."""
+        if isinstance(graph, CompactGraph):
+            u, v, w = graph.undirected_edges()
+            return graph.node_ids, u, v, w
+        node_ids = list(graph.nodes())
+        index = {node: i for i, node in enumerate(node_ids)}
+        weights: Dict[Tuple[int, int], float] = {}
+        for a, b, weight in graph.edges(data="weight", default=1.0):
+            i, j = index[a], index[b]
+            if i != j:
+                key = (min(i, j), max(i, j))
+                weights[key] = weights.get(key, 0.0) + weight
+        u = np.fromiter((k[0] for k in weights), dtype=np.int64, count=len(weights))
+        v = np.fromiter((k[1] for k in weights), dtype=np.int64, count=len(weights))
+        w = np.fromiter(weights.values(), dtype=np.float64, count=len(weights))
+        return node_ids, u, v, w
+
+    def _partition(self, n: int, u, v, w, resolution: float, init: Optional[np.ndarray] = None) -> np.ndarray:
+        name = resolve_backend(self.backend, n)
+        self.used_backend = name
         try:
-            partition = community_louvain.best_partition(undirected_g)
+            return BACKENDS[name](n, u, v, w, seed=self.seed, resolution=resolution, init=init)
+        except ImportError:
+            raise
         except Exception as e:
             print(f"Clustering fallback due to: {e}")
             # Fallback: All in one cluster if simple graph
-            partition = {node: 0 for node in graph.nodes()}
-
-        # Organize by cluster
-        clusters = {}
-        for node, cluster_id in partition.items():
-            if cluster_id not in clusters:
-                clusters[cluster_id] = []
-            clusters[cluster_id].append(node)
-
-        # Generate Metadata for clusters
-        # For MVP, we name them "Cluster X"
-        # In a real system, we'd use TF-IDF on code/names to label them.
-        
-        cluster_metadata = []
-        for cid, nodes in clusters.items():
-            cluster_metadata.append({
-                "id": str(cid),
-                "name": f"Cluster {cid}", # AI TODO: Generate name from node contents
-                "node_count": len(nodes),
-                "nodes": nodes,
-                "risk_score": "LOW" # Placeholder
-            })
-            
-        return cluster_metadata
-
-    def assign_clusters(self, graph: nx.DiGraph, clusters: List[Dict[str, Any]]):
+            return np.zeros(n, dtype=np.int64)
+
+    def cluster_graph(self, graph, previous: Optional[Dict[str, int]] = None,
+                      resolutions: Optional[Sequence[float]] = None) -> List[Dict[str, Any]]:
+        """
+        Groups nodes into clusters.
+        graph is a CompactGraph or a networkx DiGraph.
+        previous: node id -> cluster id of an earlier run on a slightly
+            different graph. The backend starts from it (new nodes start
+            alone) and clusters keep their old ids where they overlap, so
+            small edits do not reshuffle the whole partition.
+        resolutions: if given, the hierarchy levels are flat clusterings at
+            these resolutions instead of successive contractions (self.levels).
+        """
+        node_ids, u, v, w = self._adjacency(graph)
+        n = len(node_ids)
+        if n == 0:
+            # No functions (e.g. an empty tree): no clusters, one empty level
+            self.levels = [_level(0, self.resolution, np.empty(0, dtype=np.int64))]
+            self.levels[0].pop("_node_labels")
+            return []
+        init = None
+        if previous:
+            init = np.fromiter((previous.get(node, -1) for node in node_ids), dtype=np.int64, count=n)
+            if not (init >= 0).any():
+                init = None
+
+        labels = _stable_labels(self._partition(n, u, v, w, self.resolution, init), init)
+        if resolutions:
+            self.levels = self._multi_resolution(n, u, v, w, labels, resolutions)
+        else:
+            self.levels = self._hierarchy(u, v, w, labels)
+
+        main = next(level for level in self.levels if level["resolution"] == self.resolution)
+        return _cluster_list(node_ids, labels, main["parents"])
+
+    def update_clusters(self, graph: CompactGraph, previous: CompactGraph, touched: Iterable[str],
+                        levels: Sequence[Dict[str, Any]] = (), sweeps: int = 3) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Local re-clustering after a small edit, much cheaper than cluster_graph:
+        nodes keep their cluster on previous, except the touched ones (new, or
+        whose calls changed), which take the cluster their neighbours are most
+        strongly linked to, over a few label propagation sweeps restricted to
+        them. A touched node without clustered neighbours starts a cluster of
+        its own. Quality drifts as edits pile up; a full analysis re-optimises.
+        levels: the hierarchy of the previous run; level 0 is recounted, the
+            coarser levels are kept as they were.
+        Returns the cluster list and the ids of the nodes whose cluster changed.
+        """
+        n = graph.number_of_nodes()
+        old = previous.cluster
+        labels = np.fromiter((old[previous.index[node]] if node in previous.index else -1
+                              for node in graph.node_ids), dtype=np.int64, count=n)
+        before = labels.copy()
+        free = sorted(graph.index[node] for node in set(touched) if node in graph.index)
+        next_id = max(int(labels.max(initial=-1)), int(old.max(initial=-1))) + 1
+
+        rev_indptr, rev_indices, rev_weights = graph.reverse()
+        for _ in range(sweeps):
+            moved = False
+            for i in free:
+                neighbours = np.concatenate((graph.indices[graph.indptr[i]:graph.indptr[i + 1]],
+                                             rev_indices[rev_indptr[i]:rev_indptr[i + 1]]))
+                weights = np.concatenate((graph.weights[graph.indptr[i]:graph.indptr[i + 1]],
+                                          rev_weights[rev_indptr[i]:rev_indptr[i + 1]]))
+                votes: Dict[int, float] = {}
+                for label, weight in zip(labels[neighbours].tolist(), weights.tolist()):
+                    if label >= 0:
+                        votes[label] = votes.get(label, 0.0) + weight
+                if votes:
+                    label = min(votes, key=lambda c: (-votes[c], c))
+                elif labels[i] < 0:
+                    label = next_id
+                    next_id += 1
+                else:
+                    continue
+                if label != labels[i]:
+                    labels[i] = label
+                    moved = True
+            if not moved:
+                break
+
+        resolution = levels[0]["resolution"] if levels else self.resolution
+        parents = levels[0].get("parents", {}) if levels else {}
+        level = _level(0, resolution, labels)
+        level.pop("_node_labels")
+        level["parents"] = {c["id"]: parents[c["id"]] for c in level["clusters"] if c["id"] in parents}
+        self.levels = [level] + list(levels[1:])
+        changed = [graph.node_ids[i] for i in np.flatnonzero(labels != before).tolist()]
+        return _cluster_list(graph.node_ids, labels, level["parents"]), changed
+
+    def _hierarchy(self, u, v, w, labels: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Coarser levels by contraction: each level clusters the graph whose
+        nodes are the previous level's clusters, until nothing merges.
+        """
+        levels = [_level(0, self.resolution, labels)]
+        node_labels = labels
+        for depth in range(1, self.max_levels):
+            ids, dense = np.unique(node_labels, return_inverse=True)
+            cu, cv, cw = _contract(dense, u, v, w)
+            if len(cu) == 0:
+                break
+            coarse = _stable_labels(self._partition(len(ids), cu, cv, cw, self.resolution), None)
+            if len(np.unique(coarse)) >= len(ids):
+                break
+            levels[-1]["parents"] = {str(c): str(p) for c, p in zip(ids.tolist(), coarse.tolist())}
+            node_labels = coarse[dense]
+            levels.append(_level(depth, self.resolution, node_labels))
+        for level in levels:
+            level.pop("_node_labels", None)
+        return levels
+
+    def _multi_resolution(self, n: int, u, v, w, labels: np.ndarray,
+                          resolutions: Sequence[float]) -> List[Dict[str, Any]]:
+        """
+        One flat clustering per resolution, ordered finest (most clusters)
+        first whichever way the backend's resolution scale runs; each
+        cluster's parent is the coarser cluster holding most of its nodes.
+        """
+        runs = [(self.resolution, labels)]
+        for resolution in resolutions:
+            if resolution != self.resolution:
+                runs.append((resolution, _stable_labels(self._partition(n, u, v, w, resolution), None)))
+        runs.sort(key=lambda run: -len(np.unique(run[1])))
+        # Backends without a resolution parameter give the same partition every time
+        runs = [run for k, run in enumerate(runs)
+                if k == 0 or len(np.unique(run[1])) != len(np.unique(runs[k - 1][1]))]
+        levels = []
+        for depth, (resolution, node_labels) in enumerate(runs):
+            if levels:
+                levels[-1]["parents"] = _majority(levels[-1]["_node_labels"], node_labels)
+            levels.append(_level(depth, resolution, node_labels))
+        for level in levels:
+            level.pop("_node_labels", None)
+        return levels
+
+    def assign_clusters(self, graph, clusters: List[Dict[str, Any]]):
         """
         Updates the graph nodes with their cluster assignment.
         """
+        if isinstance(graph, CompactGraph):
+            for cluster in clusters:
+                idx = [graph.index[node] for node in cluster["nodes"]]
+                graph.cluster[idx] = int(cluster["id"])
+            return
+
+        import networkx as nx
+
         node_to_cluster = {}
         for cluster in clusters:
             cid = cluster["id"]
             for node in cluster["nodes"]:
                 node_to_cluster[node] = cid
-                
+
         nx.set_node_attributes(graph, node_to_cluster, "cluster")
+
+
+def previous_partition(graph: Optional[CompactGraph]) -> Dict[str, int]:
+    """node id -> cluster id stored on an earlier graph (for warm starts)."""
+    if graph is None:
+        return {}
+    return {node_id: c for node_id, c in zip(graph.node_ids, graph.cluster.tolist()) if c >= 0}
+
+
+def _cluster_list(node_ids: List[str], labels: np.ndarray, parents: Dict[str, str]) -> List[Dict[str, Any]]:
+    # Organize by cluster
+    members = {}
+    for i, cid in enumerate(labels.tolist()):
+        members.setdefault(cid, []).append(node_ids[i])
+
+    # Generate Metadata for clusters
+    # Placeholder name and risk; metrics.describe_clusters replaces them
+    # from the graph once the clusters are assigned.
+
+    cluster_metadata = []
+    for cid, nodes in sorted(members.items()):
+        cluster_metadata.append({
+            "id": str(cid),
+            "name": f"Cluster {cid}",
+            "node_count": len(nodes),
+            "nodes": nodes,
+            "parent": parents.get(str(cid)),
+            "risk_score": "LOW"
+        })
+
+    return cluster_metadata
+
+
+def _level(depth: int, resolution: float, node_labels: np.ndarray) -> Dict[str, Any]:
+    ids, counts = np.unique(node_labels, return_counts=True)
+    return {
+        "level": depth,
+        "resolution": resolution,
+        "clusters": [{"id": str(c), "node_count": int(k)} for c, k in zip(ids.tolist(), counts.tolist())],
+        "parents": {},
+        "_node_labels": node_labels,
+    }
+
+
+def _contract(labels: np.ndarray, u, v, w):
+    """Edges between clusters (weights summed, internal edges dropped)."""
+    cu, cv = labels[u], labels[v]
+    keep = cu != cv
+    lo, hi = np.minimum(cu, cv)[keep], np.maximum(cu, cv)[keep]
+    span = int(labels.max()) + 1
+    keys, inverse = np.unique(lo * span + hi, return_inverse=True)
+    return keys // span, keys % span, np.bincount(inverse, weights=np.asarray(w)[keep], minlength=len(keys))
+
+
+def _majority(fine: np.ndarray, coarse: np.ndarray) -> Dict[str, str]:
+    """Parent of each fine cluster: the coarse cluster holding most of its nodes."""
+    span = int(coarse.max()) + 1
+    keys, counts = np.unique(fine.astype(np.int64) * span + coarse, return_counts=True)
+    order = np.lexsort((-counts, keys // span))
+    parents = {}
+    for key in keys[order].tolist():
+        parents.setdefault(str(key // span), str(key % span))
+    return parents
+
+
+def _stable_labels(labels: np.ndarray, init: Optional[np.ndarray]) -> np.ndarray:
+    """
+    Renumbers clusters deterministically. Without a previous partition, ids
+    go by size (largest first, ties by lowest node index); with one, each
+    cluster takes the previous id it overlaps most, and the rest get new ids.
+    """
+    labels = np.asarray(labels, dtype=np.int64)
+    if len(labels) == 0:
+        return labels
+    uniq, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    first = np.full(len(uniq), len(labels), dtype=np.int64)
+    np.minimum.at(first, inverse, np.arange(len(labels)))
+    order = np.lexsort((first, -counts))  # canonical cluster order
+
+    mapping = np.full(len(uniq), -1, dtype=np.int64)
+    next_id = 0
+    if init is not None:
+        known = init >= 0
+        span = int(init.max()) + 1
+        keys, overlap = np.unique(inverse[known] * span + init[known], return_counts=True)
+        taken = set()
+        for k in np.argsort(-overlap, kind="stable").tolist():
+            cluster, old = divmod(int(keys[k]), span)
+            if mapping[cluster] < 0 and old not in taken:
+                mapping[cluster] = old
+                taken.add(old)
+        next_id = span
+    for cluster in order.tolist():
+        if mapping[cluster] < 0:
+            mapping[cluster] = next_id
+            next_id += 1
+    return mapping[inverse]
@@ -0,0 +1,246 @@
+import os
+import re
+import numpy as np
+from typing import List, Dict, Any, Tuple
+
+from ..graph.compact import CompactGraph
+
+# Identifier fragments too generic to describe a cluster
+STOPWORDS = frozenset("""
+get set is has to on of the and or with by for from new init main run do can should
+impl util utils helper value values data list map item items java test tests
+""".split())
+
+RISK_LEVELS = ((0.6, "HIGH"), (0.35, "MEDIUM"), (0.0, "LOW"))
+
+_IDENTIFIER_PART = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+
+def identifier_tokens(identifier: str) -> List[str]:
+    """'parseHTTPRequest_v2' -> ['parse', 'http', 'request']"""
+    return [t for t in (p.lower() for p in _IDENTIFIER_PART.findall(identifier))
+            if len(t) > 2 and t not in STOPWORDS and not t.isdigit()]
+
+
+def _dense_labels(graph: CompactGraph) -> Tuple[np.ndarray, np.ndarray]:
+    """Cluster ids present on the graph and each node's position among them (-1: none)."""
+    labels = graph.cluster.astype(np.int64)
+    ids = np.unique(labels[labels >= 0])
+    dense = np.where(labels >= 0, np.searchsorted(ids, labels), -1)
+    return ids, dense
+
+
+def _top_per_group(group: np.ndarray, score: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k best-scoring entries of every group."""
+    order = np.lexsort((-score, group))
+    sorted_group = group[order]
+    starts = np.flatnonzero(np.r_[True, sorted_group[1:] != sorted_group[:-1]])
+    rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    return order[rank < k]
+
+
+def cluster_metrics(graph: CompactGraph) -> Dict[str, np.ndarray]:
+    """
+    Per-cluster size, LOC, complexity, cohesion and coupling, as arrays aligned
+    with the sorted cluster ids ("id"). Everything is a bincount over the node
+    and edge arrays; there is no per-node Python work.
+    cohesion: share of the cluster's call weight that stays inside it.
+    afferent/efferent: distinct other clusters calling in / called out to.
+    instability: efferent / (afferent + efferent), Martin's metric.
+    """
+    ids, dense = _dense_labels(graph)
+    c = len(ids)
+    member = dense >= 0
+    node_cluster = dense[member]
+    complexity = graph.complexity[member].astype(np.float64)
+
+    size = np.bincount(node_cluster, minlength=c)
+    complexity_max = np.zeros(c)
+    np.maximum.at(complexity_max, node_cluster, complexity)
+
+    src = dense[graph.edge_sources()]
+    dst = dense[graph.indices]
+    weights = graph.weights.astype(np.float64)
+    valid = (src >= 0) & (dst >= 0)
+    src, dst, weights = src[valid], dst[valid], weights[valid]
+    internal = src == dst
+    internal_w = np.bincount(src[internal], weights[internal], minlength=c)
+    out_w = np.bincount(src[~internal], weights[~internal], minlength=c)
+    in_w = np.bincount(dst[~internal], weights[~internal], minlength=c)
+    pairs = np.unique(src[~internal] * c + dst[~internal])
+    efferent = np.bincount(pairs // c, minlength=c) if c else np.zeros(0, dtype=np.int64)
+    afferent = np.bincount(pairs % c, minlength=c) if c else np.zeros(0, dtype=np.int64)
+
+    total_w = internal_w + out_w + in_w
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cohesion = np.where(total_w > 0, internal_w / total_w, 1.0)
+        instability = np.where(afferent + efferent > 0, efferent / (afferent + efferent), 0.0)
+        complexity_mean = np.where(size > 0, np.bincount(node_cluster, complexity, minlength=c) / size, 0.0)
+
+    return {
+        "id": ids,
+        "size": size,
+        "loc": np.bincount(node_cluster, graph.loc[member].astype(np.float64), minlength=c).astype(np.int64),
+        "complexity_mean": complexity_mean,
+        "complexity_max": complexity_max.astype(np.int64),
+        "fan_in": in_w,
+        "fan_out": out_w,
+        "cohesion": cohesion,
+        "afferent": afferent,
+        "efferent": efferent,
+        "instability": instability,
+    }
+
+
+def coupling_ratio(graph: CompactGraph) -> float:
+    """Share of the call weight between clustered functions that crosses a cluster boundary."""
+    src = graph.cluster[graph.edge_sources()]
+    dst = graph.cluster[graph.indices]
+    valid = (src >= 0) & (dst >= 0)
+    weights = graph.weights[valid].astype(np.float64)
+    total = weights.sum()
+    return float(weights[src[valid] != dst[valid]].sum() / total) if total > 0 else 0.0
+
+
+def risk_scores(metrics: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    0..1 per cluster on absolute scales (so a clean repo can be all LOW):
+    complexity (McCabe 10 per function is already a lot, 20 in the worst
+    one), how much other code depends on the cluster, and how entangled it is.
+    """
+    clip = lambda x: np.clip(x, 0.0, 1.0)
+    return (
+        0.35 * clip((metrics["complexity_mean"] - 1) / 9)
+        + 0.25 * clip((metrics["complexity_max"] - 1) / 19)
+        + 0.2 * clip(np.log1p(metrics["fan_in"]) / np.log1p(50))
+        + 0.2 * (1 - metrics["cohesion"])
+    )
+
+
+def tfidf_labels(graph: CompactGraph, top: int = 3) -> Dict[int, List[str]]:
+    """
+    The top TF-IDF terms of every cluster, over the identifier fragments of
+    its function names and file (class) names. Clusters are the documents.
+    Tokenisation runs once per distinct name; counting and scoring are array ops.
+    """
+    ids, dense = _dense_labels(graph)
+    vocab: Dict[str, int] = {}
+    token_cache: Dict[str, List[int]] = {}
+
+    def tokens(identifier: str) -> List[int]:
+        cached = token_cache.get(identifier)
+        if cached is None:
+            cached = token_cache[identifier] = [vocab.setdefault(t, len(vocab)) for t in identifier_tokens(identifier)]
+        return cached
+
+    file_tokens = [tokens(os.path.splitext(os.path.basename(f))[0]) for f in graph.files]
+    per_node = [tokens(name) + file_tokens[fi] for name, fi in zip(graph.names, graph.file_idx.tolist())]
+    lengths = np.fromiter((len(t) for t in per_node), dtype=np.int64, count=len(per_node))
+    term = np.fromiter((t for ts in per_node for t in ts), dtype=np.int64, count=int(lengths.sum()))
+    doc = np.repeat(dense, lengths)
+    keep = doc >= 0
+    if not keep.any():
+        return {}
+    doc, term = doc[keep], term[keep]
+
+    v = max(1, len(vocab))
+    keys, counts = np.unique(doc * v + term, return_counts=True)
+    doc, term = keys // v, keys % v
+    df = np.bincount(term, minlength=v)
+    idf = np.log((1 + len(ids)) / (1 + df)) + 1
+    tf = counts / np.bincount(doc, counts, minlength=len(ids))[doc]
+    best = _top_per_group(doc, tf * idf[term], top)
+
+    words = np.array(list(vocab), dtype=object)
+    labels: Dict[int, List[str]] = {}
+    for pos in best[np.argsort(doc[best], kind="stable")].tolist():
+        labels.setdefault(int(ids[doc[pos]]), []).append(words[term[pos]])
+    return labels
+
+
+def hotspots(graph: CompactGraph, top: int = 3) -> Dict[int, List[str]]:
+    """Per cluster, the functions with the highest complexity x (1 + callers)."""
+    ids, dense = _dense_labels(graph)
+    member = np.flatnonzero(dense >= 0)
+    score = graph.complexity[member].astype(np.float64) * (1 + graph.fan_in()[member])
+    best = member[_top_per_group(dense[member], score, top)]
+    result: Dict[int, List[str]] = {}
+    for i in best.tolist():
+        result.setdefault(int(ids[dense[i]]), []).append(graph.node_ids[i])
+    return result
+
+
+def history_metrics(graph: CompactGraph, top: int = 3) -> Dict[str, Any]:
+    """
+    Per-cluster git history (needs graph.history): commits and lines that
+    changed its functions, the mean age of those functions in days, the last
+    change and the churn hotspots (churn x complexity, Tornhill's measure).
+    """
+    ids, dense = _dense_labels(graph)
+    c = len(ids)
+    member = np.flatnonzero(dense >= 0)
+    node_cluster = dense[member]
+    history = graph.history
+    churn = history["churn"][member].astype(np.float64)
+    changed = churn > 0
+    first = history["first_commit"][member].astype(np.float64)
+    age = np.bincount(node_cluster[changed], (history["head_time"] - first[changed]) / 86400, minlength=c)
+    aged = np.bincount(node_cluster[changed], minlength=c)
+    last = np.zeros(c, dtype=np.int64)
+    np.maximum.at(last, node_cluster, history["last_commit"][member])
+    score = churn * graph.complexity[member]
+    best = member[_top_per_group(node_cluster, score, top)]
+    best = best[history["churn"][best] > 0]
+    spots: Dict[int, List[str]] = {}
+    for i in best.tolist():
+        spots.setdefault(int(ids[dense[i]]), []).append(graph.node_ids[i])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        age_mean = np.where(aged > 0, age / aged, 0.0)
+    return {
+        "id": ids,
+        "churn": np.bincount(node_cluster, churn, minlength=c).astype(np.int64),
+        "churn_lines": np.bincount(node_cluster, history["churn_lines"][member].astype(np.float64),
+                                   minlength=c).astype(np.int64),
+        "age_days": age_mean,
+        "last_changed": last,
+        "hotspots": spots,
+    }
+
+
+def describe_clusters(graph: CompactGraph, clusters: List[Dict[str, Any]]):
+    """
+    Fills in name, keywords, risk and metrics of the cluster dicts produced
+    by ClusteringEngine.cluster_graph, once clusters are assigned on graph,
+    and their git history when graph.history is set.
+    """
+    metrics = cluster_metrics(graph)
+    risk = risk_scores(metrics)
+    labels = tfidf_labels(graph)
+    spots = hotspots(graph)
+    history = history_metrics(graph) if graph.history is not None else None
+    row = {int(cid): k for k, cid in enumerate(metrics["id"].tolist())}
+    for cluster in clusters:
+        cid = int(cluster["id"])
+        k = row.get(cid)
+        if k is None:
+            continue
+        keywords = labels.get(cid, [])
+        if keywords:
+            cluster["name"] = " ".join(w.capitalize() for w in keywords)
+        cluster["keywords"] = keywords
+        cluster["risk"] = round(float(risk[k]), 3)
+        cluster["risk_score"] = next(level for threshold, level in RISK_LEVELS if risk[k] >= threshold)
+        cluster["hotspots"] = spots.get(cid, [])
+        cluster["metrics"] = {
+            name: (round(float(values[k]), 3) if values.dtype.kind == "f" else int(values[k]))
+            for name, values in metrics.items() if name != "id"
+        }
+        if history is not None:
+            # Same cluster ids, same order as metrics["id"]
+            cluster["history"] = {
+                "churn": int(history["churn"][k]),
+                "churn_lines": int(history["churn_lines"][k]),
+                "age_days": round(float(history["age_days"][k]), 1),
+                "last_changed": int(history["last_changed"][k]),
+                "hotspots": history["hotspots"].get(cid, []),
+            }
@@ -0,0 +1,213 @@
+import numpy as np
+from typing import List, Dict, Any, Iterable, Optional, Sequence, Tuple
+
+INDEX_KINDS = ("flat", "ivf", "ivfpq", "hnsw", "hnswpq")
+FILTER_FIELDS = ("repo", "file", "cluster")
+# k-means wants ~39 training points per centroid; PQ codebooks have 256 each
+PQ_MIN_TRAIN = 39 * 256
+
+
+class VectorIndex:
+    """
+    FAISS index over node embeddings, addressed by node id.
+    kind selects the structure:
+        flat    exact brute force (the old behaviour, used as the recall baseline)
+        ivf     inverted lists over k-means cells, nprobe cells searched per query
+        ivfpq   ivf with product-quantised vectors (pq_m bytes per vector)
+        hnsw    navigable small-world graph
+        hnswpq  hnsw over product-quantised vectors
+    Node ids map to int64 labels (IVF stores them natively, the others through
+    an ID map), so vectors can be added, replaced and removed individually.
+    PQ kinds fall back to unquantised vectors until there is enough data to
+    train the codebooks. HNSW cannot delete in place: removed
+    labels are masked at search time and the index is rebuilt once they pile up.
+    Searches can be restricted by repo, file or cluster.
+    """
+
+    def __init__(self, dim: int, kind: str = "flat", nlist: Optional[int] = None, nprobe: int = 16,
+                 pq_m: int = 16, hnsw_m: int = 32, ef_search: int = 128):
+        if kind not in INDEX_KINDS:
+            raise ValueError(f"Unknown index kind: {kind}")
+        self.dim = dim
+        self.kind = kind
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.pq_m = pq_m
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+
+        self.index = None
+        self.base = None  # the underlying IVF/HNSW/flat index (wrapped in an ID map unless IVF)
+        self._keepalive = []  # SWIG objects the index points to (quantizers)
+        self.labels: Dict[str, int] = {}     # node id -> label
+        self.node_ids: Dict[int, str] = {}   # label -> node id
+        self.trained_size = 0  # vectors the current index was trained/built with
+        self.metadata: Dict[int, Dict[str, Any]] = {}
+        self.postings: Dict[Tuple[str, Any], set] = {}  # (field, value) -> labels
+        self.deleted: set = set()  # HNSW tombstones
+        self._next_label = 0
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    # --- construction ----------------------------------------------------
+
+    def _make_index(self, n_train: int):
+        import faiss
+        kind = self.kind
+        if kind in ("ivf", "ivfpq"):
+            nlist = self.nlist or max(1, int(4 * np.sqrt(max(n_train, 1))))
+            nlist = min(nlist, max(1, n_train // 39))  # k-means wants ~39 points per cell
+            quantizer = faiss.IndexFlatL2(self.dim)
+            if kind == "ivfpq" and n_train >= PQ_MIN_TRAIN and self.dim % self.pq_m == 0:
+                base = faiss.IndexIVFPQ(quantizer, self.dim, nlist, self.pq_m, 8)
+            else:
+                base = faiss.IndexIVFFlat(quantizer, self.dim, nlist)
+            base.nprobe = min(self.nprobe, nlist)
+            # Hashtable direct map: supports both reconstruct (for rebuilds) and remove_ids
+            base.set_direct_map_type(faiss.DirectMap.Hashtable)
+            self._keepalive = [quantizer]
+        elif kind == "hnsw":
+            base = faiss.IndexHNSWFlat(self.dim, self.hnsw_m)
+            base.hnsw.efSearch = self.ef_search
+        elif kind == "hnswpq" and n_train >= PQ_MIN_TRAIN and self.dim % self.pq_m == 0:
+            base = faiss.IndexHNSWPQ(self.dim, self.pq_m, self.hnsw_m)
+            base.hnsw.efSearch = self.ef_search
+        elif kind == "hnswpq":
+            base = faiss.IndexHNSWFlat(self.dim, self.hnsw_m)
+            base.hnsw.efSearch = self.ef_search
+        else:
+            base = faiss.IndexFlatL2(self.dim)
+        self.base = base
+        if kind in ("ivf", "ivfpq"):
+            return base  # IVF stores the ids itself
+        return faiss.IndexIDMap2(base)
+
+    def _build(self, labels: np.ndarray, data: np.ndarray):
+        """Creates the FAISS index over the given vectors, training it on them if needed."""
+        self.index = self._make_index(len(labels))
+        if not self.index.is_trained and len(labels):
+            self.index.train(data)
+        if len(labels):
+            self.index.add_with_ids(data, labels)
+        self.trained_size = len(labels)
+        self.deleted.clear()
+
+    def rebuild(self):
+        """
+        Rebuilds from the vectors currently in the index: drops HNSW tombstones
+        and retrains IVF/PQ cells for the current size. Vectors of PQ kinds are
+        reconstructed from their codes, so a rebuild does not need the originals.
+        """
+        if self.index is None:
+            return
+        labels = np.array(sorted(self.node_ids), dtype=np.int64)
+        data = self.index.reconstruct_batch(labels) if len(labels) else np.empty((0, self.dim), np.float32)
+        self._build(labels, np.ascontiguousarray(data, dtype=np.float32))
+
+    # --- updates ---------------------------------------------------------
+
+    def add(self, node_ids: Sequence[str], vectors: np.ndarray,
+            metadata: Optional[Sequence[Dict[str, Any]]] = None):
+        """Adds vectors for node ids; ids already present are replaced."""
+        if len(node_ids) == 0:
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.remove([n for n in node_ids if n in self.labels])
+
+        labels = np.arange(self._next_label, self._next_label + len(node_ids), dtype=np.int64)
+        self._next_label += len(node_ids)
+        for k, (node_id, label) in enumerate(zip(node_ids, labels.tolist())):
+            self.labels[node_id] = label
+            self.node_ids[label] = node_id
+            self.set_metadata(node_id, metadata[k] if metadata else {})
+
+        if self.index is None:
+            self._build(labels, vectors)
+            return
+        self.index.add_with_ids(vectors, labels)
+        if self.kind != "flat" and len(self.labels) > 4 * max(self.trained_size, 64):
+            # Cells/codebooks trained on a much smaller set degrade recall
+            self.rebuild()
+
+    def remove(self, node_ids: Iterable[str]):
+        labels = [self.labels.pop(n) for n in node_ids if n in self.labels]
+        if not labels:
+            return
+        for label in labels:
+            del self.node_ids[label]
+            self._unindex_metadata(label)
+
+        if self.kind.startswith("hnsw"):
+            self.deleted.update(labels)
+            if len(self.deleted) > 0.2 * max(len(self.labels), 1):
+                self.rebuild()
+        elif self.index is not None:
+            self.index.remove_ids(np.array(labels, dtype=np.int64))
+
+    def set_metadata(self, node_id: str, meta: Dict[str, Any]):
+        """Filterable attributes of a node (repo, file, cluster)."""
+        label = self.labels[node_id]
+        self._unindex_metadata(label)
+        meta = {f: meta[f] for f in FILTER_FIELDS if meta.get(f) is not None}
+        self.metadata[label] = meta
+        for field, value in meta.items():
+            self.postings.setdefault((field, value), set()).add(label)
+
+    def _unindex_metadata(self, label: int):
+        for field, value in self.metadata.pop(label, {}).items():
+            members = self.postings.get((field, value))
+            if members:
+                members.discard(label)
+                if not members:
+                    del self.postings[(field, value)]
+
+    # --- search ----------------------------------------------------------
+
+    def _selector(self, filters: Optional[Dict[str, Any]]):
+        import faiss
+        allowed = None
+        for field, value in (filters or {}).items():
+            if field not in FILTER_FIELDS or value is None:
+                continue
+            members = self.postings.get((field, value), set())
+            allowed = members if allowed is None else allowed & members
+        if allowed is not None:
+            allowed = allowed - self.deleted
+            return (faiss.IDSelectorBatch(np.fromiter(allowed, dtype=np.int64, count=len(allowed))),), allowed
+        if self.deleted:
+            inner = faiss.IDSelectorBatch(np.fromiter(self.deleted, dtype=np.int64, count=len(self.deleted)))
+            return (faiss.IDSelectorNot(inner), inner), None
+        return None, None
+
+    def search(self, queries: np.ndarray, k: int = 5,
+               filters: Optional[Dict[str, Any]] = None) -> List[List[Tuple[str, float]]]:
+        """
+        Returns, per query row, up to k (node id, squared L2 distance) pairs.
+        filters: e.g. {"repo": "...", "cluster": "3"}; all given fields must match.
+        """
+        import faiss
+        queries = np.ascontiguousarray(np.atleast_2d(queries), dtype=np.float32)
+        if self.index is None or not self.labels:
+            return [[] for _ in range(len(queries))]
+
+        # selectors[0] is passed to FAISS; the rest only have to outlive the search
+        selectors, allowed = self._selector(filters)
+        if allowed is not None and not allowed:
+            return [[] for _ in range(len(queries))]
+
+        params = None
+        if selectors is not None:
+            selector = selectors[0]
+            if self.kind in ("ivf", "ivfpq"):
+                params = faiss.SearchParametersIVF(sel=selector, nprobe=self.base.nprobe)
+            elif self.kind.startswith("hnsw"):
+                params = faiss.SearchParametersHNSW(sel=selector, efSearch=self.ef_search)
+            else:
+                params = faiss.SearchParameters(sel=selector)
+
+        distances, labels = self.index.search(queries, k, params=params)
+        return [
+            [(self.node_ids[l], float(d)) for d, l in zip(row_d, row_l) if l != -1 and l in self.node_ids]
+            for row_d, row_l in zip(distances.tolist(), labels.tolist())
+        ]
@@ -1,69 +1,262 @@
-from sentence_transformers import SentenceTransformer
-import faiss
 import numpy as np
-from typing import List, Dict, Any
-import pickle
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+import hashlib
 import os
+import re
+
+from ..parsing.cache import DEFAULT_CACHE_DIR
+from ..storage import columns
+from .store import VectorStore
+from .index import VectorIndex
+
+
+def content_key(text: str) -> bytes:
+    return hashlib.sha1(text.encode("utf-8", errors="replace")).digest()
+
 
 class EmbeddingProcessor:
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
+    def __init__(
+        self,
+        model_name: str = 'all-MiniLM-L6-v2',
+        cache_dir: Optional[str] = None,
+        batch_size: int = 64,
+        chunk_size: int = 4096,
+        max_chars: int = 2000,
+        threads: Optional[int] = None,
+        backend: str = "torch",
+        model_file: Optional[str] = None,
+        quantize: bool = False,
+        index_kind: str = "flat",
+        index_params: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        batch_size: texts per model.encode call (texts are length-bucketed).
+        chunk_size: functions read from the input stream at a time.
+        max_chars: bodies are cut to their first max_chars characters (signature
+            and the start of the body) before tokenisation; the model truncates
+            to its own max_seq_length anyway, so the tail would be wasted work.
+        threads: CPU threads used by torch (default: torch's own choice).
+        backend: "torch", "onnx" or "openvino" (sentence-transformers backends).
+        model_file: optional weights file for onnx/openvino, e.g. a quantised export.
+        quantize: dynamic int8 quantisation of the torch model's Linear layers.
+        index_kind: "flat", "ivf", "ivfpq", "hnsw" or "hnswpq" (see VectorIndex).
+        index_params: extra VectorIndex arguments (nlist, nprobe, pq_m, ...).
+        """
         # Lazy loading to avoid startup delay if not needed immediately
         self.model_name = model_name
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.max_chars = max_chars
+        self.threads = threads
+        self.backend = backend
+        self.model_file = model_file
+        self.quantize = quantize
+        self.index_kind = index_kind
+        self.index_params = index_params or {}
         self.model = None
-        self.index = None
-        self.ids = [] # Map index ID to Node ID
+        self.index: Optional[VectorIndex] = None
+        self.keys: Dict[str, bytes] = {}  # node id -> content key of its indexed vector
+        self._pending = None  # loaded (ids, vectors, metadata) not yet put in an index
+
+        cache_dir = cache_dir or os.environ.get("CODE_ARC_CACHE_DIR", DEFAULT_CACHE_DIR)
+        # Vectors are only reusable for the same model/backend
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{model_name}-{backend}-{model_file or ''}-{'q8' if quantize else 'f32'}")
+        self.store = VectorStore.for_path(os.path.join(cache_dir, "vectors", slug))
+        self.encoded = 0  # texts actually sent to the model by the last run
 
     def _load_model(self):
         if not self.model:
             print("Loading embedding model...")
-            self.model = SentenceTransformer(self.model_name)
-            
-    def generate_embeddings(self, nodes: List[Dict[str, Any]]):
+            import torch
+            from sentence_transformers import SentenceTransformer
+
+            if self.threads:
+                torch.set_num_threads(self.threads)
+            kwargs = {"device": "cpu"}
+            if self.backend != "torch":
+                kwargs["backend"] = self.backend
+                if self.model_file:
+                    kwargs["model_kwargs"] = {"file_name": self.model_file}
+            self.model = SentenceTransformer(self.model_name, **kwargs)
+            if self.quantize and self.backend == "torch":
+                self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def _prepare(self, code: str) -> str:
+        return code[:self.max_chars] if code else ""
+
+    def _encode_missing(self, texts: Dict[bytes, str]):
+        """Encodes texts whose hash is not in the store yet, shortest first."""
+        keys = sorted(self.store.missing(texts), key=lambda k: len(texts[k]))
+        if not keys:
+            return
+        self._load_model()
+        # Batches of similar length waste little compute on padding
+        for start in range(0, len(keys), self.batch_size):
+            batch = keys[start:start + self.batch_size]
+            vectors = self.model.encode([texts[k] for k in batch], batch_size=len(batch),
+                                        convert_to_numpy=True, show_progress_bar=False)
+            self.store.append(batch, vectors)
+        self.encoded += len(keys)
+
+    def embed(self, nodes: Iterable[Dict[str, Any]]) -> Iterator[tuple]:
         """
-        nodes: List of dicts with 'id' and 'code' text.
+        Streams (node id, content key) pairs, encoding new bodies chunk by chunk.
+        Identical bodies share one key and are encoded once; bodies already in
+        the store are never re-encoded.
         """
-        self._load_model()
-        
-        texts = [node['code'] for node in nodes]
-        self.ids = [node['id'] for node in nodes]
-        
-        if not texts:
+        chunk = []
+        for node in nodes:
+            chunk.append(node)
+            if len(chunk) >= self.chunk_size:
+                yield from self._embed_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield from self._embed_chunk(chunk)
+
+    def _embed_chunk(self, chunk: List[Dict[str, Any]]):
+        texts = {}
+        pairs = []
+        for node in chunk:
+            text = self._prepare(node.get('code'))
+            key = content_key(text)
+            texts[key] = text
+            pairs.append((node['id'], key))
+        self._encode_missing(texts)
+        return pairs
+
+    def generate_embeddings(self, nodes: Iterable[Dict[str, Any]], repo: Optional[str] = None):
+        """
+        nodes: iterable of dicts with 'id' and 'code' text, optionally 'file'
+        and 'cluster' (used, with repo, as search filters).
+        The index is updated in place: only nodes whose body changed are
+        re-added, nodes no longer present are removed.
+        """
+        self.encoded = 0
+        keys = {}
+        metadata = {}
+
+        def tap(stream):
+            for node in stream:
+                metadata[node['id']] = {"repo": repo, "file": node.get('file'), "cluster": node.get('cluster')}
+                yield node
+
+        for node_id, key in self.embed(tap(nodes)):
+            keys[node_id] = key
+        self._ensure_index()
+        if not keys and self.index is None:
             return
-            
-        print(f"Generating embeddings for {len(texts)} functions...")
-        embeddings = self.model.encode(texts)
-        
-        # Initialize FAISS
-        dimension = embeddings.shape[1]
-        self.index = faiss.IndexFlatL2(dimension)
-        self.index.add(np.array(embeddings).astype('float32'))
-        
-        return embeddings
-
-    def search(self, query: str, k: int = 5) -> List[str]:
+
+        changed = [n for n, key in keys.items() if self.keys.get(n) != key]
+        removed = [n for n in self.keys if n not in keys]
+        print(f"Embedded {len(keys)} functions ({self.encoded} newly encoded, "
+              f"{len(changed)} changed, {len(removed)} removed).")
+
+        if self.index is None:
+            self.index = VectorIndex(self.store.dim, self.index_kind, **self.index_params)
+        self.index.remove(removed)
+        for n in keys.keys() - set(changed):
+            self.index.set_metadata(n, metadata[n])
+        if changed:
+            self.index.add(changed, self.store.get([keys[n] for n in changed]), [metadata[n] for n in changed])
+        self.keys = keys
+
+    def update_embeddings(self, nodes: Iterable[Dict[str, Any]], removed: Iterable[str] = (),
+                          repo: Optional[str] = None):
         """
-        Returns list of Node IDs
+        Patches the index for a partial change: nodes (same form as for
+        generate_embeddings) are re-embedded if their body changed, their
+        metadata is refreshed either way, and removed node ids are dropped.
+        Nodes not mentioned are left alone.
         """
+        self._ensure_index()
+        self.encoded = 0
+        nodes = list(nodes)
+        metadata = {node['id']: {"repo": repo, "file": node.get('file'), "cluster": node.get('cluster')}
+                    for node in nodes}
+        keys = dict(self.embed(nodes))
+        changed = [n for n, key in keys.items() if self.keys.get(n) != key]
+        removed = [n for n in removed if n in self.keys and n not in keys]
+        if self.index is None:
+            if not changed:
+                return
+            self.index = VectorIndex(self.store.dim, self.index_kind, **self.index_params)
+        self.index.remove(removed)
+        for n in keys.keys() - set(changed):
+            self.index.set_metadata(n, metadata[n])
+        if changed:
+            self.index.add(changed, self.store.get([keys[n] for n in changed]), [metadata[n] for n in changed])
+        for n in removed:
+            del self.keys[n]
+        self.keys.update(keys)
+        print(f"Patched embeddings: {len(changed)} changed ({self.encoded} newly encoded), "
+              f"{len(removed)} removed.")
+
+    def search_scored(self, query: str, k: int = 5,
+                      filters: Optional[Dict[str, Any]] = None) -> List[tuple]:
+        """(node id, squared L2 distance) pairs, nearest first."""
+        self._ensure_index()
+        if self.index is None:
+            return []
         self._load_model()
-        query_vector = self.model.encode([query])
-        distances, indices = self.index.search(np.array(query_vector).astype('float32'), k)
-        
-        results = []
-        for idx in indices[0]:
-            if idx != -1 and idx < len(self.ids):
-                results.append(self.ids[idx])
-                
-        return results
+        query_vector = self.model.encode([query], convert_to_numpy=True, show_progress_bar=False)
+        return self.index.search(query_vector, k, filters)[0]
+
+    def search(self, query: str, k: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[str]:
+        """
+        Returns list of Node IDs
+        filters: restrict to e.g. {"repo": ..., "file": ..., "cluster": ...}
+        """
+        return [node_id for node_id, _ in self.search_scored(query, k, filters)]
+
+    def _ensure_index(self):
+        """Builds the index from loaded vectors on first use, keeping load() cheap."""
+        if self._pending is None:
+            return
+        ids, vectors, metadata = self._pending
+        self._pending = None
+        if ids:
+            self.index = VectorIndex(vectors.shape[1], self.index_kind, **self.index_params)
+            self.index.add(ids, np.asarray(vectors), metadata)
 
     def save(self, path: str):
-        if self.index:
-            faiss.write_index(self.index, f"{path}.index")
-            with open(f"{path}.ids", "wb") as f:
-                pickle.dump(self.ids, f)
-
-    def load(self, path: str):
-        if os.path.exists(f"{path}.index"):
-            self.index = faiss.read_index(f"{path}.index")
-            with open(f"{path}.ids", "rb") as f:
-                self.ids = pickle.load(f)
-            self._load_model()
+        """
+        Writes the embedded node ids, their content keys and vectors to the
+        directory path (see storage.columns; no pickle).
+        """
+        self._ensure_index()
+        if self.index is None:
+            return
+        os.makedirs(path, exist_ok=True)
+        ids = list(self.keys)
+        meta = [self.index.metadata.get(self.index.labels[n], {}) for n in ids]
+        columns.save_strings(path, "ids", ids)
+        for field in ("repo", "file", "cluster"):
+            columns.save_strings(path, field, [str(m.get(field) or "") for m in meta])
+        columns.save_array(path, "keys", np.frombuffer(b"".join(self.keys[n] for n in ids), dtype=np.uint8).reshape(-1, 20))
+        columns.save_array(path, "vectors", self.store.get([self.keys[n] for n in ids]) if ids
+                           else np.empty((0, self.store.dim or 0), dtype=np.float32))
+        columns.save_json(path, "meta", {
+            "model_name": self.model_name,
+            "backend": self.backend,
+            "model_file": self.model_file,
+            "quantize": self.quantize,
+            "index_kind": self.index_kind,
+            "count": len(ids),
+        })
+
+    def load(self, path: str) -> bool:
+        """
+        Restores what save() wrote. The model is not loaded and the index is
+        only built when first needed, so this is cheap at server start.
+        Returns False if path holds no embeddings.
+        """
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            return False
+        ids = columns.load_strings(path, "ids")
+        fields = {f: columns.load_strings(path, f) for f in ("repo", "file", "cluster")}
+        keys = columns.load_array(path, "keys", mmap=False)
+        metadata = [{f: values[i] or None for f, values in fields.items()} for i in range(len(ids))]
+        self.keys = {n: k.tobytes() for n, k in zip(ids, keys)}
+        self.index = None
+        self._pending = (ids, columns.load_array(path, "vectors"), metadata)
+        return True
@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+import numpy as np
+from typing import Dict, Iterable, List, Optional
+
+_OPEN: Dict[str, "VectorStore"] = {}
+_OPEN_LOCK = threading.Lock()
+
+
+class VectorStore:
+    """
+    Append-only, memory-mapped store of embedding vectors keyed by content hash.
+    Every processor of a model shares one store per directory (see for_path):
+    rows are only ever appended at the store's own count, under its lock.
+    Layout of the store directory:
+        meta.json     {"dim": int, "count": int}
+        keys.bin      raw 20-byte SHA-1 digests, one per row, appended with the rows
+        vectors.f32   raw float32 rows, (count, dim), read through np.memmap
+    Bytes past count in either file are left over from an interrupted append
+    and are overwritten by the next one.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.dim: Optional[int] = None
+        self.keys: List[bytes] = []
+        self.rows: Dict[bytes, int] = {}
+        self._vectors = None
+        self._lock = threading.RLock()
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            self.dim = meta["dim"]
+            with open(os.path.join(path, "keys.bin"), "rb") as f:
+                data = f.read(meta["count"] * 20)
+            self.keys = [data[i:i + 20] for i in range(0, len(data), 20)]
+            self.rows = {k: i for i, k in enumerate(self.keys)}
+
+    @classmethod
+    def for_path(cls, path: str) -> "VectorStore":
+        """The store of directory path, shared by every processor (and job) using it."""
+        path = os.path.abspath(path)
+        with _OPEN_LOCK:
+            store = _OPEN.get(path)
+            if store is None:
+                store = _OPEN[path] = cls(path)
+            return store
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: bytes) -> bool:
+        return key in self.rows
+
+    def missing(self, keys: Iterable[bytes]) -> List[bytes]:
+        with self._lock:
+            return [k for k in keys if k not in self.rows]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """(count, dim) float32 memmap of all stored vectors."""
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[0] != len(self.keys):
+                if not self.keys:
+                    return np.empty((0, self.dim or 0), dtype=np.float32)
+                self._vectors = np.memmap(os.path.join(self.path, "vectors.f32"), dtype=np.float32,
+                                          mode="r", shape=(len(self.keys), self.dim))
+            return self._vectors
+
+    def get(self, keys: List[bytes]) -> np.ndarray:
+        with self._lock:
+            return np.asarray(self.vectors[[self.rows[k] for k in keys]])
+
+    def append(self, keys: List[bytes], vectors: np.ndarray):
+        """Adds the rows whose key is not stored yet (another processor may have added the rest)."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            new, seen = [], set()
+            for i, k in enumerate(keys):
+                if k not in self.rows and k not in seen:
+                    seen.add(k)
+                    new.append(i)
+            if not new:
+                return
+            keys = [keys[i] for i in new]
+            vectors = vectors[new]
+            self._vectors = None  # release the memmap before the file grows
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Vector dimension {vectors.shape[1]} does not match store dimension {self.dim}")
+
+            # Drop any rows a previous interrupted append wrote past the committed count
+            self._write_at("vectors.f32", len(self.keys) * self.dim * 4, vectors.tobytes())
+            self._write_at("keys.bin", len(self.keys) * 20, b"".join(keys))
+            for k in keys:
+                self.rows[k] = len(self.keys)
+                self.keys.append(k)
+            self.flush()
+
+    def _write_at(self, name: str, offset: int, data: bytes):
+        path = os.path.join(self.path, name)
+        with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+            f.seek(offset)
+            f.truncate()
+            f.write(data)
+
+    def flush(self):
+        """
+        Commits the appended rows: meta.json is written last, and replaced
+        whole, so a crash mid-append leaves the old count valid.
+        """
+        with self._lock:
+            meta_path = os.path.join(self.path, "meta.json")
+            tmp = f"{meta_path}.tmp-{os.getpid()}"
+            with open(tmp, "w") as f:
+                json.dump({"dim": self.dim, "count": len(self.keys)}, f)
+            os.replace(tmp, meta_path)
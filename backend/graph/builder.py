@@ -1,88 +1,254 @@
-import networkx as nx
-from typing import List, Dict, Any
+import os
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple
+
+from .compact import CompactGraph
+from .symbols import SymbolIndex
 
 class GraphBuilder:
-    def __init__(self):
-        self.graph = nx.DiGraph()
+    def __init__(self, max_fanout: int = 5, root: Optional[str] = None):
+        # Node ids are "<path relative to root>::<function>", so equally named
+        # files in different directories stay apart
+        self.root = root
+        # Mutable graph state: plain dicts while building, frozen into a
+        # CompactGraph (see compact()) for clustering, impact and export.
+        self.nodes: Dict[str, Dict[str, Any]] = {}        # node id -> metadata (no source text)
+        self.out_edges: Dict[str, Dict[str, float]] = {}  # source -> {target: weight}
+        self.in_edges: Dict[str, Set[str]] = {}           # target -> sources
+        self._compact: Optional[CompactGraph] = None
+        self.symbols = SymbolIndex(max_fanout=max_fanout)
+        self.units: Dict[str, Dict[str, Any]] = {}        # file -> package/imports/fields
+        self.digests: Dict[str, str] = {}                 # file -> content digest the graph reflects
+        # Bookkeeping that lets the graph be patched per file (incremental re-analysis)
+        self.file_nodes: Dict[str, List[str]] = {}        # file -> node ids it defines
+        self.definitions: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}  # node -> file -> funcs
+        self.callers: Dict[str, Set[str]] = {}            # called name -> caller node ids
+        # Call sites nothing in this graph resolves (library or another repository):
+        # node -> [(file, name, receiver type, argc)], joined across shards by a workspace
+        self.unresolved: Dict[str, List[tuple]] = {}
 
-    def build_graph(self, parsed_files: List[Dict[str, Any]]):
+    def build_graph(self, parsed_files: List[Dict[str, Any]], digests: Optional[Dict[str, str]] = None):
         """
         Constructs the dependency graph from parsed file data.
         """
+        self.update_graph(parsed_files, digests=digests)
+
+    def update_graph(self, parsed_files: List[Dict[str, Any]], removed_files: Iterable[str] = (),
+                     digests: Optional[Dict[str, str]] = None) -> Set[str]:
+        """
+        Patches the graph in place: nodes owned by removed files and by the
+        (re)parsed files are dropped, then the parsed files are added back.
+        Only edges of nodes whose definitions or call targets changed are recomputed.
+        digests: content digest of the parsed files (see changed_files).
+        Returns the ids of the nodes that were added, removed or relinked.
+        """
+        touched = set()  # nodes whose outgoing edges must be recomputed
+        names = set()    # function names that were (re)defined or removed
+        for file_path in list(removed_files) + [f.get("file_path") for f in parsed_files]:
+            self._remove_file(file_path, touched, names)
+            self.digests.pop(file_path, None)
+
         # First pass: Add all nodes
         for file_data in parsed_files:
-            file_path = file_data.get("file_path")
-            functions = file_data.get("functions", [])
-            
-            for func in functions:
-                node_id = self._generate_node_id(file_path, func["name"])
-                
-                # Store extensive metadata
-                self.graph.add_node(
-                    node_id,
-                    type="function",
-                    name=func["name"],
-                    file=file_path,
-                    start_line=func["start_line"],
-                    end_line=func["end_line"],
-                    code=func["code"]
-                )
+            self._add_file(file_data, touched, names)
+            digest = (digests or {}).get(file_data.get("file_path"))
+            if digest is not None:
+                self.digests[file_data.get("file_path")] = digest
+
+        # Callers of any (re)defined or removed name may need new targets
+        for name in names:
+            touched |= self.callers.get(name, set())
 
         # Second pass: Add edges
-        # This is tricky because calls are just strings (names). 
-        # We need to resolve them to actual nodes.
-        # MVP Strategy: Naive name matching. If function A calls "foo", link to all "foo" nodes.
-        # (For MVP, strictly static analysis without full symbol resolution is acceptable but imprecise)
-        
-        # Build a map of name -> [node_ids] for lookup
-        name_map = {}
-        for node in self.graph.nodes():
-            func_name = self.graph.nodes[node]["name"]
-            if func_name not in name_map:
-                name_map[func_name] = []
-            name_map[func_name].append(node)
-
-        for node in self.graph.nodes():
-            code = self.graph.nodes[node]["code"]
-            # We already extracted calls in parser. But let's verify if we have them in metadata.
-            # Wait, I didn't verify if parser output was passed fully.
-            # Assuming parser output structure is passed correctly.
-            pass
-
-        # Re-iterating to add edges based on the 'calls' list we extracted
-        for file_data in parsed_files:
-            file_path = file_data.get("file_path")
-            functions = file_data.get("functions", [])
-            
-            for func in functions:
-                source_id = self._generate_node_id(file_path, func["name"])
-                calls = func.get("calls", [])
-                
-                for call_name in calls:
-                    potential_matches = name_map.get(call_name, [])
-                    
-                    if not potential_matches:
-                        continue
-                        
-                    # Refinement: Prefer matches in the same file
-                    # Refinement: In real world, we need imports. MVP: Link to all (Mesh) or heuristic.
-                    # Heuristic: Link to all for now (High Recall, Low Precision) to show density.
-                    
-                    for target_id in potential_matches:
+        for node in touched:
+            if node in self.nodes:
+                self._link(node)
+
+        self._compact = None
+        return touched
+
+    def changed_files(self, digests: Dict[str, str]) -> Tuple[List[str], List[str]]:
+        """
+        Compares the files of a scan (path -> content digest) with the ones
+        the graph was built from. Returns (new or changed files, files the
+        graph has that the scan lacks), both sorted.
+        """
+        changed = sorted(f for f, digest in digests.items() if self.digests.get(f) != digest)
+        removed = sorted(f for f in self.units if f not in digests)
+        return changed, removed
+
+    def compact(self) -> CompactGraph:
+        """Frozen array-backed view of the current graph (rebuilt after updates)."""
+        if self._compact is None:
+            self._compact = CompactGraph.from_edges(self.nodes, self.out_edges, self.digests)
+        return self._compact
+
+    @property
+    def graph(self):
+        """networkx view of the graph, for callers that still need one."""
+        return self.compact().to_networkx()
+
+    def _add_file(self, file_data: Dict[str, Any], touched: Set[str], names: Set[str]):
+        file_path = file_data.get("file_path")
+        functions = file_data.get("functions", [])
+        unit = self.units[file_path] = {
+            "language": file_data.get("language", "java"),
+            "package": file_data.get("package", ""),
+            "imports": file_data.get("imports", []),
+            "fields": file_data.get("fields", {}),
+        }
+
+        added = []
+        for func in functions:
+            node_id = self._generate_node_id(file_path, func["name"])
+            self.definitions.setdefault(node_id, {}).setdefault(file_path, []).append(func)
+            self.symbols.add(node_id, unit["package"], func.get("class", ""), func["name"], func.get("arity"),
+                             unit["language"])
+            added.append(node_id)
+            names.add(func["name"])
+
+            # Source text is not kept: it is located by byte offsets instead
+            self.nodes[node_id] = self._node_meta(file_path, func)
+
+        self.file_nodes[file_path] = added
+        for node_id in set(added):
+            self._index_calls(node_id)
+        touched.update(added)
+
+    def _remove_file(self, file_path: str, touched: Set[str], names: Set[str]):
+        unit = self.units.pop(file_path, {})
+        for node_id in set(self.file_nodes.pop(file_path, [])):
+            names.add(self.nodes[node_id]["name"])
+            touched.add(node_id)
+            self._unindex_calls(node_id)
+            defs = self.definitions.get(node_id, {})
+            for func in defs.pop(file_path, []):
+                self.symbols.remove(node_id, unit.get("package", ""), func.get("class", ""),
+                                    func["name"], func.get("arity"))
+            if defs:
+                # Another file defines a node with the same id: restore its metadata
+                owner, funcs = list(defs.items())[-1]
+                self.nodes[node_id] = self._node_meta(owner, funcs[-1])
+                self._index_calls(node_id)
+                continue
+
+            del self.definitions[node_id]
+            del self.nodes[node_id]
+            self.unresolved.pop(node_id, None)
+            self._clear_out_edges(node_id)
+            for source_id in self.in_edges.pop(node_id, ()):
+                self.out_edges[source_id].pop(node_id, None)
+
+    def _node_meta(self, file_path: str, func: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "type": "function",
+            "name": func["name"],
+            "file": file_path,
+            "start_line": func["start_line"],
+            "end_line": func["end_line"],
+            "start_byte": func.get("start_byte", -1),
+            "end_byte": func.get("end_byte", -1),
+            "complexity": func.get("complexity", 1),
+            "loc": func.get("loc", 0),
+        }
+
+    def _clear_out_edges(self, source_id: str):
+        for target_id in self.out_edges.pop(source_id, {}):
+            sources = self.in_edges.get(target_id)
+            if sources:
+                sources.discard(source_id)
+
+    def _calls_of(self, node_id: str) -> List[str]:
+        return [
+            call_name
+            for funcs in self.definitions.get(node_id, {}).values()
+            for func in funcs
+            for call_name in func.get("calls", [])
+        ]
+
+    def _index_calls(self, node_id: str):
+        for call_name in self._calls_of(node_id):
+            self.callers.setdefault(call_name, set()).add(node_id)
+
+    def _unindex_calls(self, node_id: str):
+        for call_name in self._calls_of(node_id):
+            callers = self.callers.get(call_name)
+            if callers:
+                callers.discard(node_id)
+                if not callers:
+                    del self.callers[call_name]
+
+    def _link(self, source_id: str):
+        # Calls are just names plus receiver/arity hints. Each call site is
+        # resolved through the symbol index (same class, imports, package, then
+        # anywhere), and repeated calls to the same target add up their weight.
+        self._clear_out_edges(source_id)
+
+        weights = {}
+        unresolved = []
+        for file_path, funcs in self.definitions.get(source_id, {}).items():
+            unit = self.units.get(file_path, {})
+            for func in funcs:
+                scope = {
+                    "language": unit.get("language", "java"),
+                    "package": unit.get("package", ""),
+                    "imports": unit.get("imports", []),
+                    "class": func.get("class", ""),
+                    "fields": unit.get("fields", {}).get(func.get("class", ""), {}),
+                    "locals": func.get("locals", {}),
+                }
+                call_sites = func.get("call_sites")
+                if call_sites is None:
+                    call_sites = [(call_name, None, None) for call_name in func.get("calls", [])]
+
+                for call_name, receiver, argc in call_sites:
+                    targets = self.symbols.resolve(call_name, receiver, argc, scope)
+                    if not targets:
+                        unresolved.append((file_path, call_name, self.symbols.receiver_type(receiver, scope), argc))
+                    for target_id, weight in targets:
                         if source_id == target_id:
-                            continue # Ignore recursion self-loops for clarity or keep? Let's keep distinct.
-                        
-                        self.graph.add_edge(source_id, target_id, weight=1)
+                            continue # Ignore recursion self-loops for clarity
+                        weights[target_id] = weights.get(target_id, 0.0) + weight
+
+        if unresolved:
+            self.unresolved[source_id] = list(dict.fromkeys(unresolved))
+        else:
+            self.unresolved.pop(source_id, None)
+        if weights:
+            self.out_edges[source_id] = weights
+            for target_id in weights:
+                self.in_edges.setdefault(target_id, set()).add(source_id)
 
     def _generate_node_id(self, file_path: str, func_name: str) -> str:
         # Normalize file path
-        fname = file_path.replace("\\", "/").split("/")[-1]
-        return f"{fname}::{func_name}"
+        rel = os.path.relpath(file_path, self.root) if self.root else file_path
+        return f"{rel.replace(os.sep, '/')}::{func_name}"
+
+    def interface(self) -> Dict[str, Any]:
+        """
+        What other shards of a workspace need to link against this graph,
+        without loading it: the scope of every file, the definitions and
+        the call sites left unresolved here. Node ids and files are as in the graph.
+        """
+        return {
+            "units": {
+                file_path: {"language": unit.get("language", "java"), "package": unit.get("package", ""),
+                            "imports": unit.get("imports", [])}
+                for file_path, unit in self.units.items()
+            },
+            "definitions": [
+                [node_id, self.units.get(file_path, {}).get("package", ""), func.get("class", ""),
+                 func["name"], func.get("arity"), self.units.get(file_path, {}).get("language", "java")]
+                for node_id, defs in self.definitions.items()
+                for file_path, funcs in defs.items()
+                for func in funcs
+            ],
+            "unresolved": [
+                [node_id, *site]
+                for node_id, sites in self.unresolved.items()
+                for site in sites
+            ],
+        }
 
-    def get_graph_data(self) -> Dict[str, Any]:
+    def get_graph_data(self, include_code: bool = True) -> Dict[str, Any]:
         """Return graph data in format compatible with ForceGraph3D (nodes, links)."""
-        data = nx.node_link_data(self.graph)
-        # ForceGraph3D expects "links" not "edges"
-        if "edges" in data:
-            data["links"] = data.pop("edges")
-        return data
+        return self.compact().node_link_data(include_code=include_code)
@@ -0,0 +1,266 @@
+import hashlib
+import numpy as np
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+
+class CompactGraph:
+    """
+    Frozen, array-backed call graph.
+    Node ids are interned to integers 0..n-1, edges live in CSR arrays
+    (indptr/indices/weights) and node metadata is kept column-wise. Source
+    text is not stored: it is sliced by byte offset out of the content the
+    file had when it was parsed (file_digests), found in the snippet store
+    (storage.snippets) when one is attached, else read back from the file
+    if it has not changed since.
+    """
+
+    def __init__(self, node_ids: List[str], names: List[str], kinds: List[str], files: List[str],
+                 file_idx: np.ndarray, start_line: np.ndarray, end_line: np.ndarray,
+                 start_byte: np.ndarray, end_byte: np.ndarray,
+                 complexity: np.ndarray, loc: np.ndarray,
+                 indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray):
+        self.node_ids = node_ids
+        self.index = {node_id: i for i, node_id in enumerate(node_ids)}
+        # Columnar metadata
+        self.names = names
+        self.kinds = kinds
+        self.files = files
+        self.file_digests = [""] * len(files)  # content digest per file ("": unknown)
+        self.file_idx = file_idx
+        self.start_line = start_line
+        self.end_line = end_line
+        self.start_byte = start_byte
+        self.end_byte = end_byte
+        self.complexity = complexity  # cyclomatic complexity per function
+        self.loc = loc  # non-blank lines per function
+        self.cluster = np.full(len(node_ids), -1, dtype=np.int32)
+        # CSR adjacency (out-edges)
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self._reverse = None
+        self._edge_sources = None
+        self.snippets = None  # SnippetStore holding the parsed file contents
+        self.history = None  # per-node git history columns (see history.miner.assign_history)
+
+    @classmethod
+    def from_edges(cls, nodes: Dict[str, Dict[str, Any]], edges: Dict[str, Dict[str, float]],
+                   file_digests: Optional[Dict[str, str]] = None) -> "CompactGraph":
+        """
+        nodes: node id -> metadata (name, type, file, start/end line and byte,
+            complexity, loc)
+        edges: source id -> {target id: weight}
+        file_digests: file -> content digest it was parsed from
+        """
+        node_ids = list(nodes)
+        index = {node_id: i for i, node_id in enumerate(node_ids)}
+        meta = list(nodes.values())
+
+        files = []
+        file_index = {}
+        file_idx = np.empty(len(meta), dtype=np.int32)
+        for i, m in enumerate(meta):
+            fi = file_index.get(m["file"])
+            if fi is None:
+                fi = file_index[m["file"]] = len(files)
+                files.append(m["file"])
+            file_idx[i] = fi
+
+        column = lambda key, dtype: np.fromiter((m.get(key, -1) for m in meta), dtype=dtype, count=len(meta))
+
+        degrees = np.fromiter((len(edges.get(node_id, ())) for node_id in node_ids),
+                              dtype=np.int64, count=len(node_ids))
+        indptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+        np.cumsum(degrees, out=indptr[1:])
+        n_edges = int(indptr[-1])
+        indices = np.fromiter((index[t] for node_id in node_ids for t in edges.get(node_id, ())),
+                              dtype=np.int32, count=n_edges)
+        weights = np.fromiter((w for node_id in node_ids for w in edges.get(node_id, {}).values()),
+                              dtype=np.float32, count=n_edges)
+
+        graph = cls(
+            node_ids,
+            [m["name"] for m in meta],
+            [m.get("type", "function") for m in meta],
+            files,
+            file_idx,
+            column("start_line", np.int32),
+            column("end_line", np.int32),
+            column("start_byte", np.int64),
+            column("end_byte", np.int64),
+            column("complexity", np.int32),
+            column("loc", np.int32),
+            indptr, indices, weights,
+        )
+        if file_digests:
+            graph.file_digests = [file_digests.get(f, "") for f in files]
+        return graph
+
+    def number_of_nodes(self) -> int:
+        return len(self.node_ids)
+
+    def number_of_edges(self) -> int:
+        return len(self.indices)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.index
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    # --- adjacency -------------------------------------------------------
+
+    def edge_sources(self) -> np.ndarray:
+        """Source index of every edge, aligned with indices/weights."""
+        if self._edge_sources is None:
+            self._edge_sources = np.repeat(np.arange(len(self.node_ids), dtype=np.int32), np.diff(self.indptr))
+        return self._edge_sources
+
+    def reverse(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """CSR of in-edges (indptr, indices, weights), built once on demand."""
+        if self._reverse is None:
+            sources = self.edge_sources()
+            order = np.argsort(self.indices, kind="stable")
+            counts = np.bincount(self.indices, minlength=len(self.node_ids))
+            indptr = np.zeros(len(self.node_ids) + 1, dtype=np.int64)
+            np.cumsum(counts, out=indptr[1:])
+            self._reverse = (indptr, sources[order], self.weights[order])
+        return self._reverse
+
+    def successors(self, node_id: str) -> List[str]:
+        i = self.index[node_id]
+        return [self.node_ids[j] for j in self.indices[self.indptr[i]:self.indptr[i + 1]]]
+
+    def predecessors(self, node_id: str) -> List[str]:
+        indptr, indices, _ = self.reverse()
+        i = self.index[node_id]
+        return [self.node_ids[j] for j in indices[indptr[i]:indptr[i + 1]]]
+
+    def undirected_edges(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Edges with direction dropped: (u, v, weight) with u < v, reciprocal
+        edges merged by summing their weights and self-loops removed.
+        """
+        n = len(self.node_ids)
+        src = self.edge_sources().astype(np.int64)
+        dst = self.indices.astype(np.int64)
+        keep = src != dst
+        lo = np.minimum(src, dst)[keep]
+        hi = np.maximum(src, dst)[keep]
+        keys, inverse = np.unique(lo * n + hi, return_inverse=True)
+        weights = np.bincount(inverse, weights=self.weights[keep], minlength=len(keys))
+        return keys // n, keys % n, weights
+
+    def cycles(self) -> np.ndarray:
+        """
+        Call-cycle label of every node: nodes of one strongly connected
+        component of two or more functions share a label 0..k-1 (largest
+        cycle first), everything else is -1. Self-recursion is not a cycle.
+        """
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import connected_components
+
+        n = len(self.node_ids)
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+        adjacency = csr_matrix((np.ones(len(self.indices), dtype=np.int8), self.indices, self.indptr), shape=(n, n))
+        _, labels = connected_components(adjacency, directed=True, connection="strong")
+        sizes = np.bincount(labels)
+        cyclic = np.flatnonzero(sizes > 1)
+        # Largest first, ties by lowest member, so labels do not depend on scipy's numbering
+        first = np.full(len(sizes), n)
+        np.minimum.at(first, labels, np.arange(n))
+        order = cyclic[np.lexsort((first[cyclic], -sizes[cyclic]))]
+        remap = np.full(len(sizes), -1, dtype=np.int64)
+        remap[order] = np.arange(len(order))
+        return remap[labels]
+
+    # --- metadata --------------------------------------------------------
+
+    def file_of(self, i: int) -> str:
+        return self.files[self.file_idx[i]]
+
+    def fan_out(self) -> np.ndarray:
+        """Distinct callees per node."""
+        return np.diff(self.indptr)
+
+    def fan_in(self) -> np.ndarray:
+        """Distinct callers per node."""
+        return np.diff(self.reverse()[0])
+
+    def node_attributes(self, i: int) -> Dict[str, Any]:
+        attrs = {
+            "type": self.kinds[i],
+            "name": self.names[i],
+            "file": self.file_of(i),
+            "start_line": int(self.start_line[i]),
+            "end_line": int(self.end_line[i]),
+            "complexity": int(self.complexity[i]),
+            "loc": int(self.loc[i]),
+        }
+        if self.cluster[i] >= 0:
+            attrs["cluster"] = str(self.cluster[i])
+        if self.history is not None:
+            churn = int(self.history["churn"][i])
+            attrs["churn"] = churn
+            attrs["churn_lines"] = int(self.history["churn_lines"][i])
+            attrs["hotspot"] = churn * attrs["complexity"]
+            if churn:
+                attrs["age_days"] = round((self.history["head_time"] - int(self.history["first_commit"][i])) / 86400, 1)
+                attrs["last_changed"] = int(self.history["last_commit"][i])
+        return attrs
+
+    def source(self, node_id: str) -> Optional[str]:
+        """One function's source text."""
+        return self.sources([self.index[node_id]])[0]
+
+    def sources(self, idx: Sequence[int]) -> List[Optional[str]]:
+        """Source text for many nodes, reading each file only once."""
+        out: List[Optional[str]] = [None] * len(idx)
+        by_file = {}
+        for pos, i in enumerate(idx):
+            by_file.setdefault(self.file_idx[i], []).append((pos, i))
+        for fi, members in by_file.items():
+            digest = self.file_digests[fi]
+            data = self.snippets.read(digest) if self.snippets is not None and digest else None
+            if data is None:
+                try:
+                    with open(self.files[fi], "rb") as f:
+                        data = f.read()
+                except OSError:
+                    continue
+                if digest and hashlib.sha1(data).hexdigest() != digest:
+                    continue  # changed since it was parsed: the offsets no longer apply
+            for pos, i in members:
+                if self.start_byte[i] >= 0:
+                    out[pos] = data[self.start_byte[i]:self.end_byte[i]].decode("utf-8", errors="replace")
+        return out
+
+    # --- adapters --------------------------------------------------------
+
+    def node_link_data(self, include_code: bool = True) -> Dict[str, Any]:
+        """Same shape as nx.node_link_data (with "links"), built from the arrays."""
+        nodes = []
+        for i, node_id in enumerate(self.node_ids):
+            nodes.append({**self.node_attributes(i), "id": node_id})
+        if include_code:
+            for node, code in zip(nodes, self.sources(range(len(nodes)))):
+                node["code"] = code
+        sources = self.edge_sources()
+        links = [
+            {"weight": float(w), "source": self.node_ids[s], "target": self.node_ids[t]}
+            for s, t, w in zip(sources.tolist(), self.indices.tolist(), self.weights.tolist())
+        ]
+        return {"directed": True, "multigraph": False, "graph": {}, "nodes": nodes, "links": links}
+
+    def to_networkx(self) -> "nx.DiGraph":
+        import networkx as nx
+
+        graph = nx.DiGraph()
+        graph.add_nodes_from((node_id, self.node_attributes(i)) for i, node_id in enumerate(self.node_ids))
+        sources = self.edge_sources()
+        graph.add_weighted_edges_from(
+            (self.node_ids[s], self.node_ids[t], w)
+            for s, t, w in zip(sources.tolist(), self.indices.tolist(), self.weights.tolist())
+        )
+        return graph
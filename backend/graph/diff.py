@@ -0,0 +1,213 @@
+import numpy as np
+from typing import List, Dict, Any, Optional
+
+from .compact import CompactGraph
+
+
+def match_nodes(old: CompactGraph, new: CompactGraph) -> np.ndarray:
+    """Index in new of every node of old, matched by id (-1: removed)."""
+    index = new.index
+    return np.fromiter((index.get(n, -1) for n in old.node_ids), dtype=np.int64, count=old.number_of_nodes())
+
+
+def _invert(mapping: np.ndarray, n: int) -> np.ndarray:
+    inverse = np.full(n, -1, dtype=np.int64)
+    kept = np.flatnonzero(mapping >= 0)
+    inverse[mapping[kept]] = kept
+    return inverse
+
+
+def _member(keys: np.ndarray, of: np.ndarray) -> np.ndarray:
+    """keys in of, for keys without duplicates (np.isin would make both unique first)."""
+    of = np.sort(of)
+    pos = np.minimum(np.searchsorted(of, keys), max(len(of) - 1, 0))
+    return of[pos] == keys if len(of) else np.zeros(len(keys), dtype=bool)
+
+
+def _ids(graph: CompactGraph, idx: np.ndarray, limit: int) -> List[str]:
+    return [graph.node_ids[i] for i in idx[:limit].tolist()]
+
+
+def link_changes(old: CompactGraph, new: CompactGraph, old_to_new: np.ndarray, limit: int = 100) -> Dict[str, Any]:
+    """
+    Calls present in only one of the graphs. Edges are keyed by endpoint in
+    one id space (new's indices, then old's removed nodes), so the whole
+    comparison is two sorted-array lookups.
+    "between_existing" counts the changes among functions present in both,
+    i.e. calls rewired rather than added or dropped with their function.
+    """
+    n_new = new.number_of_nodes()
+    removed = old_to_new < 0
+    shared = np.where(removed, n_new + np.cumsum(removed) - 1, old_to_new)
+    m = np.int64(n_new + int(removed.sum()))
+    old_src = shared[old.edge_sources()]
+    old_dst = shared[old.indices]
+    new_keys = new.edge_sources().astype(np.int64) * m + new.indices
+    old_keys = old_src * m + old_dst
+    added = np.flatnonzero(~_member(new_keys, old_keys))
+    dropped = np.flatnonzero(~_member(old_keys, new_keys))
+
+    new_to_old = _invert(old_to_new, n_new)
+    existed = new_to_old >= 0
+    added_between = existed[new.edge_sources()[added]] & existed[new.indices[added]]
+    dropped_between = ~removed[old.edge_sources()[dropped]] & ~removed[old.indices[dropped]]
+    # Rewired calls first: they are what a reviewer has to look at
+    added = np.concatenate([added[added_between], added[~added_between]])
+    dropped = np.concatenate([dropped[dropped_between], dropped[~dropped_between]])
+
+    def records(graph: CompactGraph, edge_idx: np.ndarray) -> List[Dict[str, Any]]:
+        edge_idx = edge_idx[:limit]
+        ids = graph.node_ids
+        return [
+            {"source": ids[s], "target": ids[t], "weight": w}
+            for s, t, w in zip(graph.edge_sources()[edge_idx].tolist(), graph.indices[edge_idx].tolist(),
+                               graph.weights[edge_idx].tolist())
+        ]
+
+    return {
+        "added": len(added),
+        "removed": len(dropped),
+        "added_between_existing": int(added_between.sum()),
+        "removed_between_existing": int(dropped_between.sum()),
+        "added_links": records(new, added),
+        "removed_links": records(old, dropped),
+    }
+
+
+def cluster_migrations(old: CompactGraph, new: CompactGraph, old_to_new: np.ndarray,
+                       old_clusters: Optional[List[Dict[str, Any]]] = None,
+                       new_clusters: Optional[List[Dict[str, Any]]] = None, limit: int = 100) -> Dict[str, Any]:
+    """
+    Cluster ids of two runs need not agree, so every old cluster is matched
+    to the new cluster that received most of its surviving functions. A
+    function migrated when it did not follow its old cluster there; flows
+    aggregate migrations per (old, new) cluster pair, largest first.
+    Old clusters matched by the same new one were merged into it; new
+    clusters nobody matched appeared, old ones without survivors vanished.
+    """
+    kept = np.flatnonzero(old_to_new >= 0)
+    a = old.cluster[kept].astype(np.int64)
+    b = new.cluster[old_to_new[kept]].astype(np.int64)
+    clustered = (a >= 0) & (b >= 0)
+    kept, a, b = kept[clustered], a[clustered], b[clustered]
+    k = int(max(b.max(initial=-1), new.cluster.max(initial=-1))) + 1
+
+    pairs, shared = np.unique(a * k + b, return_counts=True)
+    pair_old, pair_new = pairs // k, pairs % k
+    # Per old cluster, the pair with the most shared functions (ties: lowest new id)
+    order = np.lexsort((pair_new, -shared, pair_old))
+    first = order[np.r_[True, pair_old[order][1:] != pair_old[order][:-1]]] if len(order) else order
+    best = np.full(int(a.max(initial=-1)) + 1, -1, dtype=np.int64)
+    best[pair_old[first]] = pair_new[first]
+
+    old_sizes = np.bincount(old.cluster[old.cluster >= 0].astype(np.int64))
+    new_sizes = np.bincount(new.cluster[new.cluster >= 0].astype(np.int64), minlength=k)
+    old_names = {str(c["id"]): c.get("name") for c in old_clusters or ()}
+    new_names = {str(c["id"]): c.get("name") for c in new_clusters or ()}
+    matches = []
+    for i in first.tolist():
+        o, n, s = int(pair_old[i]), int(pair_new[i]), int(shared[i])
+        matches.append({"old": str(o), "new": str(n), "old_name": old_names.get(str(o)),
+                        "new_name": new_names.get(str(n)), "shared": s,
+                        "jaccard": round(s / (old_sizes[o] + new_sizes[n] - s), 3)})
+
+    moved = np.flatnonzero(b != best[a])
+    flow_pairs, flow_counts = np.unique(a[moved] * k + b[moved], return_counts=True)
+    flow_order = np.argsort(-flow_counts, kind="stable")
+    flows = [{"old": str(int(p // k)), "new": str(int(p % k)), "functions": int(c)}
+             for p, c in zip(flow_pairs[flow_order][:limit].tolist(), flow_counts[flow_order][:limit].tolist())]
+
+    matched_by = np.bincount(best[best >= 0], minlength=k)
+    present_old = np.flatnonzero(old_sizes)
+    present_new = np.flatnonzero(new_sizes)
+    return {
+        "matches": matches,
+        "migrated": len(moved),
+        "flows": flows,
+        "moved": [{"id": old.node_ids[i], "old": str(o), "new": str(n)}
+                  for i, o, n in zip(kept[moved][:limit].tolist(), a[moved][:limit].tolist(),
+                                     b[moved][:limit].tolist())],
+        "merged": [str(c) for c in np.flatnonzero(matched_by > 1).tolist()],
+        "appeared": [str(c) for c in present_new[matched_by[present_new] == 0].tolist()],
+        "vanished": [str(c) for c in present_old.tolist() if c >= len(best) or best[c] < 0],
+    }
+
+
+def _changed_cycles(graph: CompactGraph, labels: np.ndarray, other_labels: np.ndarray,
+                    other_of: np.ndarray, kinds: tuple, limit: int) -> List[Dict[str, Any]]:
+    """
+    Cycles of graph (labels) whose functions were not all in one cycle of the
+    other graph (other_of: their index there). kinds[0] when no two of them
+    shared a cycle there, else kinds[1] (e.g. a cycle that gained functions).
+    """
+    count = int(labels.max(initial=-1)) + 1
+    if count == 0:
+        return []
+    cyclic = np.flatnonzero(labels >= 0)
+    order = cyclic[np.argsort(labels[cyclic], kind="stable")]
+    sizes = np.bincount(labels[cyclic], minlength=count)
+    starts = np.r_[0, np.cumsum(sizes)[:-1]]
+    # -1 (not in the other graph) picks the appended -1, also when the other graph is empty
+    other = np.append(other_labels, -1)[other_of[order]]
+    lo = np.minimum.reduceat(other, starts)
+    hi = np.maximum.reduceat(other, starts)
+    changed = []
+    for c in np.flatnonzero((lo < 0) | (lo != hi)).tolist():
+        before = other[starts[c]:starts[c] + sizes[c]]
+        before = before[before >= 0]
+        kind = kinds[1] if len(before) > len(np.unique(before)) else kinds[0]
+        members = order[starts[c]:starts[c] + sizes[c]]
+        changed.append({"size": int(sizes[c]), "kind": kind, "functions": _ids(graph, members, limit)})
+    return changed
+
+
+def cycle_changes(old: CompactGraph, new: CompactGraph, old_to_new: np.ndarray, limit: int = 100) -> Dict[str, Any]:
+    """
+    Call cycles (see CompactGraph.cycles) that appeared and that were broken
+    up. A cycle counts as new when it makes some functions mutually
+    reachable that were not before ("new", or "grown" from an old cycle),
+    and as removed when some are no longer ("removed", or "split" when
+    part of it is still cyclic). A cycle that kept its functions is neither.
+    """
+    old_labels, new_labels = old.cycles(), new.cycles()
+    new_to_old = _invert(old_to_new, new.number_of_nodes())
+    appeared = _changed_cycles(new, new_labels, old_labels, new_to_old, ("new", "grown"), limit)
+    broken = _changed_cycles(old, old_labels, new_labels, old_to_new, ("removed", "split"), limit)
+    return {
+        "old_count": int(old_labels.max(initial=-1)) + 1,
+        "new_count": int(new_labels.max(initial=-1)) + 1,
+        "new": len(appeared),
+        "removed": len(broken),
+        "new_cycles": appeared[:limit],
+        "removed_cycles": broken[:limit],
+    }
+
+
+def graph_diff(old: CompactGraph, new: CompactGraph, old_clusters: Optional[List[Dict[str, Any]]] = None,
+               new_clusters: Optional[List[Dict[str, Any]]] = None, limit: int = 100) -> Dict[str, Any]:
+    """
+    Architecture changes from old to new (e.g. main and a branch), with
+    functions matched by their stable id (file::name):
+        nodes      added / removed functions
+        links      added / removed calls (see link_changes)
+        clusters   cluster matches, migrations and merges (see cluster_migrations)
+        cycles     call cycles that appeared or were broken (see cycle_changes)
+    Counts are exact; the lists in each section hold at most limit entries.
+    """
+    old_to_new = match_nodes(old, new)
+    new_to_old = _invert(old_to_new, new.number_of_nodes())
+    added = np.flatnonzero(new_to_old < 0)
+    removed = np.flatnonzero(old_to_new < 0)
+    return {
+        "nodes": {
+            "old": old.number_of_nodes(),
+            "new": new.number_of_nodes(),
+            "added": len(added),
+            "removed": len(removed),
+            "added_ids": _ids(new, added, limit),
+            "removed_ids": _ids(old, removed, limit),
+        },
+        "links": link_changes(old, new, old_to_new, limit),
+        "clusters": cluster_migrations(old, new, old_to_new, old_clusters, new_clusters, limit),
+        "cycles": cycle_changes(old, new, old_to_new, limit),
+    }
@@ -0,0 +1,218 @@
+import json
+import numpy as np
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Sequence
+
+from .compact import CompactGraph
+
+# Node fields returned unless the client asks for others; source text is opt-in
+DEFAULT_FIELDS = ("id", "type", "name", "file", "start_line", "end_line", "cluster")
+ALL_FIELDS = DEFAULT_FIELDS + ("complexity", "loc", "fan_in", "fan_out", "code",
+                               "churn", "churn_lines", "hotspot", "age_days", "last_changed")
+
+
+def parse_fields(fields: Optional[str]) -> Sequence[str]:
+    """'id,name,code' -> ('id', 'name', 'code'); None -> DEFAULT_FIELDS."""
+    if not fields:
+        return DEFAULT_FIELDS
+    requested = tuple(f.strip() for f in fields.split(",") if f.strip())
+    unknown = [f for f in requested if f not in ALL_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown node fields: {', '.join(unknown)}")
+    return requested
+
+
+def node_records(graph: CompactGraph, idx: Sequence[int], fields: Sequence[str]) -> List[Dict[str, Any]]:
+    codes = graph.sources(idx) if "code" in fields else None
+    fan_in = graph.fan_in() if "fan_in" in fields else None
+    fan_out = graph.fan_out() if "fan_out" in fields else None
+    records = []
+    for k, i in enumerate(idx):
+        attrs = graph.node_attributes(i)
+        attrs["id"] = graph.node_ids[i]
+        if codes is not None:
+            attrs["code"] = codes[k]
+        if fan_in is not None:
+            attrs["fan_in"] = int(fan_in[i])
+        if fan_out is not None:
+            attrs["fan_out"] = int(fan_out[i])
+        records.append({f: attrs.get(f) for f in fields})
+    return records
+
+
+def link_records(graph: CompactGraph, edge_idx: np.ndarray) -> List[Dict[str, Any]]:
+    sources = graph.edge_sources()[edge_idx]
+    targets = graph.indices[edge_idx]
+    weights = graph.weights[edge_idx]
+    ids = graph.node_ids
+    return [
+        {"source": ids[s], "target": ids[t], "weight": w}
+        for s, t, w in zip(sources.tolist(), targets.tolist(), weights.tolist())
+    ]
+
+
+def clone_links(graph: CompactGraph, clones: Dict[str, Any], start: int = 0,
+                stop: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Links between near-duplicate functions ({"type": "clone"}), for the pairs
+    whose first member is in [start, stop), so pages deliver each once.
+    """
+    pairs = clones["pairs"]
+    stop = graph.number_of_nodes() if stop is None else stop
+    keep = np.flatnonzero((pairs[:, 0] >= start) & (pairs[:, 0] < stop)) if len(pairs) else []
+    ids = graph.node_ids
+    return [
+        {"source": ids[pairs[k, 0]], "target": ids[pairs[k, 1]], "type": "clone",
+         "similarity": round(float(clones["similarity"][k]), 3)}
+        for k in np.asarray(keep).tolist()
+    ]
+
+
+def graph_page(graph: CompactGraph, offset: int, limit: int, fields: Sequence[str]) -> Dict[str, Any]:
+    """
+    One page of nodes plus the links whose source is on that page, so every
+    link is delivered exactly once across all pages.
+    """
+    n = graph.number_of_nodes()
+    start = max(0, min(offset, n))
+    stop = min(n, start + max(0, limit))
+    edges = np.arange(graph.indptr[start], graph.indptr[stop])
+    return {
+        "nodes": node_records(graph, range(start, stop), fields),
+        "links": link_records(graph, edges),
+        "total_nodes": n,
+        "total_links": graph.number_of_edges(),
+        "offset": start,
+        "next_offset": stop if stop < n else None,
+    }
+
+
+def iter_ndjson(graph: CompactGraph, fields: Sequence[str], batch_size: int = 2000) -> Iterator[bytes]:
+    """
+    Streams the graph as newline-delimited JSON: all nodes ({"kind": "node", ...})
+    followed by all links ({"kind": "link", ...}), in chunks of batch_size lines.
+    """
+    n = graph.number_of_nodes()
+    for start in range(0, n, batch_size):
+        records = node_records(graph, range(start, min(n, start + batch_size)), fields)
+        yield "".join(json.dumps({"kind": "node", **r}) + "\n" for r in records).encode("utf-8")
+
+    m = graph.number_of_edges()
+    for start in range(0, m, batch_size):
+        records = link_records(graph, np.arange(start, min(m, start + batch_size)))
+        yield "".join(json.dumps({"kind": "link", **r}) + "\n" for r in records).encode("utf-8")
+
+
+def _supernode_id(cid: int) -> str:
+    return f"cluster:{cid}"
+
+
+def cluster_overview(graph: CompactGraph, clusters: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Level-of-detail view: one supernode per cluster and one link per pair of
+    clusters connected by calls (weight summed, count of underlying edges).
+    """
+    info = {str(c["id"]): c for c in clusters or []}
+    labels = graph.cluster
+    present, sizes = np.unique(labels, return_counts=True)
+    nodes = [
+        {
+            "id": _supernode_id(int(cid)),
+            "type": "cluster",
+            "cluster": str(cid),
+            "name": info.get(str(cid), {}).get("name") or f"Cluster {cid}",
+            "node_count": int(size),
+            "risk_score": info.get(str(cid), {}).get("risk_score"),
+        }
+        for cid, size in zip(present.tolist(), sizes.tolist())
+    ]
+
+    src = labels[graph.edge_sources()].astype(np.int64)
+    dst = labels[graph.indices].astype(np.int64)
+    between = src != dst
+    links = []
+    if between.any():
+        base = int(labels.max()) + 2  # labels start at -1 (unclustered)
+        keys = (src[between] + 1) * base + (dst[between] + 1)
+        unique, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        weights = np.bincount(inverse, weights=graph.weights[between])
+        for key, count, weight in zip(unique.tolist(), counts.tolist(), weights.tolist()):
+            links.append({
+                "source": _supernode_id(key // base - 1),
+                "target": _supernode_id(key % base - 1),
+                "weight": weight,
+                "edge_count": count,
+            })
+    return {"nodes": nodes, "links": links, "lod": "cluster"}
+
+
+def cluster_subgraph(graph: CompactGraph, cluster_id: int, fields: Sequence[str]) -> Dict[str, Any]:
+    """
+    Drill-in view of one cluster: its nodes, the links between them, and its
+    links to and from other clusters collapsed onto their supernodes.
+    """
+    labels = graph.cluster
+    members = np.nonzero(labels == cluster_id)[0]
+    sources = graph.edge_sources()
+    from_member = labels[sources] == cluster_id
+    to_member = labels[graph.indices] == cluster_id
+    internal = np.nonzero(from_member & to_member)[0]
+
+    external = {}
+    for e in np.nonzero(from_member != to_member)[0].tolist():
+        s, t = int(sources[e]), int(graph.indices[e])
+        if from_member[e]:
+            key = (graph.node_ids[s], _supernode_id(int(labels[t])))
+        else:
+            key = (_supernode_id(int(labels[s])), graph.node_ids[t])
+        external[key] = external.get(key, 0.0) + float(graph.weights[e])
+
+    return {
+        "nodes": node_records(graph, members.tolist(), fields),
+        "links": link_records(graph, internal),
+        "external_links": [
+            {"source": s, "target": t, "weight": w} for (s, t), w in external.items()
+        ],
+        "cluster": str(cluster_id),
+        "lod": "node",
+    }
+
+
+def _out_links(graph: CompactGraph, node_id: str) -> Dict[str, float]:
+    i = graph.index.get(node_id)
+    if i is None:
+        return {}
+    lo, hi = graph.indptr[i], graph.indptr[i + 1]
+    return {graph.node_ids[t]: w for t, w in zip(graph.indices[lo:hi].tolist(), graph.weights[lo:hi].tolist())}
+
+
+def graph_delta(old: CompactGraph, new: CompactGraph, changed: Iterable[str], fields: Sequence[str]) -> Dict[str, Any]:
+    """
+    What a client holding old must apply to get new, given the ids of every
+    node that may differ (added, removed, relinked or reclustered):
+        nodes.added / nodes.updated   node records with fields
+        nodes.removed                 ids; their links go with them
+        links.added                   new or re-weighted links
+        links.removed                 {"source", "target"} of dropped links
+    """
+    changed = sorted(set(changed))
+    added = [n for n in changed if n in new and n not in old]
+    removed = [n for n in changed if n in old and n not in new]
+    updated = [
+        n for n in changed
+        if n in new and n in old and new.node_attributes(new.index[n]) != old.node_attributes(old.index[n])
+    ]
+    links_added, links_removed = [], []
+    for n in changed:
+        before, after = _out_links(old, n), _out_links(new, n)
+        if n in new:
+            links_added += [{"source": n, "target": t, "weight": w} for t, w in after.items() if before.get(t) != w]
+        if n in old and n in new:
+            links_removed += [{"source": n, "target": t} for t in before if t not in after]
+    return {
+        "nodes": {
+            "added": node_records(new, [new.index[n] for n in added], fields),
+            "updated": node_records(new, [new.index[n] for n in updated], fields),
+            "removed": removed,
+        },
+        "links": {"added": links_added, "removed": links_removed},
+    }
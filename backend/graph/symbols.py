@@ -0,0 +1,185 @@
+from typing import List, Dict, Any, Optional, Tuple
+
+
+def qualified_name(package: str, class_name: str) -> str:
+    return f"{package}.{class_name}" if package else class_name
+
+
+def _add(index: Dict, key, node_id: str):
+    index.setdefault(key, []).append(node_id)
+
+
+def _remove(index: Dict, key, node_id: str):
+    nodes = index.get(key)
+    if nodes and node_id in nodes:
+        nodes.remove(node_id)
+        if not nodes:
+            del index[key]
+
+
+def _shared_prefix(a: List[str], b: List[str]) -> int:
+    count = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        count += 1
+    return count
+
+
+class SymbolIndex:
+    """
+    Lookup tables used to resolve call sites to function nodes.
+    Every definition is indexed by (class, name), (package, name) and name,
+    so resolving a call is a handful of dict lookups instead of a scan over
+    all homonyms. Calls only resolve to functions of the caller's language.
+    """
+
+    def __init__(self, max_fanout: int = 5):
+        self.max_fanout = max_fanout
+        self.by_class: Dict[Tuple[str, str], List[str]] = {}    # (class fqn, name) -> nodes
+        self.by_package: Dict[Tuple[str, str], List[str]] = {}  # (package, name) -> nodes
+        self.by_name: Dict[str, List[str]] = {}                 # name -> nodes
+        self.classes: Dict[str, List[str]] = {}                 # simple class name -> fqns
+        self.arities: Dict[str, List[int]] = {}                 # node -> declared arities
+        self.languages: Dict[str, str] = {}                     # node -> language
+        self.packages: Dict[str, str] = {}                      # node -> package
+
+    def add(self, node_id: str, package: str, class_name: str, name: str, arity: Optional[int],
+            language: str = "java"):
+        fqn = qualified_name(package, class_name)
+        if node_id not in self.arities:
+            _add(self.by_name, name, node_id)
+        self.languages[node_id] = language
+        self.packages[node_id] = package
+        _add(self.by_class, (fqn, name), node_id)
+        _add(self.by_package, (package, name), node_id)
+        _add(self.classes, class_name, fqn)
+        _add(self.arities, node_id, arity)
+
+    def remove(self, node_id: str, package: str, class_name: str, name: str, arity: Optional[int]):
+        fqn = qualified_name(package, class_name)
+        _remove(self.by_class, (fqn, name), node_id)
+        _remove(self.by_package, (package, name), node_id)
+        _remove(self.classes, class_name, fqn)
+        arities = self.arities.get(node_id)
+        if arities and arity in arities:
+            arities.remove(arity)
+        if not arities:
+            self.arities.pop(node_id, None)
+            self.languages.pop(node_id, None)
+            self.packages.pop(node_id, None)
+            _remove(self.by_name, name, node_id)
+
+    def resolve(self, name: str, receiver: Optional[str], argc: Optional[int],
+                scope: Dict[str, Any]) -> List[Tuple[str, float]]:
+        """
+        Resolves one call site to [(node_id, weight)].
+        scope describes the calling function: package, class, imports,
+        fields (of its class) and locals.
+        A receiver of known type is looked up on that type; otherwise candidates
+        are ranked: same class, then imported types, then same package, then
+        anywhere. Within a tier, candidates in packages closer to the caller's
+        come first (then by node id). Ambiguous results are capped at
+        max_fanout in that order and share a weight of 1.
+        """
+        return self._resolve(name, self.receiver_type(receiver, scope), argc, scope, anywhere=True)
+
+    def resolve_external(self, name: str, receiver_type: Optional[str], argc: Optional[int],
+                         scope: Dict[str, Any]) -> List[Tuple[str, float]]:
+        """
+        Resolves a call site left unresolved by another index (see
+        GraphBuilder.interface), whose receiver type is already known.
+        The "anywhere" tier is skipped: across repositories only typed,
+        imported or same-package calls are linked.
+        """
+        return self._resolve(name, receiver_type, argc, scope, anywhere=False)
+
+    def _resolve(self, name: str, receiver_type: Optional[str], argc: Optional[int],
+                 scope: Dict[str, Any], anywhere: bool) -> List[Tuple[str, float]]:
+        language = scope.get("language", "java")
+        same_language = lambda nodes: [n for n in nodes if self.languages.get(n) == language]
+        candidates = []
+        if receiver_type is not None:
+            class_fqns = self._class_candidates(receiver_type, scope)
+            if not class_fqns:
+                return []  # external type (JDK, library): nothing to link to
+            for fqn in class_fqns:
+                candidates.extend(self.by_class.get((fqn, name), ()))
+            candidates = same_language(candidates)
+
+        if not candidates:
+            for tier in self._tiers(name, scope, anywhere):
+                tier = same_language(tier)
+                if tier:
+                    candidates = tier
+                    break
+
+        candidates = list(dict.fromkeys(candidates))
+        if argc is not None:
+            exact = [n for n in candidates if argc in self.arities.get(n, ())]
+            candidates = exact or candidates
+        if not candidates:
+            return []
+
+        if len(candidates) > 1:
+            caller = scope.get("package", "").split(".")
+            rank = lambda n: (-_shared_prefix(self.packages.get(n, "").split("."), caller), n)
+            candidates = sorted(candidates, key=rank)
+        candidates = candidates[:self.max_fanout]
+        weight = 1.0 / len(candidates)
+        return [(node_id, weight) for node_id in candidates]
+
+    def receiver_type(self, receiver: Optional[str], scope: Dict[str, Any]) -> Optional[str]:
+        """The type a call's receiver is declared with in scope, if known."""
+        if receiver is None or receiver == "this":
+            return None  # unqualified: same class first, then the ranked tiers
+        fields = scope.get("fields", {})
+        if receiver.startswith("this.") and receiver[5:].isidentifier():
+            return fields.get(receiver[5:])
+        if not receiver.isidentifier():
+            return None  # chained call or expression: type unknown
+        type_name = scope.get("locals", {}).get(receiver) or fields.get(receiver)
+        if type_name == "var":
+            return None
+        if type_name:
+            return type_name
+        if receiver[0].isupper():
+            return receiver  # static call on a type
+        return None
+
+    def _class_candidates(self, type_name: str, scope: Dict[str, Any]) -> List[str]:
+        known = self.classes.get(type_name)
+        if not known:
+            return []
+        package = scope.get("package", "")
+        if type_name == scope.get("class"):
+            return [qualified_name(package, type_name)]
+        imports = scope.get("imports", [])
+        for imp in imports:
+            if imp.endswith("." + type_name) and imp in known:
+                return [imp]
+        local = qualified_name(package, type_name)
+        if local in known:
+            return [local]
+        wildcard = [f"{imp[:-2]}.{type_name}" for imp in imports if imp.endswith(".*")]
+        wildcard = [fqn for fqn in wildcard if fqn in known]
+        return wildcard or sorted(set(known))
+
+    def _tiers(self, name: str, scope: Dict[str, Any], anywhere: bool = True):
+        package = scope.get("package", "")
+        yield self.by_class.get((qualified_name(package, scope.get("class", "")), name), [])
+
+        imported = []
+        for imp in scope.get("imports", []):
+            if imp.endswith(".*"):
+                imported.extend(self.by_package.get((imp[:-2], name), ()))
+            elif imp.endswith("." + name):
+                # static import of the method itself
+                imported.extend(self.by_class.get((imp.rsplit(".", 1)[0], name), ()))
+            else:
+                imported.extend(self.by_class.get((imp, name), ()))
+        yield imported
+
+        yield self.by_package.get((package, name), [])
+        if anywhere:
+            yield self.by_name.get(name, [])
@@ -0,0 +1,452 @@
+import difflib
+import hashlib
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..graph.compact import CompactGraph
+from ..ingestion.scanner import LANGUAGE_EXTENSIONS, DEFAULT_MAX_FILE_SIZE
+from ..parsing.cache import DEFAULT_CACHE_DIR
+from ..parsing.languages import ParserRegistry
+from ..parsing.parser import PARSER_VERSION
+from .objects import GitObjectStore, find_repository
+
+# Bumped whenever the per-commit records change, so cached commits are re-analysed
+HISTORY_VERSION = 2
+
+SOURCE_EXTENSIONS = tuple(ext for exts in LANGUAGE_EXTENSIONS.values() for ext in exts)
+
+# Each worker process opens the object store and its parsers once
+_WORKER = None
+
+
+def _init_worker(top: str, max_file_size: int):
+    global _WORKER
+    _WORKER = (GitObjectStore(top), ParserRegistry(), max_file_size)
+
+
+def changed_lines(old: Sequence[bytes], new: Sequence[bytes]) -> Tuple[int, int, List[Tuple[int, int]], List[int]]:
+    """
+    Line diff: (lines added, lines deleted, [(first, last)] 1-based ranges of
+    added or rewritten lines in new, [new line after which lines were only deleted]).
+    The common head and tail are cut off before difflib sees the rest.
+    """
+    head = 0
+    limit = min(len(old), len(new))
+    while head < limit and old[head] == new[head]:
+        head += 1
+    tail = 0
+    while tail < limit - head and old[-1 - tail] == new[-1 - tail]:
+        tail += 1
+    a = old[head:len(old) - tail]
+    b = new[head:len(new) - tail]
+    added = deleted = 0
+    ranges, deletions = [], []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b).get_opcodes():
+        if tag == "equal":
+            continue
+        added += j2 - j1
+        deleted += i2 - i1
+        if j2 > j1:
+            ranges.append((head + j1 + 1, head + j2))
+        else:
+            deletions.append(head + j1)
+    return added, deleted, ranges, deletions
+
+
+def touched_functions(functions: List[Dict[str, Any]], ranges: List[Tuple[int, int]],
+                      deletions: List[int]) -> Dict[str, int]:
+    """Function name -> changed lines inside it (a pure deletion counts as one)."""
+    touched = {}
+    for func in functions:
+        start, end = func["start_line"], func["end_line"]
+        lines = sum(max(0, min(end, last) - max(start, first) + 1) for first, last in ranges)
+        lines += sum(1 for after in deletions if start <= after < end)
+        if lines:
+            touched[func["name"]] = touched.get(func["name"], 0) + lines
+    return touched
+
+
+def _similarity(a: bytes, b: bytes) -> float:
+    """Share of distinct lines two versions have in common (git counts 50% as a rename)."""
+    a_lines = set(a.splitlines())
+    b_lines = set(b.splitlines())
+    return len(a_lines & b_lines) / max(len(a_lines), len(b_lines), 1)
+
+
+def commit_changes(store: GitObjectStore, registry: ParserRegistry, tree: str, parent_tree: Optional[str],
+                   max_file_size: int = DEFAULT_MAX_FILE_SIZE, rename_threshold: float = 0.5,
+                   max_rename_candidates: int = 100) -> List[list]:
+    """
+    The source files a commit changed relative to its parent tree, as
+    [path, old path, lines added, lines deleted, {function: changed lines}]:
+    path is None for a deletion, old path None for an addition, and differs
+    from path for a rename. Renames are paired by content: the same blob, or
+    else the most similar deleted file of the same extension, as git does.
+    """
+    diff = [(p, a, b) for p, a, b in store.diff_trees(parent_tree, tree) if p.endswith(SOURCE_EXTENSIONS)]
+    deleted = {p: a for p, a, b in diff if b is None}
+    added = {p: b for p, a, b in diff if a is None}
+    old_path = {p: p for p, a, b in diff if a is not None and b is not None}
+    by_blob = {}
+    for path, sha in deleted.items():
+        by_blob.setdefault(sha, path)
+    for path, sha in added.items():
+        source = by_blob.pop(sha, None)
+        if source is not None:
+            old_path[path] = source
+    unpaired = [p for p in deleted if p not in old_path.values()]
+    candidates = [p for p in added if p not in old_path]
+    if unpaired and candidates and len(unpaired) * len(candidates) <= max_rename_candidates ** 2:
+        old_blobs = {p: store.blob(deleted[p]) for p in unpaired}
+        for path in candidates:
+            new = store.blob(added[path])
+            scored = [(_similarity(old_blobs[p], new), p) for p in unpaired
+                      if os.path.splitext(p)[1] == os.path.splitext(path)[1]]
+            score, source = max(scored, default=(0.0, None))
+            if source is not None and score >= rename_threshold:
+                old_path[path] = source
+                unpaired.remove(source)
+
+    changes = [[None, path, 0, 0, {}] for path in deleted if path not in old_path.values()]
+    for path, old_sha, new_sha in diff:
+        if new_sha is None:
+            continue
+        source = old_path.get(path)
+        if source is not None and old_sha is None:
+            old_sha = deleted[source]
+        if old_sha == new_sha:
+            changes.append([path, source, 0, 0, {}])  # pure rename
+            continue
+        new = store.blob(new_sha)
+        if len(new) > max_file_size:
+            continue
+        old_lines = store.blob(old_sha).splitlines() if old_sha else []
+        added_lines, deleted_lines, ranges, deletions = changed_lines(old_lines, new.splitlines())
+        try:
+            functions = registry.parser_for(path).parse_unit(new)["functions"]
+        except Exception as e:
+            print(f"History: could not parse {path}@{new_sha[:8]}: {e}", flush=True)
+            functions = []
+        changes.append([path, source, added_lines, deleted_lines, touched_functions(functions, ranges, deletions)])
+    return changes
+
+
+def _analyse_batch(tasks):
+    store, registry, max_file_size = _WORKER
+    return [commit_changes(store, registry, tree, parent_tree, max_file_size) for tree, parent_tree in tasks]
+
+
+class HistoryCache:
+    """
+    Per-commit records of one repository (sqlite, keyed by commit sha).
+    Commits never change, so a record is computed once; the parent links
+    are stored too, so walking known history reads no git objects at all.
+    """
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        version = f"{HISTORY_VERSION}.{PARSER_VERSION}"
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != version:
+            self.conn.execute("DROP TABLE IF EXISTS commits")
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (version,))
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS commits (
+                sha TEXT PRIMARY KEY,
+                tree TEXT,
+                parents TEXT,
+                time INTEGER,
+                author TEXT,
+                changes TEXT
+            )"""
+        )
+        self.conn.commit()
+
+    @classmethod
+    def for_repository(cls, git_dir: str, cache_dir: Optional[str] = None) -> "HistoryCache":
+        cache_dir = cache_dir or os.environ.get("CODE_ARC_CACHE_DIR", DEFAULT_CACHE_DIR)
+        key = hashlib.sha1(os.path.abspath(git_dir).encode("utf-8")).hexdigest()[:16]
+        return cls(os.path.join(cache_dir, f"history-{key}.sqlite"))
+
+    def load(self) -> Dict[str, dict]:
+        return {
+            sha: {"sha": sha, "tree": tree, "parents": parents.split(), "time": time, "author": author,
+                  "changes": json.loads(changes)}
+            for sha, tree, parents, time, author, changes in
+            self.conn.execute("SELECT sha, tree, parents, time, author, changes FROM commits")
+        }
+
+    def add(self, commits: List[dict]):
+        self.conn.executemany("INSERT OR REPLACE INTO commits VALUES (?, ?, ?, ?, ?, ?)", [
+            (c["sha"], c["tree"], " ".join(c["parents"]), c["time"], c["author"], json.dumps(c["changes"]))
+            for c in commits
+        ])
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class HistoryMiner:
+    """
+    Churn, age and co-change coupling from the git history of the repository
+    holding root_path, read from its object store (see GitObjectStore).
+    Every commit reachable from HEAD is diffed against its parent: per file,
+    lines added and deleted; per function, the changed lines that fall in
+    it (functions are located by parsing the new version). Merge commits
+    are skipped, as their changes are counted on the merged branch.
+    Records are cached per commit (HistoryCache), so a rerun only reads the
+    commits made since, and those are analysed on a process pool.
+    """
+
+    def __init__(self, root_path: str, workers: Optional[int] = None, batch_size: int = 32,
+                 coupling_max_files: int = 30, min_coupling: int = 2,
+                 max_file_size: int = DEFAULT_MAX_FILE_SIZE):
+        self.root = os.path.abspath(root_path)
+        self.top, self.prefix = find_repository(root_path)
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.coupling_max_files = coupling_max_files
+        self.min_coupling = min_coupling
+        self.max_file_size = max_file_size
+
+    def head(self) -> Optional[str]:
+        store = GitObjectStore(self.top)
+        try:
+            return store.resolve("HEAD")
+        finally:
+            store.close()
+
+    def mine(self, progress: Optional[Callable[[int, Optional[int]], None]] = None,
+             should_stop: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+        """
+        {"head", "head_time", "commits", "new_commits", "files", "methods",
+        "coupling"}: files maps paths (relative to root_path) to their
+        commits, lines added/deleted, first/last commit times and authors;
+        methods maps path -> function name -> commits, changed lines and
+        first/last commit times; coupling lists [file, file, commits together].
+        """
+        store = GitObjectStore(self.top)
+        cache = HistoryCache.for_repository(store.common_dir)
+        try:
+            head = store.resolve("HEAD")
+            known = cache.load()
+            commits, new = self._walk(store, head, known)
+            if progress:
+                progress(0, len(new))
+            self._analyse(store, commits, new, cache, progress, should_stop)
+        finally:
+            cache.close()
+            store.close()
+        result = self.aggregate(commits, head)
+        result.update({"head": head, "new_commits": len(new)})
+        return result
+
+    def _walk(self, store: GitObjectStore, head: Optional[str], known: Dict[str, dict]):
+        """All commits reachable from head (cached ones from the cache) and the shas read anew."""
+        commits, new = {}, []
+        stack = [head] if head else []
+        while stack:
+            sha = stack.pop()
+            if sha in commits:
+                continue
+            commit = known.get(sha)
+            if commit is None:
+                try:
+                    commit = store.commit(sha)
+                except KeyError:
+                    continue  # beyond a shallow clone's boundary
+                commit["changes"] = None
+                new.append(sha)
+            commits[sha] = commit
+            stack.extend(commit["parents"])
+        return commits, new
+
+    def _analyse(self, store, commits, new, cache, progress, should_stop):
+        tasks = []
+        for sha in new:
+            commit = commits[sha]
+            parents = commit["parents"]
+            if len(parents) > 1:
+                commit["changes"] = []  # merge
+            elif parents and parents[0] not in commits:
+                commit["changes"] = []  # shallow boundary: the parent's tree is not here
+            else:
+                tasks.append((sha, (commit["tree"], commits[parents[0]]["tree"] if parents else None)))
+        done = [commits[sha] for sha in new if commits[sha]["changes"] is not None]
+        count = [len(done)]
+
+        def collect(batch, results):
+            for (sha, _), changes in zip(batch, results):
+                commits[sha]["changes"] = changes
+                done.append(commits[sha])
+            count[0] += len(batch)
+            if len(done) >= 1000:
+                cache.add(done)
+                del done[:]
+            if progress:
+                progress(count[0], len(new))
+
+        batches = [tasks[k:k + self.batch_size] for k in range(0, len(tasks), self.batch_size)]
+        if self.workers <= 1 or len(batches) <= 1:
+            _init_worker(self.top, self.max_file_size)
+            for batch in batches:
+                if should_stop and should_stop():
+                    break
+                collect(batch, _analyse_batch([task for _, task in batch]))
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(self.top, self.max_file_size)) as pool:
+                futures = [(batch, pool.submit(_analyse_batch, [task for _, task in batch])) for batch in batches]
+                for batch, future in futures:
+                    if should_stop and should_stop():
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        break
+                    collect(batch, future.result())
+        cache.add(done)  # what was finished survives a cancelled run
+
+    @staticmethod
+    def topological_order(commits: Dict[str, dict], head: Optional[str]) -> List[str]:
+        """Shas with every commit after its parents (commit dates can be skewed, so not by time)."""
+        order, visited = [], set()
+        stack = [(head, False)] if head in commits else []
+        while stack:
+            sha, expanded = stack.pop()
+            if expanded:
+                order.append(sha)
+                continue
+            if sha in visited:
+                continue
+            visited.add(sha)
+            stack.append((sha, True))
+            stack.extend((p, False) for p in reversed(commits[sha]["parents"]) if p in commits and p not in visited)
+        return order
+
+    def aggregate(self, commits: Dict[str, dict], head: Optional[str]) -> Dict[str, Any]:
+        """Replays the per-commit records parents first (renames carry a file's history along)."""
+        files: Dict[str, list] = {}    # path -> [commits, added, deleted, first, last, authors]
+        methods: Dict[str, Dict[str, list]] = {}  # path -> name -> [commits, lines, first, last]
+        pairs: Dict[Tuple[str, str], int] = {}
+        renames: Dict[str, str] = {}
+        for sha in self.topological_order(commits, head):
+            commit = commits[sha]
+            if not commit["changes"]:
+                continue
+            t, author = commit["time"], commit["author"]
+            changed = []
+            for path, old_path, added, deleted, functions in commit["changes"]:
+                if path is None:
+                    files.pop(old_path, None)
+                    methods.pop(old_path, None)
+                    continue
+                if old_path is not None and old_path != path:
+                    if old_path in files:
+                        files[path] = files.pop(old_path)
+                    if old_path in methods:
+                        methods[path] = methods.pop(old_path)
+                    renames[old_path] = path
+                    if not (added or deleted or functions):
+                        continue  # moved, not changed
+                stats = files.get(path)
+                if stats is None:
+                    stats = files[path] = [0, 0, 0, t, t, set()]
+                stats[0] += 1
+                stats[1] += added
+                stats[2] += deleted
+                stats[3] = min(stats[3], t)
+                stats[4] = max(stats[4], t)
+                stats[5].add(author)
+                per_file = methods.setdefault(path, {})
+                for name, lines in functions.items():
+                    m = per_file.get(name)
+                    if m is None:
+                        m = per_file[name] = [0, 0, t, t]
+                    m[0] += 1
+                    m[1] += lines
+                    m[2] = min(m[2], t)
+                    m[3] = max(m[3], t)
+                changed.append(path)
+            if 2 <= len(changed) <= self.coupling_max_files:
+                for a, b in combinations(sorted(set(changed)), 2):
+                    pairs[(a, b)] = pairs.get((a, b), 0) + 1
+
+        def current(path):
+            seen = set()
+            while path in renames and path not in seen:
+                seen.add(path)
+                path = renames[path]
+            return path
+
+        coupled: Dict[Tuple[str, str], int] = {}
+        for (a, b), count in pairs.items():
+            a, b = current(a), current(b)
+            if a != b and a in files and b in files:
+                key = (a, b) if a < b else (b, a)
+                coupled[key] = coupled.get(key, 0) + count
+
+        prefix = self.prefix
+        strip = lambda path: path[len(prefix):]
+        return {
+            "head_time": max((c["time"] for c in commits.values()), default=0),
+            "commits": len(commits),
+            "files": {
+                strip(p): {"commits": s[0], "added": s[1], "deleted": s[2], "first": s[3], "last": s[4],
+                           "authors": len(s[5])}
+                for p, s in files.items() if p.startswith(prefix)
+            },
+            "methods": {strip(p): m for p, m in methods.items() if p.startswith(prefix)},
+            "coupling": sorted(
+                ([strip(a), strip(b), n] for (a, b), n in coupled.items()
+                 if n >= self.min_coupling and a.startswith(prefix) and b.startswith(prefix)),
+                key=lambda pair: (-pair[2], pair[0], pair[1]),
+            ),
+        }
+
+
+def assign_history(graph: CompactGraph, history: Dict[str, Any]):
+    """
+    Per-node history columns on graph.history, from the mined methods: commits
+    that changed the function, its changed lines and first/last commit times.
+    """
+    n = graph.number_of_nodes()
+    churn = np.zeros(n, dtype=np.int32)
+    lines = np.zeros(n, dtype=np.int32)
+    first = np.zeros(n, dtype=np.int64)
+    last = np.zeros(n, dtype=np.int64)
+    methods = history["methods"]
+    for i, node_id in enumerate(graph.node_ids):
+        rel, _, name = node_id.rpartition("::")
+        m = methods.get(rel, {}).get(name)
+        if m is not None:
+            churn[i], lines[i], first[i], last[i] = m
+    graph.history = {"churn": churn, "churn_lines": lines, "first_commit": first, "last_commit": last,
+                     "head_time": history["head_time"]}
+
+
+def carry_history(old: CompactGraph, new: CompactGraph):
+    """Keeps the history columns of nodes still present after a graph update (new ones start at 0)."""
+    if old.history is None:
+        return
+    n = new.number_of_nodes()
+    idx = np.array([old.index.get(node_id, -1) for node_id in new.node_ids], dtype=np.int64)
+    present = idx >= 0
+    columns = {}
+    for name in ("churn", "churn_lines", "first_commit", "last_commit"):
+        values = old.history[name]
+        column = np.zeros(n, dtype=values.dtype)
+        column[present] = values[idx[present]]
+        columns[name] = column
+    new.history = {**columns, "head_time": old.history["head_time"]}
+
+
+def history_summary(history: Dict[str, Any]) -> Dict[str, Any]:
+    """What a repository state keeps of a mining result: no per-method table (that lives on the graph)."""
+    return {k: v for k, v in history.items() if k != "methods"}
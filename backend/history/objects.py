@@ -0,0 +1,364 @@
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from ..ingestion.gitindex import git_dir
+
+OBJ_COMMIT, OBJ_TREE, OBJ_BLOB, OBJ_TAG, OBJ_OFS_DELTA, OBJ_REF_DELTA = 1, 2, 3, 4, 6, 7
+TYPE_NAMES = {OBJ_COMMIT: "commit", OBJ_TREE: "tree", OBJ_BLOB: "blob", OBJ_TAG: "tag"}
+_TREE = b"40000"  # tree entry modes are written without leading zeros
+_GITLINK = b"160000"  # submodule
+_TREE_ENTRY = re.compile(rb"(\d+) ([^\0]*)\0(.{20})", re.S)
+
+
+def find_repository(path: str) -> Tuple[str, str]:
+    """(top-level working tree, path of path below it with "/" separators and a trailing "/", or "")."""
+    top = os.path.abspath(path)
+    prefix = ""
+    while git_dir(top) is None:
+        parent = os.path.dirname(top)
+        if parent == top:
+            raise ValueError(f"Not a git repository: {path}")
+        prefix = os.path.basename(top) + "/" + prefix
+        top = parent
+    return top, prefix
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """Rebuilds an object from its delta against base (git's copy/insert instruction stream)."""
+    pos = 0
+    for _ in range(2):  # source and target sizes (varints), not needed here
+        while delta[pos] & 0x80:
+            pos += 1
+        pos += 1
+    out = bytearray()
+    n = len(delta)
+    while pos < n:
+        op = delta[pos]
+        pos += 1
+        if op & 0x80:
+            offset = size = 0
+            for k in range(4):
+                if op & (1 << k):
+                    offset |= delta[pos] << (8 * k)
+                    pos += 1
+            for k in range(3):
+                if op & (0x10 << k):
+                    size |= delta[pos] << (8 * k)
+                    pos += 1
+            out += base[offset:offset + (size or 0x10000)]
+        elif op:
+            out += delta[pos:pos + op]
+            pos += op
+        else:
+            raise ValueError("Invalid delta instruction")
+    return bytes(out)
+
+
+def _inflate(data, pos: int, size: int) -> bytes:
+    """Decompresses the zlib stream at data[pos:] whose output is size bytes."""
+    d = zlib.decompressobj()
+    parts = []
+    chunk = max(size + 64, 4096)
+    while not d.eof:
+        buf = data[pos:pos + chunk]
+        if not buf:
+            raise ValueError("Truncated object")
+        parts.append(d.decompress(buf))
+        pos += chunk
+    return b"".join(parts)
+
+
+class _Pack:
+    """One packfile and its version 2 index, both memory-mapped."""
+
+    def __init__(self, idx_path: str):
+        with open(idx_path, "rb") as f:
+            self.idx = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.idx[:4] != b"\377tOc" or struct.unpack_from(">L", self.idx, 4)[0] != 2:
+            raise ValueError(f"Unsupported pack index: {idx_path}")
+        self.fanout = struct.unpack_from(">256L", self.idx, 8)
+        self.count = self.fanout[255]
+        self.names_at = 8 + 1024
+        self.offsets_at = self.names_at + 24 * self.count  # after the names and CRCs
+        self.large_at = self.offsets_at + 4 * self.count
+        with open(idx_path[:-4] + ".pack", "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def find(self, sha: bytes) -> Optional[int]:
+        """Offset of the object in the pack, or None."""
+        lo = self.fanout[sha[0] - 1] if sha[0] else 0
+        hi = self.fanout[sha[0]]
+        names, at = self.idx, self.names_at
+        while lo < hi:
+            mid = (lo + hi) // 2
+            name = names[at + 20 * mid:at + 20 * mid + 20]
+            if name < sha:
+                lo = mid + 1
+            elif name > sha:
+                hi = mid
+            else:
+                offset = struct.unpack_from(">L", self.idx, self.offsets_at + 4 * mid)[0]
+                if offset & 0x80000000:
+                    offset = struct.unpack_from(">Q", self.idx, self.large_at + 8 * (offset & 0x7FFFFFFF))[0]
+                return offset
+        return None
+
+    def entry(self, offset: int):
+        """(type, payload, base): base is a pack offset (ofs-delta), a sha (ref-delta) or None."""
+        data = self.data
+        c = data[offset]
+        kind = (c >> 4) & 7
+        size = c & 15
+        shift = 4
+        pos = offset + 1
+        while c & 0x80:
+            c = data[pos]
+            pos += 1
+            size |= (c & 0x7F) << shift
+            shift += 7
+        base = None
+        if kind == OBJ_OFS_DELTA:
+            c = data[pos]
+            pos += 1
+            distance = c & 0x7F
+            while c & 0x80:
+                c = data[pos]
+                pos += 1
+                distance = ((distance + 1) << 7) | (c & 0x7F)
+            base = offset - distance
+        elif kind == OBJ_REF_DELTA:
+            base = bytes(data[pos:pos + 20])
+            pos += 20
+        return kind, _inflate(data, pos, size), base
+
+    def close(self):
+        self.idx.close()
+        self.data.close()
+
+
+class GitObjectStore:
+    """
+    Read-only access to a repository's object database, straight from the
+    files: loose objects and packfiles (delta chains included), refs and
+    packed-refs. No git executable and no network are involved.
+    Resolved pack objects are kept in an LRU bounded by cache_bytes, as
+    delta chains share their bases.
+    """
+
+    def __init__(self, root_path: str, cache_bytes: int = 64 << 20):
+        gdir = git_dir(root_path)
+        if gdir is None:
+            raise ValueError(f"Not a git repository: {root_path}")
+        self.git_dir = gdir
+        # Linked worktrees keep refs and objects in the main repository
+        common = os.path.join(gdir, "commondir")
+        if os.path.isfile(common):
+            with open(common, encoding="utf-8") as f:
+                self.common_dir = os.path.normpath(os.path.join(gdir, f.read().strip()))
+        else:
+            self.common_dir = gdir
+        self.objects_dir = os.path.join(self.common_dir, "objects")
+        self.cache_bytes = cache_bytes
+        self._cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._cached = 0
+        self._packs: Dict[str, _Pack] = {}
+        # Parsed trees by sha: consecutive commits share most of them
+        self._trees: "OrderedDict[str, Dict[bytes, Tuple[bytes, bytes]]]" = OrderedDict()
+        self.tree_cache_size = 4096
+        self._lock = threading.RLock()
+        self._load_packs()
+
+    def _load_packs(self):
+        pack_dir = os.path.join(self.objects_dir, "pack")
+        try:
+            names = sorted(n for n in os.listdir(pack_dir) if n.endswith(".idx"))
+        except OSError:
+            return
+        for name in names:
+            if name not in self._packs and os.path.exists(os.path.join(pack_dir, name[:-4] + ".pack")):
+                self._packs[name] = _Pack(os.path.join(pack_dir, name))
+
+    def close(self):
+        for pack in self._packs.values():
+            pack.close()
+        self._packs = {}
+
+    # Refs
+
+    def resolve(self, ref: str = "HEAD") -> Optional[str]:
+        """The commit sha (hex) a ref points to, following symbolic refs; None if unborn."""
+        for _ in range(10):
+            if len(ref) == 40 and all(c in "0123456789abcdef" for c in ref):
+                return ref
+            value = self._read_ref(ref)
+            if value is None:
+                return None
+            ref = value[len("ref:"):].strip() if value.startswith("ref:") else value
+        raise ValueError(f"Symbolic ref loop at {ref}")
+
+    def _read_ref(self, ref: str) -> Optional[str]:
+        for base in (self.git_dir, self.common_dir):
+            try:
+                with open(os.path.join(base, *ref.split("/")), encoding="utf-8") as f:
+                    return f.read().strip()
+            except OSError:
+                pass
+        try:
+            with open(os.path.join(self.common_dir, "packed-refs"), encoding="utf-8") as f:
+                for line in f:
+                    if line[:1] not in ("#", "^") and line.rstrip("\n").endswith(" " + ref):
+                        return line.split(" ", 1)[0]
+        except OSError:
+            pass
+        return None
+
+    # Objects
+
+    def read(self, sha: str) -> Tuple[str, bytes]:
+        """(type name, content) of an object; KeyError if it is not in this repository."""
+        binary = bytes.fromhex(sha)
+        with self._lock:
+            found = self._read_packed(binary)
+            if found is None:
+                found = self._read_loose(sha)
+            if found is None:
+                self._load_packs()  # repacked since we looked
+                found = self._read_packed(binary)
+        if found is None:
+            raise KeyError(sha)
+        kind, data = found
+        return TYPE_NAMES[kind], data
+
+    def _read_loose(self, sha: str):
+        try:
+            with open(os.path.join(self.objects_dir, sha[:2], sha[2:]), "rb") as f:
+                raw = zlib.decompress(f.read())
+        except OSError:
+            return None
+        header, _, data = raw.partition(b"\0")
+        kind = header.split(b" ", 1)[0].decode("ascii")
+        return next(k for k, name in TYPE_NAMES.items() if name == kind), data
+
+    def _read_packed(self, sha: bytes):
+        for pack in self._packs.values():
+            offset = pack.find(sha)
+            if offset is not None:
+                return self._resolve(pack, offset)
+        return None
+
+    def _resolve(self, pack: _Pack, offset: int):
+        """The object at offset, applying its delta chain (iteratively: chains can be long)."""
+        chain = []
+        while True:
+            cached = self._cache.get((id(pack), offset))
+            if cached is not None:
+                self._cache.move_to_end((id(pack), offset))
+                kind, data = cached
+                break
+            kind, payload, base = pack.entry(offset)
+            if kind == OBJ_OFS_DELTA:
+                chain.append((offset, payload))
+                offset = base
+            elif kind == OBJ_REF_DELTA:
+                chain.append((offset, payload))
+                found = self._read_packed(base)
+                if found is None:
+                    raise KeyError(base.hex())
+                kind, data = found
+                break
+            else:
+                data = payload
+                self._remember((id(pack), offset), kind, data)
+                break
+        for delta_offset, delta in reversed(chain):
+            data = apply_delta(data, delta)
+            self._remember((id(pack), delta_offset), kind, data)
+        return kind, data
+
+    def _remember(self, key, kind: int, data: bytes):
+        if len(data) > self.cache_bytes // 8:
+            return
+        self._cache[key] = (kind, data)
+        self._cached += len(data)
+        while self._cached > self.cache_bytes:
+            self._cached -= len(self._cache.popitem(last=False)[1][1])
+
+    # Parsed objects
+
+    def commit(self, sha: str) -> Dict[str, object]:
+        """{"sha", "tree", "parents", "author", "time"}: author is the name, time the committer's epoch seconds."""
+        kind, data = self.read(sha)
+        if kind != "commit":
+            raise ValueError(f"{sha} is a {kind}, not a commit")
+        header = data.split(b"\n\n", 1)[0].decode("utf-8", errors="replace")
+        commit = {"sha": sha, "tree": None, "parents": [], "author": "", "time": 0}
+        for line in header.split("\n"):
+            key, _, value = line.partition(" ")
+            if key == "tree":
+                commit["tree"] = value
+            elif key == "parent":
+                commit["parents"].append(value)
+            elif key == "author":
+                commit["author"] = value.rsplit(" <", 1)[0]
+            elif key == "committer":
+                commit["time"] = int(value.rsplit(" ", 2)[1])
+        return commit
+
+    def tree(self, sha: str) -> List[Tuple[int, str, str]]:
+        """(mode, name, sha) entries of a tree."""
+        return [(int(mode, 8), name.decode("utf-8", errors="surrogateescape"), binary.hex())
+                for name, (mode, binary) in self._tree_entries(sha).items()]
+
+    def _tree_entries(self, sha: str) -> Dict[bytes, Tuple[bytes, bytes]]:
+        """Raw name -> (mode, binary sha) of a tree, from the LRU of parsed trees."""
+        with self._lock:
+            entries = self._trees.get(sha)
+            if entries is not None:
+                self._trees.move_to_end(sha)
+                return entries
+        kind, data = self.read(sha)
+        if kind != "tree":
+            raise ValueError(f"{sha} is a {kind}, not a tree")
+        entries = {name: (mode, binary) for mode, name, binary in _TREE_ENTRY.findall(data)}
+        with self._lock:
+            self._trees[sha] = entries
+            while len(self._trees) > self.tree_cache_size:
+                self._trees.popitem(last=False)
+        return entries
+
+    def blob(self, sha: str) -> bytes:
+        return self.read(sha)[1]
+
+    def diff_trees(self, old: Optional[str], new: Optional[str], prefix: str = "") -> List[Tuple[str, Optional[str], Optional[str]]]:
+        """
+        (path, old blob sha, new blob sha) for every file that differs between
+        two trees (None for a side where it is absent). Identical subtrees are
+        skipped by their sha without being read.
+        """
+        if old == new:
+            return []
+        old_entries = self._tree_entries(old) if old else {}
+        new_entries = self._tree_entries(new) if new else {}
+        changes = []
+        for name in sorted(old_entries.keys() | new_entries.keys()):
+            a = old_entries.get(name)
+            b = new_entries.get(name)
+            if a == b:
+                continue
+            path = prefix + name.decode("utf-8", errors="surrogateescape")
+            a_tree = a is not None and a[0] == _TREE
+            b_tree = b is not None and b[0] == _TREE
+            if a_tree or b_tree:
+                changes.extend(self.diff_trees(a[1].hex() if a_tree else None, b[1].hex() if b_tree else None,
+                                               path + "/"))
+            old_sha = a[1].hex() if a is not None and not a_tree and a[0] != _GITLINK else None
+            new_sha = b[1].hex() if b is not None and not b_tree and b[0] != _GITLINK else None
+            if old_sha != new_sha:
+                changes.append((path, old_sha, new_sha))
+        return changes
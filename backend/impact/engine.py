@@ -1,24 +1,80 @@
-import networkx as nx
-from typing import List, Dict
+import os
+import weakref
+import numpy as np
+from typing import List, Dict, Any, Iterable, Optional
+
+from ..graph.compact import CompactGraph
+from .reachability import ReachabilityIndex
 
 class ImpactEngine:
-    def __init__(self):
-        pass
-        
-    def analyze_impact(self, graph: nx.DiGraph, target_node: str) -> Dict[str, List[str]]:
+    def __init__(self, max_bitset_components: int = 20000, max_hub_bytes: int = 32 << 20):
+        self.max_bitset_components = max_bitset_components
+        self.max_hub_bytes = max_hub_bytes
+        # One reachability index per graph, dropped together with the graph
+        self._indexes = weakref.WeakKeyDictionary()
+
+    def analyze_impact(self, graph, target_node: str) -> Dict[str, List[str]]:
         """
         Trace upstream (who calls me) and downstream (who I call).
+        graph is a CompactGraph or a networkx DiGraph; both expose
+        predecessors/successors.
         """
         if target_node not in graph:
             return {"upstream": [], "downstream": []}
-            
+
         # Upstream: Predecessors (Callers)
         upstream = list(graph.predecessors(target_node))
-        
+
         # Downstream: Successors (Callees)
         downstream = list(graph.successors(target_node))
-        
+
         return {
             "upstream": upstream,
             "downstream": downstream
         }
+
+    def index(self, graph: CompactGraph) -> ReachabilityIndex:
+        """The graph's reachability index, built on first use."""
+        index = self._indexes.get(graph)
+        if index is None:
+            index = self._indexes[graph] = ReachabilityIndex(graph, self.max_bitset_components, self.max_hub_bytes)
+        return index
+
+    def nodes_in_files(self, graph: CompactGraph, files: Iterable[str], root: Optional[str] = None) -> List[str]:
+        """
+        Node ids defined in the given files. Paths may be absolute or relative
+        to root (as in a diff); a relative path also matches by suffix.
+        """
+        wanted = set()
+        suffixes = []
+        for f in files:
+            f = os.path.normpath(f)
+            wanted.add(os.path.abspath(f if os.path.isabs(f) or root is None else os.path.join(root, f)))
+            if not os.path.isabs(f):
+                suffixes.append(os.sep + f)
+        matched = {
+            fi for fi, path in enumerate(graph.files)
+            if os.path.abspath(path) in wanted or any(os.path.normpath(path).endswith(s) for s in suffixes)
+        }
+        idx = np.nonzero(np.isin(graph.file_idx, list(matched)))[0]
+        return [graph.node_ids[i] for i in idx.tolist()]
+
+    def transitive_impact(self, graph: CompactGraph, targets: Iterable[str], direction: str = "both",
+                          depth: Optional[int] = None, min_weight: float = 0.0) -> Dict[str, Any]:
+        """
+        Everything transitively affected by a change to the target nodes.
+        upstream: callers, direct or indirect (what may break);
+        downstream: callees (what the targets depend on).
+        depth limits the number of call hops, min_weight drops weak
+        (ambiguous) call edges. Unknown target ids are reported, not raised.
+        """
+        targets = list(dict.fromkeys(targets))
+        known = [t for t in targets if t in graph]
+        seeds = [graph.index[t] for t in known]
+        index = self.index(graph)
+        result = {"targets": known, "unknown": [t for t in targets if t not in graph]}
+        for side in ("upstream", "downstream"):
+            if direction in (side, "both"):
+                reached = index.affected(seeds, side, depth, min_weight)
+                result[side] = [graph.node_ids[i] for i in reached.tolist()]
+        return result
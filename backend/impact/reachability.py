@@ -0,0 +1,197 @@
+import numpy as np
+from typing import Dict, Iterable, List, Optional
+
+from ..graph.compact import CompactGraph
+
+
+def _edge_positions(indptr: np.ndarray, frontier: np.ndarray) -> np.ndarray:
+    """Positions in a CSR indices array of all out-edges of the frontier nodes."""
+    starts = indptr[frontier]
+    lengths = indptr[frontier + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    # For each edge: its row start + its rank within the row
+    return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+
+
+def _bfs(indptr, indices, seeds: np.ndarray, n: int, depth: Optional[int] = None,
+         weights: Optional[np.ndarray] = None, min_weight: float = 0.0) -> np.ndarray:
+    """Level-synchronous BFS; returns the visited nodes (seeds excluded)."""
+    visited = np.zeros(n, dtype=bool)
+    visited[seeds] = True
+    frontier = np.unique(seeds)
+    found = []
+    level = 0
+    while frontier.size and (depth is None or level < depth):
+        edges = _edge_positions(indptr, frontier)
+        if weights is not None and min_weight > 0:
+            edges = edges[weights[edges] >= min_weight]
+        nxt = np.unique(indices[edges])
+        frontier = nxt[~visited[nxt]]
+        visited[frontier] = True
+        found.append(frontier)
+        level += 1
+    return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+
+def _csr(src: np.ndarray, dst: np.ndarray, n: int):
+    order = np.argsort(src, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return indptr, dst[order]
+
+
+def _bits_to_array(bits: int) -> np.ndarray:
+    raw = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+    return np.nonzero(np.unpackbits(raw, bitorder="little"))[0]
+
+
+def _mask_to_bits(mask: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(mask, bitorder="little").tobytes(), "little")
+
+
+class ReachabilityIndex:
+    """
+    Precomputed transitive reachability over a CompactGraph.
+    Strongly connected components (call cycles) are collapsed into a DAG
+    whose components are numbered in topological order. For DAGs of up to
+    max_bitset_components components every component stores its descendant
+    and ancestor sets as bitsets, so an unbounded query is a handful of ORs.
+    Call graphs are mostly acyclic, so on large ones the DAG is nearly as
+    big as the graph and full bitsets would take O(n^2) bits. There only the
+    hub components (highest in x out degree, as many as max_hub_bytes holds)
+    get bitsets; a query walks the DAG with a vectorised BFS that takes a
+    hub's whole reach from its bitset instead of walking past it.
+    Depth- or weight-limited queries need the real call paths and run a
+    plain BFS over the node graph, without the index.
+    """
+
+    def __init__(self, graph: CompactGraph, max_bitset_components: int = 20000, max_hub_bytes: int = 32 << 20):
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import connected_components
+
+        self.graph = graph
+        n = self.n = graph.number_of_nodes()
+        adjacency = csr_matrix((np.ones(len(graph.indices), dtype=np.int8), graph.indices, graph.indptr), shape=(n, n))
+        n_comp, labels = connected_components(adjacency, directed=True, connection="strong")
+
+        # Condensed DAG edges
+        src = labels[graph.edge_sources()]
+        dst = labels[graph.indices]
+        keep = src != dst
+        pairs = np.unique(src[keep].astype(np.int64) * n_comp + dst[keep])
+        src, dst = pairs // n_comp, pairs % n_comp
+
+        # Renumber components in topological order (Kahn, one level at a time)
+        indptr, indices = _csr(src, dst, n_comp)
+        indegree = np.bincount(dst, minlength=n_comp)
+        frontier = np.nonzero(indegree == 0)[0]
+        order = []
+        while frontier.size:
+            order.append(frontier)
+            targets = indices[_edge_positions(indptr, frontier)]
+            indegree -= np.bincount(targets, minlength=n_comp)
+            frontier = np.unique(targets[indegree[targets] == 0])
+        topo = np.empty(n_comp, dtype=np.int64)
+        topo[np.concatenate(order) if order else np.empty(0, dtype=np.int64)] = np.arange(n_comp)
+
+        self.n_components = n_comp
+        self.component = topo[labels]
+        src, dst = topo[src], topo[dst]
+        self.down = _csr(src, dst, n_comp)
+        self.up = _csr(dst, src, n_comp)
+        self.member_indptr, self.members = _csr(self.component, np.arange(n, dtype=np.int64), n_comp)
+
+        self.descendants: Optional[List[int]] = None
+        self.ancestors: Optional[List[int]] = None
+        self.hub_descendants: Dict[int, int] = {}
+        self.hub_ancestors: Dict[int, int] = {}
+        self.is_hub = np.zeros(n_comp, dtype=bool)
+        if n_comp <= max_bitset_components:
+            self.descendants = self._closure(self.down, reversed(range(n_comp)))
+            self.ancestors = self._closure(self.up, range(n_comp))
+        else:
+            # Two bitsets of n_comp bits per hub
+            k = min(n_comp, max_hub_bytes // (2 * ((n_comp + 7) // 8)))
+            score = (np.diff(self.down[0]) + 1) * (np.diff(self.up[0]) + 1)
+            hubs = np.sort(np.argsort(-score, kind="stable")[:k])
+            self.hub_descendants = self._hub_closure(self.down, hubs[::-1])
+            self.hub_ancestors = self._hub_closure(self.up, hubs)
+            self.is_hub[hubs] = True
+
+    def _closure(self, csr, order: Iterable[int]) -> List[int]:
+        """Reachable-component bitsets; order visits every component after its successors."""
+        indptr, indices = csr
+        bits = [0] * self.n_components
+        for c in order:
+            acc = 1 << c
+            for s in indices[indptr[c]:indptr[c + 1]].tolist():
+                acc |= bits[s]
+            bits[c] = acc
+        return bits
+
+    def _hub_closure(self, csr, hubs: np.ndarray) -> Dict[int, int]:
+        """Reachable-component bitsets of the hubs, given so that every hub comes after the hubs it reaches."""
+        bits: Dict[int, int] = {}
+        ready = np.zeros(self.n_components, dtype=bool)
+        for h in hubs.tolist():
+            bits[h] = _mask_to_bits(self._walk(csr, np.array([h]), bits, ready))
+            ready[h] = True
+        return bits
+
+    def _walk(self, csr, start: np.ndarray, hub_bits: Dict[int, int], is_hub: np.ndarray) -> np.ndarray:
+        """Mask of the components reachable from start (included); the BFS stops at hubs and ORs in their bitsets."""
+        indptr, indices = csr
+        visited = np.zeros(self.n_components, dtype=bool)
+        visited[start] = True
+        frontier = start
+        while frontier.size:
+            at_hub = is_hub[frontier]
+            if at_hub.any():
+                acc = 0
+                for c in frontier[at_hub].tolist():
+                    acc |= hub_bits[c]
+                visited[_bits_to_array(acc)] = True
+                frontier = frontier[~at_hub]
+            nxt = np.unique(indices[_edge_positions(indptr, frontier)])
+            frontier = nxt[~visited[nxt]]
+            visited[frontier] = True
+        return visited
+
+    def _expand(self, components: np.ndarray) -> np.ndarray:
+        return self.members[_edge_positions(self.member_indptr, components)]
+
+    def affected(self, seeds: Iterable[int], direction: str = "downstream",
+                 depth: Optional[int] = None, min_weight: float = 0.0) -> np.ndarray:
+        """
+        Node indices transitively reachable from the seed nodes, seeds excluded.
+        direction: "downstream" (what the seeds call) or "upstream" (what calls them).
+        depth: max call hops; min_weight: ignore edges lighter than this
+        (ambiguous calls are split across candidates with weight 1/k).
+        """
+        seeds = np.fromiter(seeds, dtype=np.int64)
+        if seeds.size == 0:
+            return seeds
+        if depth is not None or min_weight > 0:
+            if direction == "downstream":
+                indptr, indices, weights = self.graph.indptr, self.graph.indices, self.graph.weights
+            else:
+                indptr, indices, weights = self.graph.reverse()
+            return np.sort(_bfs(indptr, indices, seeds, self.n, depth, weights, min_weight))
+
+        components = np.unique(self.component[seeds])
+        bitsets = self.descendants if direction == "downstream" else self.ancestors
+        if bitsets is not None:
+            acc = 0
+            for c in components.tolist():
+                acc |= bitsets[c]
+            reached = _bits_to_array(acc)
+        elif direction == "downstream":
+            reached = np.flatnonzero(self._walk(self.down, components, self.hub_descendants, self.is_hub))
+        else:
+            reached = np.flatnonzero(self._walk(self.up, components, self.hub_ancestors, self.is_hub))
+        nodes = self._expand(reached)
+        # Members of the seeds' own components are affected through the cycle
+        nodes = nodes[~np.isin(nodes, seeds)]
+        return np.sort(nodes)
@@ -1 +1 @@
-from .scanner import scan_codebase
+from .scanner import scan_codebase, iter_source_files, SourceFilter, DEFAULT_MAX_FILE_SIZE
@@ -0,0 +1,102 @@
+import re
+from typing import List, Optional, Sequence, Tuple
+
+
+def _translate(pattern: str) -> str:
+    """gitignore glob (already stripped of !, leading and trailing /) -> regex body."""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i) and (i == 0 or pattern[i - 1] == "/"):
+            out.append("(?:.*/)?")  # zero or more directories
+            i += 3
+        elif pattern.startswith("**", i) and i + 2 == n and (i == 0 or pattern[i - 1] == "/"):
+            out.append(".*")  # everything inside
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            end = pattern.find("]", i + 2 if pattern.startswith("[!", i) or pattern.startswith("[^", i) else i + 1)
+            if end < 0:
+                out.append(re.escape(c))
+                i += 1
+                continue
+            body = pattern[i + 1:end]
+            if body[:1] in ("!", "^"):
+                body = "^" + body[1:]
+            out.append("[" + body.replace("\\", "\\\\") + "]")
+            i = end + 1
+        elif c == "\\" and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+class IgnoreRules:
+    """
+    The patterns of one .gitignore (or a list of exclude globs). base is the
+    directory they apply to, as a "/"-separated path relative to the scan
+    root ("" for the root itself); paths are matched in that same form.
+    Follows gitignore semantics: last matching pattern wins, "!" re-includes,
+    a trailing "/" matches directories only, a pattern containing "/" is
+    anchored to base, "**" spans directories.
+    """
+
+    def __init__(self, base: str, patterns: Sequence[str]):
+        self.prefix = base + "/" if base else ""
+        self.rules: List[Tuple[re.Pattern, bool, bool]] = []  # (regex, negated, dir_only)
+        for line in patterns:
+            line = line.rstrip("\n\r")
+            if not line.endswith("\\ "):
+                line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated or line.startswith("\\!") or line.startswith("\\#"):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            anchored = "/" in line
+            body = _translate(line.lstrip("/"))
+            regex = ("^" if anchored else "^(?:.*/)?") + body + "$"
+            self.rules.append((re.compile(regex), negated, dir_only))
+
+    @classmethod
+    def from_file(cls, path: str, base: str) -> Optional["IgnoreRules"]:
+        try:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                return cls(base, f.readlines())
+        except OSError:
+            return None
+
+    def match(self, rel_path: str, is_dir: bool) -> Optional[bool]:
+        """True: ignored, False: explicitly re-included, None: no pattern applies."""
+        if not rel_path.startswith(self.prefix):
+            return None
+        rel = rel_path[len(self.prefix):]
+        for regex, negated, dir_only in reversed(self.rules):
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel):
+                return not negated
+        return None
+
+
+def is_ignored(stack: Sequence[IgnoreRules], rel_path: str, is_dir: bool) -> bool:
+    """Applies nested ignore files outermost first; deeper files take precedence."""
+    ignored = False
+    for rules in stack:
+        verdict = rules.match(rel_path, is_dir)
+        if verdict is not None:
+            ignored = verdict
+    return ignored
@@ -0,0 +1,70 @@
+import os
+import struct
+from typing import Iterator, Optional
+
+# Submodules appear in the index as gitlinks and sparse-index directories as
+# trees; neither has file content here
+_SKIPPED_MODES = (0o160000, 0o040000)
+
+
+def git_dir(root_path: str) -> Optional[str]:
+    """The repository's .git directory (following a worktree's "gitdir:" file)."""
+    dot_git = os.path.join(root_path, ".git")
+    if os.path.isdir(dot_git):
+        return dot_git
+    if os.path.isfile(dot_git):
+        with open(dot_git, encoding="utf-8") as f:
+            line = f.read().strip()
+        if line.startswith("gitdir:"):
+            path = line[len("gitdir:"):].strip()
+            return os.path.normpath(os.path.join(root_path, path))
+    return None
+
+
+def iter_index_paths(root_path: str) -> Iterator[str]:
+    """
+    Paths ("/"-separated, relative to root_path) of the files tracked in the
+    git index, read straight from .git/index (versions 2-4) without running git.
+    """
+    gdir = git_dir(root_path)
+    if gdir is None:
+        raise ValueError(f"Not a git repository: {root_path}")
+    with open(os.path.join(gdir, "index"), "rb") as f:
+        data = f.read()
+
+    signature, version, count = struct.unpack_from(">4sLL", data, 0)
+    if signature != b"DIRC" or version not in (2, 3, 4):
+        raise ValueError(f"Unsupported git index (version {version})")
+
+    pos = 12
+    previous = b""
+    for _ in range(count):
+        start = pos
+        mode = struct.unpack_from(">L", data, pos + 24)[0]
+        flags = struct.unpack_from(">H", data, pos + 60)[0]
+        pos += 62
+        if version >= 3 and flags & 0x4000:
+            pos += 2  # extended flags
+        if version == 4:
+            # Path is prefix-compressed against the previous entry: a varint of
+            # bytes to drop from its end, then the NUL-terminated suffix
+            strip, byte = 0, 0x80
+            first = True
+            while byte & 0x80:
+                byte = data[pos]
+                pos += 1
+                strip = (byte & 0x7F) if first else (((strip + 1) << 7) | (byte & 0x7F))
+                first = False
+            end = data.index(b"\0", pos)
+            path = previous[:len(previous) - strip] + data[pos:end]
+            pos = end + 1
+        else:
+            end = data.index(b"\0", pos)
+            path = data[pos:end]
+            # Entries are NUL-padded to a multiple of 8 bytes
+            pos = start + ((end - start + 8) // 8) * 8
+        if path == previous:
+            continue  # the other stages of a merge conflict
+        previous = path
+        if mode & 0o170000 not in _SKIPPED_MODES:
+            yield path.decode("utf-8", errors="surrogateescape")
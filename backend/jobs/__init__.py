@@ -0,0 +1,3 @@
+from .manager import Job, JobManager, JobCancelled
+from .pipeline import run_analysis
+from .watch import Watcher
@@ -0,0 +1,214 @@
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .tracing import JobTrace, SamplingProfiler, record_job
+
+STAGES = ("scan", "parse", "graph", "history", "cluster", "clones", "embed")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """
+    One analysis run. Progress is tracked per pipeline stage so clients can
+    poll GET /jobs/{id} while the work happens on the worker pool.
+    """
+
+    def __init__(self, repo: str, params: Dict[str, Any], stages: Sequence[str] = STAGES,
+                 runner: Optional[Callable[["Job"], Dict[str, Any]]] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.repo = repo
+        self.params = params
+        # Jobs with their own runner return a summary and keep no repository state
+        self.runner = runner
+        self.status = "QUEUED"
+        self.stages = {name: {"status": "PENDING", "done": 0, "total": None} for name in stages}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.trace = JobTrace()
+        self.done = threading.Event()  # set once the job has finished, whatever its status
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def child(self, repo: str, params: Dict[str, Any]) -> "Job":
+        """A job run inline as part of this one; cancelling this job cancels it."""
+        job = Job(repo, params)
+        job._cancel = self._cancel
+        return job
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        """Called by the pipeline between units of work."""
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+
+    def start_stage(self, name: str, total: Optional[int] = None):
+        self.check_cancelled()
+        self.stages[name].update(status="RUNNING", total=total)
+        self.trace.start(name)
+
+    def update_stage(self, name: str, done: int, total: Optional[int] = None):
+        self.stages[name]["done"] = done
+        if total is not None:
+            self.stages[name]["total"] = total
+
+    def finish_stage(self, name: str):
+        stage = self.stages[name]
+        stage["status"] = "DONE"
+        if stage["total"] is not None:
+            stage["done"] = stage["total"]
+        self.trace.finish(name, stage["done"])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "repo": self.repo,
+            "status": self.status,
+            "stages": self.stages,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "metrics": self.trace.to_dict(),
+        }
+
+
+class JobManager:
+    """
+    Runs analysis jobs on a bounded thread pool and keeps the results of
+    every analysed repository in memory, keyed by repository.
+    Jobs for the same repository are serialised; different repositories run concurrently.
+    A repository has at most one job on the pool: the others wait in its
+    pending queue, not in a worker, and the next one is submitted when the
+    running one finishes.
+    """
+
+    def __init__(self, runner: Callable[[Job, Dict[str, Any]], Dict[str, Any]], max_workers: Optional[int] = None):
+        self.runner = runner
+        self.max_workers = max_workers or int(os.environ.get("CODE_ARC_JOB_WORKERS", "2"))
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="analysis")
+        self.jobs: Dict[str, Job] = {}
+        self.repos: Dict[str, Dict[str, Any]] = {}  # repo key -> analysis state
+        self.latest_repo: Optional[str] = None
+        self._pending: Dict[str, deque] = {}  # repo -> jobs queued behind its running one
+        self._lock = threading.Lock()
+
+    def submit(self, repo: str, params: Dict[str, Any], stages: Sequence[str] = STAGES,
+               runner: Optional[Callable[[Job], Dict[str, Any]]] = None) -> Job:
+        """runner: run this job with runner(job) instead of the analysis runner."""
+        job = Job(repo, params, stages, runner)
+        with self._lock:
+            self.jobs[job.id] = job
+            pending = self._pending.get(repo)
+            if pending is not None:
+                pending.append(job)
+                return job
+            self._pending[repo] = deque()
+        self.executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        return sorted(self.jobs.values(), key=lambda j: j.created_at)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.jobs.get(job_id)
+        if job and job.status in ("QUEUED", "RUNNING"):
+            job.cancel()
+        return job
+
+    def repo_state(self, repo: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """State of the given repository, or of the most recently analysed one."""
+        return self.repos.get(repo or self.latest_repo)
+
+    def restore(self, repo: str, state: Dict[str, Any]):
+        """Installs a previously saved state (e.g. a snapshot loaded at startup)."""
+        self.repos[repo] = state
+        self.latest_repo = repo
+
+    def _run(self, job: Job):
+        try:
+            self._execute(job)
+        finally:
+            self._dispatch_next(job.repo)
+
+    def _dispatch_next(self, repo: str):
+        """Submits the repository's next queued job, or marks it idle."""
+        with self._lock:
+            pending = self._pending[repo]
+            if not pending:
+                del self._pending[repo]
+                return
+            job = pending.popleft()
+        try:
+            self.executor.submit(self._run, job)
+        except RuntimeError:
+            # The pool is shut down and every job cancelled: this only marks it
+            self._run(job)
+
+    def _execute(self, job: Job):
+        if job.cancelled:
+            job.status = "CANCELLED"
+            job.finished_at = time.time()
+            job.done.set()
+            return
+
+        job.status = "RUNNING"
+        job.started_at = time.time()
+        state = self.repos.get(job.repo, {})
+        try:
+            if job.params.get("profile"):
+                with SamplingProfiler() as profiler:
+                    new_state = self._call(job, state)
+                job.trace.profile = profiler.top()
+            else:
+                new_state = self._call(job, state)
+            if new_state is not None:
+                self.repos[job.repo] = new_state
+                self.latest_repo = job.repo
+            job.status = "COMPLETED"
+        except JobCancelled:
+            job.status = "CANCELLED"
+        except Exception as e:
+            job.status = "FAILED"
+            job.error = str(e)
+            print(f"Analysis job {job.id} failed: {e}", flush=True)
+            traceback.print_exc()
+        finally:
+            job.finished_at = time.time()
+            job.trace.abandon()
+            record_job(job)
+            job.done.set()
+
+    def _call(self, job: Job, state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Runs the job; returns the new repository state (None for jobs with their own runner)."""
+        if job.runner is not None:
+            job.result = job.runner(job)
+            return None
+        new_state = self.runner(job, state)
+        job.result = new_state.get("summary")
+        return new_state
+
+    def shutdown(self):
+        for job in self.jobs.values():
+            job.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,395 @@
+import json
+from typing import Any, Dict
+
+from ..ingestion import iter_source_files, DEFAULT_MAX_FILE_SIZE
+from ..parsing import ParallelParser, ParseCache
+from ..parsing.cache import fingerprint as fingerprint_files
+from ..graph.builder import GraphBuilder
+from ..clustering.engine import ClusteringEngine, previous_partition
+from ..clustering.metrics import describe_clusters
+from ..clones.detector import CloneDetector
+from ..history.miner import HistoryMiner, assign_history, carry_history, history_summary
+from ..graph.compact import CompactGraph
+from ..graph import export
+from ..storage import save_snapshot, SnippetStore
+from .manager import Job
+
+
+# Parameters that change the result for the same files (see skip_unchanged)
+FINGERPRINT_PARAMS = ("language", "max_fanout", "cluster_backend", "cluster_seed", "cluster_resolution",
+                      "cluster_levels", "cluster_resolutions", "clones", "clone_threshold", "clone_min_tokens",
+                      "history", "history_coupling_max_files", "embed", "embed_index")
+# Parameters a GraphBuilder is built with: a previous builder is only patched when they are unchanged
+BUILDER_PARAMS = ("language", "max_fanout")
+
+
+def _iter_bodies(job: Job, graph: CompactGraph, chunk_size: int = 4096):
+    """Streams {"id", "code", "file", "cluster"} for every node, reading sources a chunk at a time."""
+    n = graph.number_of_nodes()
+    for start in range(0, n, chunk_size):
+        job.check_cancelled()
+        idx = range(start, min(n, start + chunk_size))
+        for i, code in zip(idx, graph.sources(idx)):
+            cluster = int(graph.cluster[i])
+            yield {
+                "id": graph.node_ids[i],
+                "code": code or "",
+                "file": graph.file_of(i),
+                "cluster": str(cluster) if cluster >= 0 else None,
+            }
+        job.update_stage("embed", idx.stop)
+
+
+def _fingerprint_extra(params: Dict[str, Any]) -> str:
+    extra = [params.get(k) for k in FINGERPRINT_PARAMS]
+    if params.get("history"):
+        # New commits change the result even when the working tree does not
+        try:
+            extra.append(HistoryMiner(params["path"]).head())
+        except ValueError:
+            pass
+    return json.dumps(extra)
+
+
+def _analysis_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """The parameters kept with a repository's state (for watch mode); not the per-run ones."""
+    return {k: v for k, v in params.items() if k not in ("update", "skip_unchanged", "profile")}
+
+
+def _detect_clones(job: Job, state: Dict[str, Any], graph: CompactGraph) -> Dict[str, Any]:
+    """The clones stage: {"clones", "clone_detector"} for the new state (None when off)."""
+    params = job.params
+    if not params.get("clones"):
+        return {"clones": None, "clone_detector": None}
+    job.start_stage("clones", total=graph.number_of_nodes())
+    detector = state.get("clone_detector")
+    threshold = params.get("clone_threshold", 0.8)
+    min_tokens = params.get("clone_min_tokens", 50)
+    # The detector caches signatures per file; reuse it while its settings hold
+    if detector is None or (detector.threshold, detector.min_tokens) != (threshold, min_tokens):
+        detector = CloneDetector(threshold=threshold, min_tokens=min_tokens, workers=params.get("workers"))
+    clones = detector.detect(graph)
+    job.trace.count("clone_pairs", len(clones["pairs"]))
+    job.finish_stage("clones")
+    return {"clones": clones, "clone_detector": detector}
+
+
+def _mine_history(job: Job, graph: CompactGraph) -> Dict[str, Any]:
+    """The history stage: mines the repository's commits and sets graph.history. Returns the state's summary."""
+    params = job.params
+    if not params.get("history"):
+        return None
+    job.start_stage("history")
+    try:
+        miner = HistoryMiner(params["path"], workers=params.get("workers"),
+                             coupling_max_files=params.get("history_coupling_max_files", 30))
+    except ValueError as e:
+        print(f"No history for {params['path']}: {e}", flush=True)
+        job.finish_stage("history")
+        return None
+    history = miner.mine(progress=lambda done, total: job.update_stage("history", done, total),
+                         should_stop=lambda: job.cancelled)
+    job.check_cancelled()
+    assign_history(graph, history)
+    job.trace.count("commits", history["commits"])
+    job.trace.count("commits_mined", history["new_commits"])
+    job.finish_stage("history")
+    return history_summary(history)
+
+
+def run_analysis(job: Job, state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    scan -> parse -> graph (-> history) -> cluster (-> clones) (-> embed) for
+    one repository, then a snapshot.
+    state is the previous analysis of the same repository (may be empty); its
+    builder is reused so only changed files are patched into the graph.
+    With params["skip_unchanged"], a previous state whose inputs fingerprint
+    the same (e.g. one loaded from a snapshot) is returned after the parse
+    stage, without rebuilding anything.
+    With params["update"] ({"changed": [...], "removed": [...]}), only those
+    files are looked at (see update_analysis).
+    Returns the new repository state.
+    """
+    params = job.params
+    path = params["path"]
+    if params.get("update") is not None:
+        if state.get("builder") is not None and state.get("path") == path:
+            return update_analysis(job, state)
+        # Nothing in memory to patch (e.g. a state loaded from a snapshot): full run
+        job.params = params = {k: v for k, v in params.items() if k != "update"}
+
+    # 1./2. Ingest and parse, overlapped: files go to the parse workers as the
+    # scanner finds them, cache hits are set aside without being parsed
+    job.start_stage("scan")
+    job.start_stage("parse")
+    cache = ParseCache.for_root(path)
+    files = []
+    cached = {}
+    stale = []
+
+    def stale_files():
+        scanned = iter_source_files(
+            path, params.get("language", "java"),
+            exclude=params.get("exclude") or (),
+            max_file_size=params.get("max_file_size", DEFAULT_MAX_FILE_SIZE),
+            use_gitignore=params.get("use_gitignore", True),
+            git_index=params.get("git_index", False),
+        )
+        for file_path, unit in cache.classify(scanned):
+            if job.cancelled:
+                break
+            files.append(file_path)
+            job.update_stage("scan", len(files))
+            if unit is None:
+                stale.append(file_path)
+                yield file_path
+            else:
+                cached[file_path] = unit
+        job.update_stage("scan", len(files), len(files))
+        job.finish_stage("scan")
+
+    try:
+        parser = ParallelParser(workers=params.get("workers"), batch_size=params.get("batch_size", 64))
+        parsed_new = parser.parse_files(
+            stale_files(),
+            progress=lambda done, total: job.update_stage("parse", len(cached) + done),
+            should_stop=lambda: job.cancelled,
+        )
+        job.check_cancelled()
+        # Scan order varies from run to run; the graph must not
+        files.sort()
+        parsed_new.sort(key=lambda d: d["file_path"])
+        job.update_stage("parse", len(files), len(files))
+        digests = {f: cache.digests[f] for f in files}
+        fingerprint = fingerprint_files(digests, _fingerprint_extra(params))
+        snippets = SnippetStore.for_root(path)
+        job.trace.count("snippet_files_stored", snippets.update(digests))
+        job.trace.count("files", len(files))
+        job.trace.count("files_parsed", len(parsed_new))
+        job.trace.count("cache_hits", cache.hits)
+        job.trace.count("cache_misses", cache.misses)
+        job.finish_stage("parse")
+
+        if params.get("skip_unchanged") and state.get("path") == path and state.get("fingerprint") == fingerprint:
+            cache.update(parsed_new)
+            return {**state, "summary": {**state["summary"], "changed_files": 0, "deleted_files": 0}}
+
+        # 3. Build Graph
+        job.start_stage("graph")
+        builder = state.get("builder")
+        previous_params = state.get("params") or {}
+        incremental = (builder is not None and state.get("path") == path
+                       and all(previous_params.get(k) == params.get(k) for k in BUILDER_PARAMS))
+        cached.update((d["file_path"], d) for d in parsed_new)
+        if incremental:
+            # Patch the nodes of files that differ from what this builder saw:
+            # the shared cache may already know them from another analysis
+            changed, deleted = builder.changed_files(digests)
+            builder.update_graph([{**cached[f], "file_path": f} for f in changed if f in cached],
+                                 removed_files=deleted, digests=digests)
+        else:
+            parsed_data = [{**cached[f], "file_path": f} for f in files if f in cached]
+            builder = GraphBuilder(max_fanout=params.get("max_fanout", 5), root=path)
+            builder.build_graph(parsed_data, digests=digests)
+        graph = builder.compact()
+        # Committed only once the graph exists, so a cancelled or failed run leaves nothing half-applied
+        cache.update(parsed_new)
+        pruned = cache.prune(files)
+    finally:
+        cache.close()
+    if not incremental:
+        changed, deleted = stale, pruned
+    graph.snippets = snippets
+    job.update_stage("graph", graph.number_of_nodes())
+    job.trace.count("nodes", graph.number_of_nodes())
+    job.trace.count("edges", graph.number_of_edges())
+    job.finish_stage("graph")
+
+    # 4. Git history (opt-in): churn per function, before clusters are described
+    history = _mine_history(job, graph)
+
+    # 5. Clustering
+    job.start_stage("cluster")
+    cluster_engine = ClusteringEngine(
+        backend=params.get("cluster_backend", "auto"),
+        seed=params.get("cluster_seed", 0),
+        resolution=params.get("cluster_resolution", 1.0),
+        max_levels=params.get("cluster_levels", 3),
+    )
+    # Warm start from the previous run of the same repository
+    previous = previous_partition(state.get("graph")) if state.get("path") == path else None
+    clusters = cluster_engine.cluster_graph(graph, previous=previous,
+                                            resolutions=params.get("cluster_resolutions"))
+    cluster_engine.assign_clusters(graph, clusters)
+    describe_clusters(graph, clusters)
+    job.update_stage("cluster", len(clusters))
+    job.trace.count("clusters", len(clusters))
+    job.finish_stage("cluster")
+
+    # 6. Near-duplicate functions (opt-in)
+    clones = _detect_clones(job, state if state.get("path") == path else {}, graph)
+
+    # 7. Embeddings (opt-in: needs sentence-transformers and faiss)
+    embeddings = state.get("embeddings")
+    if params.get("embed"):
+        job.start_stage("embed", total=graph.number_of_nodes())
+        if embeddings is None:
+            from ..embeddings.processor import EmbeddingProcessor
+            embeddings = EmbeddingProcessor(
+                threads=params.get("embed_threads"),
+                backend=params.get("embed_backend", "torch"),
+                model_file=params.get("embed_model_file"),
+                quantize=params.get("embed_quantize", False),
+                index_kind=params.get("embed_index", "flat"),
+            )
+        embeddings.generate_embeddings(_iter_bodies(job, graph), repo=job.repo)
+        job.finish_stage("embed")
+
+    new_state = {
+        "path": path,
+        "builder": builder,
+        "graph": graph,
+        "clusters": clusters,
+        "cluster_levels": cluster_engine.levels,
+        "embeddings": embeddings,
+        **clones,
+        "history": history,
+        "fingerprint": fingerprint,
+        "workspace": params.get("workspace"),
+        "params": _analysis_params(params),
+        "summary": {
+            "file_count": len(files),
+            "changed_files": len(changed),
+            "deleted_files": len(deleted),
+            "node_count": graph.number_of_nodes(),
+            "edge_count": graph.number_of_edges(),
+            "cluster_count": len(clusters),
+        },
+    }
+
+    _save(job, new_state)
+    return new_state
+
+
+def _save(job: Job, state: Dict[str, Any]):
+    # Persist for a fast restart; the in-memory result is still good if this fails
+    if job.params.get("snapshot", True):
+        try:
+            state["snapshot"] = save_snapshot(job.repo, state)
+        except OSError as e:
+            print(f"Could not write snapshot for {job.repo}: {e}", flush=True)
+
+
+def update_analysis(job: Job, state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fast path of watch mode: patches state (which must hold a builder) with
+    the files in params["update"] only: changed files are re-parsed if their
+    content changed, removed ones dropped. The graph is patched, only the
+    touched nodes are re-clustered (ClusteringEngine.update_clusters) and
+    their embeddings refreshed. The new state carries a "delta" for clients
+    holding the previous graph (see export.graph_delta), tagged with the job id.
+    """
+    params = job.params
+    path = params["path"]
+    update = params["update"]
+    changed = sorted(set(update.get("changed") or ()))
+    removed = sorted(set(update.get("removed") or ()))
+
+    job.start_stage("scan", total=len(changed))
+    builder = state["builder"]
+    cache = ParseCache.for_root(path)
+    try:
+        present, stale = cache.partition(changed)
+        removed = sorted(set(removed) | {f for f in changed if f not in present and f not in stale})
+        removed = [f for f in removed if f in builder.units]
+        job.finish_stage("scan")
+
+        job.start_stage("parse", total=len(stale))
+        parsed_new = ParallelParser(workers=1).parse_files(stale)
+        parsed_new.sort(key=lambda d: d["file_path"])
+        present.update((d["file_path"], d) for d in parsed_new)
+        # Cache hits count too when this builder has not seen their content yet
+        patched = [{**present[f], "file_path": f} for f in changed
+                   if f in present and builder.digests.get(f) != cache.digests[f]]
+        snippets = SnippetStore.for_root(path)
+        snippets.update({d["file_path"]: cache.digests[d["file_path"]] for d in patched})
+        job.trace.count("files_parsed", len(parsed_new))
+        job.finish_stage("parse")
+
+        job.start_stage("graph")
+        old_graph = state["graph"]
+        touched = builder.update_graph(patched, removed_files=removed, digests=cache.digests)
+        graph = builder.compact()
+        cache.update(parsed_new)
+        cache.forget(removed)
+    finally:
+        cache.close()
+    files = sorted(builder.units)
+    fingerprint = fingerprint_files({f: builder.digests.get(f, "") for f in files}, _fingerprint_extra(params))
+    graph.snippets = snippets
+    carry_history(old_graph, graph)
+    job.trace.count("files", len(files))
+    job.update_stage("graph", len(touched))
+    job.trace.count("nodes", graph.number_of_nodes())
+    job.trace.count("edges", graph.number_of_edges())
+    job.finish_stage("graph")
+
+    job.start_stage("cluster")
+    cluster_engine = ClusteringEngine(resolution=params.get("cluster_resolution", 1.0))
+    clusters, reclustered = cluster_engine.update_clusters(graph, old_graph, touched,
+                                                           levels=state.get("cluster_levels", []))
+    cluster_engine.assign_clusters(graph, clusters)
+    describe_clusters(graph, clusters)
+    job.update_stage("cluster", len(reclustered))
+    job.trace.count("clusters", len(clusters))
+    job.finish_stage("cluster")
+
+    clones = _detect_clones(job, state, graph)
+
+    moved = sorted(set(touched) | set(reclustered))
+    embeddings = state.get("embeddings")
+    if embeddings is not None and params.get("embed"):
+        job.start_stage("embed")
+        idx = [graph.index[n] for n in moved if n in graph]
+        nodes = [
+            {"id": graph.node_ids[i], "code": code or "", "file": graph.file_of(i),
+             "cluster": str(graph.cluster[i]) if graph.cluster[i] >= 0 else None}
+            for i, code in zip(idx, graph.sources(idx))
+        ]
+        embeddings.update_embeddings(nodes, removed=[n for n in moved if n not in graph], repo=job.repo)
+        job.finish_stage("embed")
+
+    delta = export.graph_delta(old_graph, graph, moved, update.get("fields") or export.DEFAULT_FIELDS)
+    affected = {str(c) for c in old_graph.cluster[[old_graph.index[n] for n in moved if n in old_graph]].tolist()}
+    affected |= {str(c) for c in graph.cluster[[graph.index[n] for n in moved if n in graph]].tolist()}
+    live = {c["id"]: c for c in clusters}
+    delta.update({
+        "job": job.id,
+        "files": {"changed": [d["file_path"] for d in patched], "removed": removed},
+        "clusters": {
+            "updated": [{k: v for k, v in live[c].items() if k != "nodes"} for c in sorted(affected) if c in live],
+            "removed": sorted(c for c in affected if c not in live and c != "-1"),
+        },
+    })
+
+    new_state = {
+        **state,
+        "graph": graph,
+        "clusters": clusters,
+        "cluster_levels": cluster_engine.levels,
+        "embeddings": embeddings,
+        **clones,
+        "fingerprint": fingerprint,
+        "delta": delta,
+        "summary": {
+            **state["summary"],
+            "file_count": len(files),
+            "changed_files": len(patched),
+            "deleted_files": len(removed),
+            "node_count": graph.number_of_nodes(),
+            "edge_count": graph.number_of_edges(),
+            "cluster_count": len(clusters),
+        },
+    }
+    _save(job, new_state)
+    return new_state
@@ -0,0 +1,249 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import resource  # POSIX only
+except ImportError:
+    resource = None
+
+# Upper bounds (seconds) of the stage duration histogram buckets
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+
+
+def cpu_seconds() -> float:
+    """User + system CPU of this process and its reaped children (the parse workers)."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process or any child, None where unknown."""
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return scale * max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                       resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+
+class JobTrace:
+    """
+    Timing record of one job: wall and CPU seconds per stage, items
+    processed and their rate, plus counters the pipeline adds (files,
+    nodes, edges, cache hits). CPU time is process-wide, so jobs running
+    concurrently see each other's work in it.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.counters: Dict[str, Any] = {}
+        self.profile: Optional[Dict[str, Any]] = None
+        self._clocks: Dict[str, Tuple[float, float]] = {}
+
+    def start(self, stage: str):
+        self._clocks[stage] = (time.perf_counter(), cpu_seconds())
+
+    def finish(self, stage: str, items: Optional[int] = None):
+        clock = self._clocks.pop(stage, None)
+        if clock is None:
+            return
+        wall = time.perf_counter() - clock[0]
+        record = {"wall_s": round(wall, 4), "cpu_s": round(cpu_seconds() - clock[1], 4)}
+        if items is not None:
+            record["items"] = items
+            record["items_per_s"] = round(items / wall, 1) if wall > 0 else None
+        self.stages[stage] = record
+
+    def abandon(self):
+        """Closes stages left running by a failed or cancelled job."""
+        for stage in list(self._clocks):
+            self.finish(stage)
+            self.stages[stage]["incomplete"] = True
+
+    def count(self, name: str, value: Any):
+        self.counters[name] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        record = {"stages": self.stages, **self.counters, "peak_rss_bytes": peak_rss_bytes()}
+        if self.profile is not None:
+            record["profile"] = self.profile
+        return record
+
+
+class MetricsRegistry:
+    """
+    Process-wide counters, gauges and histograms, rendered in the Prometheus
+    text exposition format by render() (no client library needed).
+    Metric names are declared once with their type and help text.
+    """
+
+    def __init__(self):
+        self._meta: Dict[str, Tuple[str, str]] = {}
+        self._values: Dict[str, Dict[Tuple, float]] = {}
+        self._histograms: Dict[str, Dict[Tuple, List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def declare(self, name: str, kind: str, help_text: str):
+        self._meta[name] = (kind, help_text)
+        (self._histograms if kind == "histogram" else self._values).setdefault(name, {})
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._values[name]
+            series[key] = series.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self._values[name][tuple(sorted(labels.items()))] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            # per bucket counts, then +Inf count and sum
+            series = self._histograms[name].setdefault(key, [0.0] * (len(DURATION_BUCKETS) + 2))
+            for k, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    series[k] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> str:
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+        lines = []
+        with self._lock:
+            for name, (kind, help_text) in self._meta.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind == "histogram":
+                    for labels, series in self._histograms[name].items():
+                        for bound, count in zip(DURATION_BUCKETS, series):
+                            lines.append(f"{name}_bucket{fmt(labels, [('le', bound)])} {count:g}")
+                        lines.append(f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {series[-2]:g}")
+                        lines.append(f"{name}_count{fmt(labels)} {series[-2]:g}")
+                        lines.append(f"{name}_sum{fmt(labels)} {series[-1]:g}")
+                else:
+                    for labels, value in self._values[name].items():
+                        lines.append(f"{name}{fmt(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+METRICS = MetricsRegistry()
+METRICS.declare("code_arc_jobs_total", "counter", "Finished jobs by status.")
+METRICS.declare("code_arc_stage_duration_seconds", "histogram", "Wall time of pipeline stages.")
+METRICS.declare("code_arc_stage_cpu_seconds_total", "counter", "CPU time of pipeline stages (process-wide).")
+METRICS.declare("code_arc_stage_items_total", "counter", "Items (files, nodes, ...) processed by pipeline stages.")
+METRICS.declare("code_arc_parse_cache_total", "counter", "Parse cache lookups by result.")
+METRICS.declare("code_arc_graph_nodes", "gauge", "Nodes in the latest graph of each repository.")
+METRICS.declare("code_arc_graph_edges", "gauge", "Edges in the latest graph of each repository.")
+METRICS.declare("code_arc_peak_rss_bytes", "gauge", "Peak resident set size of the process and its workers.")
+
+
+def record_job(job, log_path: Optional[str] = None):
+    """
+    Adds a finished job to METRICS and, when log_path (or the
+    CODE_ARC_METRICS_LOG environment variable) is set, appends its timing
+    record there as one JSON line.
+    """
+    trace = job.trace.to_dict()
+    METRICS.inc("code_arc_jobs_total", status=job.status)
+    for stage, record in trace["stages"].items():
+        METRICS.observe("code_arc_stage_duration_seconds", record["wall_s"], stage=stage)
+        METRICS.inc("code_arc_stage_cpu_seconds_total", record["cpu_s"], stage=stage)
+        if record.get("items") is not None:
+            METRICS.inc("code_arc_stage_items_total", record["items"], stage=stage)
+    for result in ("hit", "miss"):
+        if f"cache_{result}s" in trace:
+            METRICS.inc("code_arc_parse_cache_total", trace[f"cache_{result}s"], result=result)
+    for name in ("nodes", "edges"):
+        if name in trace:
+            METRICS.set(f"code_arc_graph_{name}", trace[name], repo=job.repo)
+    if trace["peak_rss_bytes"] is not None:
+        METRICS.set("code_arc_peak_rss_bytes", trace["peak_rss_bytes"])
+
+    log_path = log_path or os.environ.get("CODE_ARC_METRICS_LOG")
+    if log_path:
+        record = {"job": job.id, "repo": job.repo, "status": job.status,
+                  "started_at": job.started_at, "finished_at": job.finished_at, **trace}
+        try:
+            with open(log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            print(f"Could not append to metrics log {log_path}: {e}", flush=True)
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for one thread: a background thread records the
+    target's Python stack every interval seconds (sys._current_frames), so
+    the profiled code runs at full speed. top() lists the hottest functions
+    by samples in the function itself (self) and anywhere on the stack (total).
+    Work done in other processes (the parse workers) is not seen.
+    """
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = 0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = 0
+        self.self_counts = Counter()
+        self.total_counts = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            self.self_counts[_frame_key(frame)] += 1
+            seen = set()
+            while frame is not None:
+                key = _frame_key(frame)
+                if key not in seen:
+                    seen.add(key)
+                    self.total_counts[key] += 1
+                frame = frame.f_back
+
+    def top(self, n: int = 30) -> Dict[str, Any]:
+        pct = lambda count: round(100.0 * count / self.samples, 1) if self.samples else 0.0
+        return {
+            "samples": self.samples,
+            "interval_s": self.interval,
+            "functions": [
+                {"function": key, "self_pct": pct(count), "total_pct": pct(self.total_counts[key])}
+                for key, count in self.self_counts.most_common(n)
+            ],
+            "cumulative": [
+                {"function": key, "total_pct": pct(count)}
+                for key, count in self.total_counts.most_common(n)
+            ],
+        }
+
+
+def _frame_key(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
@@ -0,0 +1,258 @@
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from ..ingestion import iter_source_files, SourceFilter, DEFAULT_MAX_FILE_SIZE
+from ..graph import export
+from .manager import JobManager
+
+try:
+    # Native change notification (inotify, FSEvents, ReadDirectoryChangesW)
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+# Node fields sent in deltas, as the frontend loads them from /graph
+DELTA_FIELDS = export.DEFAULT_FIELDS
+
+
+class _Handler(FileSystemEventHandler):
+    def __init__(self, watcher: "Watcher"):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.event_type in ("opened", "closed_no_write"):
+            return
+        paths = [event.src_path, getattr(event, "dest_path", "")]
+        if event.is_directory:
+            # A directory created, moved or deleted: its files are not listed, rescan
+            if event.event_type != "modified":
+                self.watcher.request_rescan()
+            return
+        for path in filter(None, paths):
+            self.watcher.notify(os.fsdecode(path))
+
+
+class Watcher:
+    """
+    Keeps one analysed repository's graph hot while its files are edited.
+    Changes come from the operating system's notifications (watchdog, when
+    installed) or from polling the tree every interval seconds. Bursts are
+    debounced: a batch is applied once no change arrived for debounce
+    seconds, or max_delay after its first change. A batch goes to the job
+    manager as an update job (see update_analysis: only touched files are
+    re-parsed), or as a full analysis when more than max_files changed
+    (a branch switch). Subscribers get every resulting graph delta.
+    """
+
+    def __init__(self, jobs: JobManager, repo: str, params: Dict[str, Any], debounce: float = 0.3,
+                 max_delay: float = 2.0, interval: float = 1.0, polling: bool = False, max_files: int = 200):
+        self.jobs = jobs
+        self.repo = repo
+        self.params = params
+        self.path = params["path"]
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.interval = interval
+        self.max_files = max_files
+        self.mode = "poll" if polling or Observer is None else "notify"
+        self.filter = SourceFilter(
+            self.path, params.get("language", "java"),
+            exclude=params.get("exclude") or (),
+            max_file_size=params.get("max_file_size", DEFAULT_MAX_FILE_SIZE),
+            use_gitignore=params.get("use_gitignore", True),
+        )
+        self.version = 0
+        self.updates = 0
+        self.last_job: Optional[str] = None
+        self.started_at = time.time()
+        self._files: Dict[str, tuple] = {}  # path -> (mtime_ns, size) as of the last scan
+        self._pending: Dict[str, str] = {}  # path -> "changed" / "removed"
+        self._first_change = self._last_change = 0.0
+        self._rescan = False
+        self._subscribers: List[queue.Queue] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._observer = None
+
+    # Lifecycle
+
+    def start(self):
+        self._files = self._stat_tree()
+        if self.mode == "notify":
+            self._observer = Observer()
+            self._observer.schedule(_Handler(self), self.path, recursive=True)
+            self._observer.start()
+        self._thread = threading.Thread(target=self._run, name=f"watch-{os.path.basename(self.path)}", daemon=True)
+        self._thread.start()
+        print(f"Watching {self.path} ({self.mode}, {len(self._files)} files)", flush=True)
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        if self._thread is not None:
+            self._thread.join()
+        self._publish(None)  # ends the subscribers' streams
+
+    # Change intake
+
+    def notify(self, path: str):
+        """A file was created, modified, moved or deleted."""
+        if os.path.basename(path) == ".gitignore":
+            self.filter.reset()
+            self.request_rescan()
+            return
+        if not self.filter.accepts(path):
+            return
+        self._add({path: "changed" if os.path.exists(path) else "removed"})
+
+    def request_rescan(self):
+        with self._lock:
+            self._rescan = True
+
+    def _add(self, changes: Dict[str, str]):
+        if not changes:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not self._pending:
+                self._first_change = now
+            self._last_change = now
+            self._pending.update(changes)
+
+    def _stat_tree(self) -> Dict[str, tuple]:
+        files = {}
+        for path in iter_source_files(
+            self.path, self.params.get("language", "java"),
+            exclude=self.params.get("exclude") or (),
+            max_file_size=self.params.get("max_file_size", DEFAULT_MAX_FILE_SIZE),
+            use_gitignore=self.params.get("use_gitignore", True),
+        ):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files[path] = (st.st_mtime_ns, st.st_size)
+        return files
+
+    def _scan_changes(self):
+        """Polling, and rescans after directory events: diff the tree against the last scan."""
+        files = self._stat_tree()
+        changes = {path: "changed" for path, stat in files.items() if self._files.get(path) != stat}
+        changes.update((path, "removed") for path in self._files if path not in files)
+        self._files = files
+        self._add(changes)
+
+    # Batches
+
+    def _run(self):
+        next_scan = time.monotonic() + self.interval
+        tick = min(self.debounce, self.interval) / 3
+        while not self._stop.wait(tick):
+            now = time.monotonic()
+            with self._lock:
+                rescan, self._rescan = self._rescan, False
+            if rescan or (self.mode == "poll" and now >= next_scan):
+                started = time.monotonic()
+                self._scan_changes()
+                # Never spend more than half the time polling a big tree
+                next_scan = time.monotonic() + max(self.interval, 2 * (time.monotonic() - started))
+            with self._lock:
+                ready = self._pending and (now - self._last_change >= self.debounce
+                                           or now - self._first_change >= self.max_delay)
+                batch = self._pending if ready else None
+                if ready:
+                    self._pending = {}
+            if batch:
+                try:
+                    self._apply(batch)
+                except Exception as e:
+                    print(f"Watch update of {self.path} failed: {e}", flush=True)
+
+    def _apply(self, batch: Dict[str, str]):
+        changed = sorted(p for p, kind in batch.items() if kind == "changed")
+        removed = sorted(p for p, kind in batch.items() if kind == "removed")
+        if self.mode == "notify":
+            # Keep the listing current, so a rescan only reports what events missed
+            for path in removed:
+                self._files.pop(path, None)
+            for path in changed:
+                try:
+                    st = os.stat(path)
+                    self._files[path] = (st.st_mtime_ns, st.st_size)
+                except OSError:
+                    pass
+        params = {**self.params, "profile": False}
+        full = len(batch) > self.max_files
+        if not full:
+            params["update"] = {"changed": changed, "removed": removed, "fields": DELTA_FIELDS}
+        job = self.jobs.submit(self.repo, params)
+        self.last_job = job.id
+        job.done.wait()
+        if job.status != "COMPLETED":
+            return
+        self.updates += 1
+        state = self.jobs.repo_state(self.repo) or {}
+        delta = state.get("delta")
+        if full or delta is None or delta.get("job") != job.id:
+            # A full analysis ran (many files, or no graph in memory to patch)
+            self._publish({"type": "reload", "job": job.id})
+        else:
+            self._publish({"type": "delta", **delta})
+
+    # Subscribers
+
+    def subscribe(self, max_events: int = 100) -> queue.Queue:
+        q = queue.Queue(maxsize=max_events)
+        with self._lock:
+            self._subscribers.append(q)
+        return q
+
+    def unsubscribe(self, q: queue.Queue):
+        with self._lock:
+            if q in self._subscribers:
+                self._subscribers.remove(q)
+
+    def _publish(self, event: Optional[Dict[str, Any]]):
+        with self._lock:
+            if event is not None:
+                self.version += 1
+                event = {**event, "repo": self.repo, "version": self.version}
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                # A client too slow to keep up: drop what it missed, have it refetch
+                while not q.empty():
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        break
+                q.put_nowait(event if event is None else {"type": "reload", "repo": self.repo,
+                                                         "version": event["version"]})
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+            subscribers = len(self._subscribers)
+        return {
+            "repo": self.repo,
+            "path": self.path,
+            "mode": self.mode,
+            "debounce": self.debounce,
+            "files": len(self._files),
+            "pending": pending,
+            "updates": self.updates,
+            "version": self.version,
+            "last_job": self.last_job,
+            "subscribers": subscribers,
+            "started_at": self.started_at,
+        }
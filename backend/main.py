@@ -1,17 +1,53 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
+from contextlib import asynccontextmanager
 import uvicorn
+import json
 import os
+import queue
+import numpy as np
 
-from .ingestion import scan_codebase
-from .parsing import JavaParser
-from .graph.builder import GraphBuilder
-from .embeddings.processor import EmbeddingProcessor
-from .clustering.engine import ClusteringEngine
+from .jobs import JobManager, Watcher, run_analysis
+from .jobs.tracing import METRICS, peak_rss_bytes
+from .graph import export
+from .graph.diff import graph_diff
+from .embeddings.index import INDEX_KINDS
+from .storage import iter_snapshots
+from .impact.engine import ImpactEngine
+from .search.engine import QueryEngine
+from .clones.detector import clone_groups
+from .clustering.backends import BACKENDS
+from .parsing import PARSERS
+from .workspace.workspace import Workspace, WORKSPACE_STAGES, discover_shards, iter_workspaces
 
-app = FastAPI(title="AI Code Archaeologist")
+# Analysis jobs run on a bounded worker pool; each analysed repository keeps
+# its own graph/cluster state under a repo key.
+JOBS = JobManager(run_analysis)
+IMPACT = ImpactEngine()
+# Lexical indexes and cached results per graph, built on first query
+QUERY = QueryEngine()
+# Multi-repository workspaces by name; their shards are loaded on demand
+WORKSPACES = {}
+# File watchers by repository key (watch mode)
+WATCHERS: Dict[str, Watcher] = {}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Serve previous results straight away; the model is only loaded on first search
+    if os.environ.get("CODE_ARC_LOAD_SNAPSHOTS", "1") != "0":
+        for repo, state in iter_snapshots():
+            JOBS.restore(repo, state)
+        for workspace in iter_workspaces():
+            WORKSPACES[workspace.name] = workspace
+    yield
+    for watcher in list(WATCHERS.values()):
+        watcher.stop()
+    JOBS.shutdown()
+
+app = FastAPI(title="AI Code Archaeologist", lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -22,109 +58,439 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global State (MVP specific)
-STATE = {
-    "graph": None,
-    "graph_data": None,
-    "clusters": None,
-    "status": "IDLE"
-}
-
 class AnalysisRequest(BaseModel):
     path: str
+    language: str = "java"  # "java", "cpp", "python", a comma-separated mix or "auto"
+    exclude: List[str] = []  # gitignore-style globs relative to path, e.g. "**/generated/**"
+    max_file_size: Optional[int] = 2 * 1024 * 1024  # skip larger (generated) files; None: no limit
+    use_gitignore: bool = True
+    git_index: bool = False  # list tracked files from the git index instead of walking
+    workers: Optional[int] = None  # parse worker processes (default: all cores)
+    batch_size: int = 64  # files handed to a parse worker at a time
+    repo: Optional[str] = None  # key to store results under (default: the absolute path)
+    max_fanout: int = 5  # max targets linked for an ambiguous call
+    embed: bool = False  # also embed function bodies for semantic search
+    embed_threads: Optional[int] = None
+    embed_backend: str = "torch"  # "torch", "onnx" or "openvino"
+    embed_model_file: Optional[str] = None  # e.g. a quantised ONNX export
+    embed_quantize: bool = False  # dynamic int8 quantisation (torch backend)
+    embed_index: str = "flat"  # "flat", "ivf", "ivfpq", "hnsw" or "hnswpq"
+    cluster_backend: str = "auto"  # "louvain", "leiden", "lpa" or "auto"
+    cluster_seed: int = 0  # same graph + seed -> same clusters
+    cluster_resolution: float = 1.0
+    cluster_levels: int = 3  # depth of the cluster hierarchy
+    cluster_resolutions: Optional[List[float]] = None  # multi-resolution levels instead of contraction
+    clones: bool = False  # also detect near-duplicate functions
+    clone_threshold: float = 0.8  # estimated Jaccard similarity of normalised token shingles
+    clone_min_tokens: int = 50  # smaller functions are not compared
+    history: bool = False  # mine the git history: churn, age and co-change per file and function
+    history_coupling_max_files: int = 30  # larger commits (bulk edits) do not count towards coupling
+    snapshot: bool = True  # persist the result so a restart can serve it immediately
+    profile: bool = False  # sample the job's stack; hot functions are reported with the job
+
+class WatchRequest(BaseModel):
+    repo: Optional[str] = None  # an analysed repository (default: the latest)
+    debounce: float = 0.3  # seconds without changes before a burst is applied
+    max_delay: float = 2.0  # ... or this long after its first change
+    polling: bool = False  # poll even where native file notifications are available
+    interval: float = 1.0  # polling period
+    max_files: int = 200  # larger bursts (e.g. a branch switch) trigger a full analysis
+    snapshot: bool = False  # persist the state after every update
+
+class WorkspaceRequest(BaseModel):
+    name: str
+    root: Optional[str] = None  # shards are the repositories/modules found below root ...
+    shards: Dict[str, str] = {}  # ... and/or given explicitly as {shard name: path}
     language: str = "java"
+    exclude: List[str] = []
+    workers: Optional[int] = None
+    max_fanout: int = 5
+    cluster_backend: str = "auto"
+    cluster_seed: int = 0
+    max_loaded: int = 8  # shard graphs kept in memory at once
+
+class WorkspaceImpactRequest(BaseModel):
+    nodes: List[str] = []  # workspace node ids ("<shard>:<node id>")
+    direction: str = "both"
+    min_weight: float = 0.0
+    limit: Optional[int] = 1000
+
+class ImpactRequest(BaseModel):
+    repo: Optional[str] = None
+    nodes: List[str] = []  # node ids
+    files: List[str] = []  # changed files, e.g. from a diff (relative to the repo root)
+    direction: str = "both"  # "upstream", "downstream" or "both"
+    depth: Optional[int] = None  # max call hops (default: unlimited)
+    min_weight: float = 0.0  # ignore call edges lighter than this
+    limit: Optional[int] = 1000  # max ids returned per direction
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
-@app.post("/analyze")
-async def analyze_codebase(req: AnalysisRequest):
-    debug_path = r"C:\project\BTP_Code_Archeologist\debug_output.txt"
-    try:
-        with open(debug_path, "a") as f:
-            f.write(f"Analyze called for {req.path}\n")
-    except:
-        pass
-
-    global STATE
-    if STATE["status"] == "PROCESSING":
-        raise HTTPException(status_code=400, detail="Already processing")
-    
-    STATE["status"] = "PROCESSING"
-    
-    try:
-        # 1. Ingest
-        print(f"Scanning {req.path}...", flush=True)
-        files = scan_codebase(req.path, req.language)
-        print(f"Found {len(files)} files.", flush=True)
-
-        # 2. Parse
-        print("Parsing files...", flush=True)
-        parser = JavaParser()
-        parsed_data = []
-        for f in files:
-            funcs = parser.parse_file(f)
-            parsed_data.append({
-                "file_path": f,
-                "functions": funcs
-            })
-            
-        # 3. Build Graph
-        print("Building graph...", flush=True)
-        builder = GraphBuilder()
-        builder.build_graph(parsed_data)
-        STATE["graph"] = builder.graph
-        
-        # 5. Clustering
-        print("Clustering...", flush=True)
-        cluster_engine = ClusteringEngine()
-        clusters = cluster_engine.cluster_graph(builder.graph)
-        cluster_engine.assign_clusters(builder.graph, clusters)
-        STATE["clusters"] = clusters
-        
-        STATE["graph_data"] = builder.get_graph_data()
-        STATE["status"] = "READY"
-        
-        return {
-            "status": "COMPLETED",
-            "file_count": len(files),
-            "node_count": builder.graph.number_of_nodes(),
-            "cluster_count": len(clusters)
-        }
-        
-    except Exception as e:
-        STATE["status"] = "ERROR"
-        try:
-            with open(debug_path, "a") as f:
-                f.write(f"Error: {e}\n")
-                import traceback
-                f.write(traceback.format_exc())
-                f.write("\n")
-        except:
-            pass
-        print(f"Analysis failed: {e}", flush=True)
-        raise HTTPException(status_code=500, detail=str(e))
+@app.post("/analyze", status_code=202)
+def analyze_codebase(req: AnalysisRequest):
+    if not os.path.isdir(req.path):
+        raise HTTPException(status_code=400, detail=f"Path does not exist: {req.path}")
+    languages = [name.strip() for name in req.language.lower().split(",")]
+    if req.language.lower() != "auto" and any(name not in PARSERS for name in languages):
+        raise HTTPException(status_code=400, detail=f"Unsupported language: {req.language}")
+    if req.cluster_backend not in ("auto",) + tuple(BACKENDS):
+        raise HTTPException(status_code=400, detail=f"Unknown cluster_backend: {req.cluster_backend}")
+    if req.embed_index not in INDEX_KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown embed_index: {req.embed_index}")
+
+    repo = req.repo or os.path.abspath(req.path)
+    job = JOBS.submit(repo, req.model_dump())
+    return {"job_id": job.id, "repo": repo, "status": job.status}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text format: job counts, stage timings, cache hit counts, graph sizes."""
+    rss = peak_rss_bytes()
+    if rss is not None:
+        METRICS.set("code_arc_peak_rss_bytes", rss)
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/jobs")
+def list_jobs():
+    return [job.to_dict() for job in JOBS.list()]
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = JOBS.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.to_dict()
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    job = JOBS.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.to_dict()
+
+@app.get("/repos")
+def list_repos():
+    return [
+        {"repo": key, "path": state["path"], **state["summary"]}
+        for key, state in JOBS.repos.items()
+    ]
 
 @app.get("/graph")
-def get_graph():
-    if not STATE["graph_data"]:
+def get_graph(
+    repo: Optional[str] = None,
+    fields: Optional[str] = None,   # comma-separated node fields; "code" is opt-in
+    format: str = "json",           # "json" or "ndjson" (streamed)
+    offset: int = 0,
+    limit: Optional[int] = None,    # page size; all nodes when omitted
+    lod: str = "node",              # "cluster" returns one supernode per cluster
+    cluster: Optional[int] = None,  # drill into one cluster
+    clones: bool = False,           # add near-duplicate links ("type": "clone"), if detected
+):
+    state = JOBS.repo_state(repo)
+    if not state:
         return {"nodes": [], "links": []}
-    return STATE["graph_data"]
+    graph = state["graph"]
+    try:
+        node_fields = export.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if lod == "cluster":
+        return export.cluster_overview(graph, state["clusters"])
+    if cluster is not None:
+        return export.cluster_subgraph(graph, cluster, node_fields)
+    if format == "ndjson":
+        return StreamingResponse(export.iter_ndjson(graph, node_fields), media_type="application/x-ndjson")
+    if limit is None:
+        offset, limit = 0, graph.number_of_nodes()
+    page = export.graph_page(graph, offset, limit, node_fields)
+    if clones and state.get("clones") is not None:
+        stop = page["next_offset"] if page["next_offset"] is not None else graph.number_of_nodes()
+        page["links"] += export.clone_links(graph, state["clones"], page["offset"], stop)
+    return page
+
+@app.get("/clones")
+def get_clones(repo: Optional[str] = None, node: Optional[str] = None, offset: int = 0, limit: int = 100):
+    """Groups of near-duplicate functions, most duplicated lines first; node: only its group."""
+    state = JOBS.repo_state(repo)
+    if not state:
+        raise HTTPException(status_code=404, detail="No analysis for this repository")
+    if state.get("clones") is None:
+        raise HTTPException(status_code=404, detail="Clone detection was not run; analyse with clones=true")
+    groups = clone_groups(state["graph"], state["clones"], node)
+    return {
+        "total_groups": len(groups),
+        "duplicated_functions": sum(g["size"] for g in groups),
+        "offset": offset,
+        "groups": groups[offset:offset + limit],
+    }
+
+@app.get("/node/{node_id:path}/source")
+def node_source(node_id: str, repo: Optional[str] = None):
+    """One function's source text, as parsed (graph payloads leave it out)."""
+    state = JOBS.repo_state(repo)
+    if not state:
+        raise HTTPException(status_code=404, detail="No analysis for this repository")
+    graph = state["graph"]
+    i = graph.index.get(node_id)
+    if i is None:
+        raise HTTPException(status_code=404, detail=f"Unknown node: {node_id}")
+    code = graph.sources([i])[0]
+    if code is None:
+        raise HTTPException(status_code=404, detail=f"Source of {node_id} is not available")
+    return {
+        "id": node_id,
+        "file": graph.file_of(i),
+        "start_line": int(graph.start_line[i]),
+        "end_line": int(graph.end_line[i]),
+        "code": code,
+    }
+
+@app.get("/history")
+def get_history(repo: Optional[str] = None, limit: int = 20):
+    """Churn and age from the git history: the most changed files, the function hotspots and coupled files."""
+    state = JOBS.repo_state(repo)
+    if not state:
+        raise HTTPException(status_code=404, detail="No analysis for this repository")
+    history = state.get("history")
+    graph = state["graph"]
+    if history is None or graph.history is None:
+        raise HTTPException(status_code=404, detail="No history mined; analyse a git repository with history=true")
+    files = sorted(history["files"].items(), key=lambda kv: (-kv[1]["commits"], kv[0]))[:limit]
+    score = graph.history["churn"].astype(np.int64) * graph.complexity
+    top = [i for i in np.argsort(-score, kind="stable")[:limit].tolist() if score[i] > 0]
+    return {
+        "head": history["head"],
+        "commits": history["commits"],
+        "new_commits": history["new_commits"],
+        "files": [{"file": path, **stats} for path, stats in files],
+        "hotspots": [{**graph.node_attributes(i), "id": graph.node_ids[i]} for i in top],
+        "coupling": [{"files": [a, b], "commits": n} for a, b, n in history["coupling"][:limit]],
+    }
+
+@app.get("/history/coupling")
+def get_coupling(file: str, repo: Optional[str] = None, limit: int = 20):
+    """
+    Files changed in the same commits as file (relative to the analysed path),
+    with confidence: the share of file's commits that also changed the other.
+    """
+    state = JOBS.repo_state(repo)
+    if not state or state.get("history") is None:
+        raise HTTPException(status_code=404, detail="No history mined for this repository")
+    history = state["history"]
+    if os.path.isabs(file):
+        file = os.path.relpath(file, state["path"])
+    file = file.replace(os.sep, "/")
+    stats = history["files"].get(file)
+    if stats is None:
+        raise HTTPException(status_code=404, detail=f"No history for {file}")
+    coupled = [(b if a == file else a, n) for a, b, n in history["coupling"] if file in (a, b)]
+    return {
+        "file": file,
+        "commits": stats["commits"],
+        "coupled": [
+            {"file": other, "commits": n, "confidence": round(n / stats["commits"], 3)}
+            for other, n in coupled[:limit]
+        ],
+    }
+
+@app.get("/diff")
+def diff_analyses(base: str, head: str, limit: int = 100):
+    """
+    Architecture diff between two analysed repositories (e.g. main and a
+    refactor branch analysed under different repo keys): added and removed
+    functions and calls, cluster migrations and new or broken call cycles.
+    """
+    states = {}
+    for key in (base, head):
+        states[key] = JOBS.repo_state(key)
+        if not states[key]:
+            raise HTTPException(status_code=404, detail=f"No analysis for {key}")
+    old, new = states[base], states[head]
+    return {"base": base, "head": head,
+            **graph_diff(old["graph"], new["graph"], old["clusters"], new["clusters"], limit=limit)}
 
 @app.get("/clusters")
-def get_clusters():
-    if not STATE["clusters"]:
+def get_clusters(repo: Optional[str] = None, level: int = 0):
+    """level 0: the clusters nodes are assigned to; higher levels are coarser groupings of them."""
+    state = JOBS.repo_state(repo)
+    if not state:
         return []
-    return STATE["clusters"]
+    if level == 0:
+        return state["clusters"]
+    levels = state.get("cluster_levels", [])
+    if level >= len(levels):
+        raise HTTPException(status_code=404, detail=f"No cluster level {level}")
+    parents = levels[level].get("parents", {})
+    return [{**c, "parent": parents.get(c["id"])} for c in levels[level]["clusters"]]
+
+@app.post("/impact")
+def impact(req: ImpactRequest):
+    state = JOBS.repo_state(req.repo)
+    if not state:
+        raise HTTPException(status_code=404, detail="No analysis for this repository")
+    if req.direction not in ("upstream", "downstream", "both"):
+        raise HTTPException(status_code=400, detail=f"Unknown direction: {req.direction}")
+    graph = state["graph"]
+    targets = list(req.nodes)
+    if req.files:
+        targets += IMPACT.nodes_in_files(graph, req.files, root=state["path"])
+    result = IMPACT.transitive_impact(graph, targets, req.direction, req.depth, req.min_weight)
+    for side in ("upstream", "downstream"):
+        if side in result:
+            result[f"{side}_count"] = len(result[side])
+            result[side] = result[side][:req.limit]
+    return result
+
+@app.get("/impact")
+def impact_of_node(node: str, repo: Optional[str] = None, direction: str = "both",
+                   depth: Optional[int] = None, min_weight: float = 0.0, limit: Optional[int] = 1000):
+    return impact(ImpactRequest(repo=repo, nodes=[node], direction=direction, depth=depth,
+                                min_weight=min_weight, limit=limit))
+
+@app.post("/workspaces", status_code=202)
+def build_workspace(req: WorkspaceRequest):
+    shards = dict(req.shards)
+    if req.root:
+        if not os.path.isdir(req.root):
+            raise HTTPException(status_code=400, detail=f"Path does not exist: {req.root}")
+        shards = {**discover_shards(req.root), **shards}
+    missing = [path for path in shards.values() if not os.path.isdir(path)]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Path does not exist: {missing[0]}")
+    if not shards:
+        raise HTTPException(status_code=400, detail="No shards given or found")
+    params = req.model_dump(exclude={"name", "root", "shards", "max_loaded"})
+    try:
+        workspace = Workspace(req.name, {k: os.path.abspath(v) for k, v in shards.items()}, params,
+                              max_loaded=req.max_loaded)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    WORKSPACES[req.name] = workspace
+    job = JOBS.submit(f"workspace:{req.name}", params, stages=WORKSPACE_STAGES, runner=workspace.build)
+    return {"job_id": job.id, "workspace": req.name, "shards": list(workspace.shards), "status": job.status}
+
+def _workspace(name: str) -> Workspace:
+    workspace = WORKSPACES.get(name)
+    if workspace is None:
+        raise HTTPException(status_code=404, detail="Unknown workspace")
+    return workspace
+
+@app.get("/workspaces")
+def list_workspaces():
+    return [workspace.summary() for workspace in WORKSPACES.values()]
+
+@app.get("/workspaces/{name}")
+def get_workspace(name: str):
+    return _workspace(name).to_dict()
+
+@app.get("/workspaces/{name}/graph")
+def get_workspace_graph(name: str, shard: str, fields: Optional[str] = None,
+                        offset: int = 0, limit: Optional[int] = None):
+    """One shard's nodes and links with workspace ids, plus its cross-shard links."""
+    workspace = _workspace(name)
+    try:
+        node_fields = export.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    page = workspace.shard_page(shard, offset, limit, node_fields)
+    if page is None:
+        raise HTTPException(status_code=404, detail=f"No analysis for shard {shard}")
+    return page
+
+@app.post("/workspaces/{name}/impact")
+def workspace_impact(name: str, req: WorkspaceImpactRequest):
+    workspace = _workspace(name)
+    if req.direction not in ("upstream", "downstream", "both"):
+        raise HTTPException(status_code=400, detail=f"Unknown direction: {req.direction}")
+    result = workspace.transitive_impact(IMPACT, req.nodes, req.direction, req.min_weight)
+    for side in ("upstream", "downstream"):
+        if side in result:
+            result[f"{side}_count"] = len(result[side])
+            result[side] = result[side][:req.limit]
+    return result
+
+@app.post("/watch", status_code=201)
+def start_watch(req: WatchRequest):
+    """Re-analyses touched files as they change; deltas are streamed by GET /watch/events."""
+    repo = req.repo or JOBS.latest_repo
+    state = JOBS.repo_state(repo)
+    if not state:
+        raise HTTPException(status_code=404, detail="No analysis for this repository")
+    if repo in WATCHERS:
+        return WATCHERS[repo].to_dict()
+    params = {**state.get("params", {}), "path": state["path"], "snapshot": req.snapshot}
+    watcher = Watcher(JOBS, repo, params, debounce=req.debounce, max_delay=req.max_delay,
+                      interval=req.interval, polling=req.polling, max_files=req.max_files)
+    watcher.start()
+    WATCHERS[repo] = watcher
+    return watcher.to_dict()
+
+def _watcher(repo: Optional[str]) -> Watcher:
+    watcher = WATCHERS.get(repo or JOBS.latest_repo)
+    if watcher is None:
+        raise HTTPException(status_code=404, detail="Repository is not watched")
+    return watcher
+
+@app.get("/watch")
+def list_watches():
+    return [watcher.to_dict() for watcher in WATCHERS.values()]
+
+@app.delete("/watch")
+def stop_watch(repo: Optional[str] = None):
+    watcher = _watcher(repo)
+    WATCHERS.pop(watcher.repo, None)
+    watcher.stop()
+    return watcher.to_dict()
+
+@app.get("/watch/events")
+def watch_events(repo: Optional[str] = None):
+    """
+    Server-sent events: "delta" (nodes/links/clusters to add, update and
+    remove; see export.graph_delta) after every update, "reload" when the
+    client should refetch /graph instead.
+    """
+    watcher = _watcher(repo)
+    events = watcher.subscribe()
+
+    def stream():
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                try:
+                    event = events.get(timeout=15)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            watcher.unsubscribe(events)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @app.post("/query")
-def chat_query(q: str):
-    # Stub for Chat Interface
-    return {
-        "response": f"I analyzed your question: '{q}'. Since I am an MVP without a live LLM key, I can tell you this system has {len(STATE.get('clusters', []))} clusters. Look at the Red ones!",
-        "relevant_nodes": []
-    }
+def chat_query(q: str, repo: Optional[str] = None, limit: int = 10, semantic: bool = True):
+    """
+    Hybrid search: BM25 over names, identifiers and comments, the vector index
+    (if the repository was analysed with embed=True) and call-graph re-ranking.
+    """
+    state = JOBS.repo_state(repo)
+    if not state:
+        raise HTTPException(status_code=404, detail="No analysis for this repository")
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Empty query")
+    result = QUERY.query(state, q, limit=max(1, min(limit, 100)), semantic=semantic)
+    nodes = result["relevant_nodes"]
+    if nodes:
+        top = ", ".join(f"{n['name']} ({os.path.basename(n['file'])}:{n['start_line']})" for n in nodes[:3])
+        response = f"Found {len(nodes)} functions related to '{q}'. Best matches: {top}."
+    else:
+        response = f"No functions match '{q}'."
+    return {"response": response, **result}
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8005)
@@ -1 +1,4 @@
-from .parser import JavaParser
+from .parser import JavaParser, QueryParser
+from .languages import CppParser, PythonParser, ParserRegistry, PARSERS, language_of
+from .pool import ParallelParser
+from .cache import ParseCache
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import sqlite3
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+from .parser import PARSER_VERSION
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".code_archaeologist", "cache")
+
+
+def file_digest(file_path: str) -> str:
+    h = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _key(path: str):
+    """Database key of a path: the text itself, or UTF-8 bytes with the undecodable ones restored."""
+    try:
+        path.encode("utf-8")
+        return path
+    except UnicodeEncodeError:
+        return path.encode("utf-8", errors="surrogateescape")
+
+
+def _path(key) -> str:
+    return key.decode("utf-8", errors="surrogateescape") if isinstance(key, bytes) else key
+
+
+def fingerprint(digests: Dict[str, str], extra: str = "") -> str:
+    """
+    Content hash of a set of files (path -> digest, see ParseCache.digests)
+    plus extra: equal fingerprints mean the analysis inputs did not change.
+    """
+    h = hashlib.sha1(extra.encode("utf-8"))
+    for path in sorted(digests):
+        h.update(f"{path}\0{digests[path]}\n".encode("utf-8", errors="surrogateescape"))
+    return h.hexdigest()
+
+
+class ParseCache:
+    """
+    Persistent cache of parse_file_unit output (see ParserRegistry).
+    Entries are keyed by file path and validated by content hash; size and
+    mtime are checked first so unchanged files are never even read.
+    One database serves every analysis of a root, so it says nothing about
+    what a particular graph was built from (see GraphBuilder.changed_files).
+    """
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'parser_version'").fetchone()
+        if row is None or row[0] != str(PARSER_VERSION):
+            # Entries written by another parser version have a different shape
+            self.conn.execute("DROP TABLE IF EXISTS parsed_files")
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('parser_version', ?)", (str(PARSER_VERSION),))
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS parsed_files (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime_ns INTEGER,
+                digest TEXT,
+                unit TEXT
+            )"""
+        )
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+        # path -> (size, mtime_ns, digest) for files that have to be (re)parsed
+        self._pending = {}
+        # path -> content digest of every file classified by this instance
+        self.digests: Dict[str, str] = {}
+
+    @classmethod
+    def for_root(cls, root_path: str, cache_dir: Optional[str] = None) -> "ParseCache":
+        """One cache database per analysed root."""
+        cache_dir = cache_dir or os.environ.get("CODE_ARC_CACHE_DIR", DEFAULT_CACHE_DIR)
+        key = hashlib.sha1(os.path.abspath(root_path).encode("utf-8")).hexdigest()[:16]
+        return cls(os.path.join(cache_dir, f"{key}.sqlite"))
+
+    def partition(self, files: Iterable[str]) -> Tuple[Dict[str, List[Dict[str, Any]]], List[str]]:
+        """
+        Splits files into cached results and files that need parsing.
+        Returns (cached: path -> parsed unit, stale: [paths]).
+        """
+        cached = {}
+        stale = []
+        for path, unit in self.classify(files):
+            if unit is None:
+                stale.append(path)
+            else:
+                cached[path] = unit
+        return cached, stale
+
+    def classify(self, files: Iterable[str]) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+        """
+        Streaming form of partition: yields (path, cached unit) as files
+        arrive, with None for files that need parsing. Vanished files are skipped.
+        """
+        rows = {
+            _path(row[0]): row[1:]
+            for row in self.conn.execute("SELECT path, size, mtime_ns, digest, unit FROM parsed_files")
+        }
+        touched = []
+        for path in files:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            row = rows.get(path)
+            if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+                self.digests[path] = row[2]
+                self.hits += 1
+                yield path, json.loads(row[3])
+                continue
+
+            # Fast check failed: fall back to the content hash
+            digest = self.digests[path] = file_digest(path)
+            if row and row[2] == digest:
+                touched.append((st.st_size, st.st_mtime_ns, _key(path)))
+                self.hits += 1
+                yield path, json.loads(row[3])
+                continue
+
+            self._pending[path] = (st.st_size, st.st_mtime_ns, digest)
+            self.misses += 1
+            yield path, None
+
+        if touched:
+            self.conn.executemany("UPDATE parsed_files SET size = ?, mtime_ns = ? WHERE path = ?", touched)
+            self.conn.commit()
+
+    def update(self, parsed_files: List[Dict[str, Any]]):
+        """Stores freshly parsed {"file_path", ...unit} entries."""
+        rows = []
+        for file_data in parsed_files:
+            path = file_data["file_path"]
+            stat = self._pending.pop(path, None)
+            if stat is None:
+                st = os.stat(path)
+                stat = (st.st_size, st.st_mtime_ns, file_digest(path))
+            unit = {k: v for k, v in file_data.items() if k != "file_path"}
+            rows.append((_key(path), stat[0], stat[1], stat[2], json.dumps(unit)))
+        self.conn.executemany("INSERT OR REPLACE INTO parsed_files VALUES (?, ?, ?, ?, ?)", rows)
+        self.conn.commit()
+
+    def prune(self, files: Iterable[str]) -> List[str]:
+        """Drops entries for files that no longer exist. Returns the removed paths."""
+        present = set(files)
+        removed = [_path(row[0]) for row in self.conn.execute("SELECT path FROM parsed_files")]
+        removed = [p for p in removed if p not in present]
+        if removed:
+            self.conn.executemany("DELETE FROM parsed_files WHERE path = ?", [(_key(p),) for p in removed])
+            self.conn.commit()
+        return removed
+
+    def forget(self, files: Iterable[str]):
+        """Drops the entries of the given (deleted) files."""
+        self.conn.executemany("DELETE FROM parsed_files WHERE path = ?", [(_key(p),) for p in files])
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,231 @@
+import os
+from typing import Any, Dict, List, Optional
+
+from ..ingestion.scanner import LANGUAGE_EXTENSIONS
+from .parser import QueryParser, JavaParser, simple_type_name
+
+CPP_QUERY = """
+(namespace_definition name: (_) @package)
+(using_declaration) @import
+[
+  (class_specifier name: (_) @type_name body: (_))
+  (struct_specifier name: (_) @type_name body: (_))
+] @type
+(field_declaration type: (_) @field_type declarator: [
+  (field_identifier) @field_name
+  (pointer_declarator declarator: (field_identifier) @field_name)
+  (reference_declarator (field_identifier) @field_name)
+])
+(function_definition declarator: [
+  (function_declarator declarator: (_) @name parameters: (parameter_list) @params)
+  (pointer_declarator declarator: (function_declarator declarator: (_) @name parameters: (parameter_list) @params))
+  (reference_declarator (function_declarator declarator: (_) @name parameters: (parameter_list) @params))
+]) @decl
+(call_expression function: [
+  (identifier) @call
+  (field_expression argument: (_) @receiver field: (field_identifier) @call)
+  (qualified_identifier scope: (_) @receiver name: (identifier) @call)
+  (template_function name: (identifier) @call)
+] arguments: (argument_list) @args)
+(_ type: (_) @var_type declarator: [
+  (identifier) @var_name
+  (pointer_declarator declarator: (identifier) @var_name)
+  (reference_declarator (identifier) @var_name)
+  (init_declarator declarator: [
+    (identifier) @var_name
+    (pointer_declarator declarator: (identifier) @var_name)
+    (reference_declarator (identifier) @var_name)
+  ])
+])
+[
+  (if_statement)
+  (for_statement)
+  (for_range_loop)
+  (while_statement)
+  (do_statement)
+  (catch_clause)
+  (conditional_expression)
+  (case_statement)
+] @branch
+(binary_expression operator: ["&&" "||"] @branch)
+"""
+
+PYTHON_QUERY = """
+[(import_statement) (import_from_statement)] @import
+(class_definition name: (identifier) @type_name) @type
+(class_definition body: (block (expression_statement
+  (assignment left: (identifier) @field_name type: (type) @field_type))))
+(assignment
+  left: (attribute object: (identifier) @_self attribute: (identifier) @field_name)
+  type: (type) @field_type
+  (#eq? @_self "self"))
+(assignment
+  left: (attribute object: (identifier) @_self attribute: (identifier) @field_name)
+  right: (call function: (identifier) @field_type)
+  (#eq? @_self "self")
+  (#match? @field_type "^[A-Z]"))
+(function_definition name: (identifier) @name parameters: (parameters) @params) @decl
+(call function: [
+  (identifier) @call
+  (attribute object: (_) @receiver attribute: (identifier) @call)
+] arguments: (_) @args)
+(typed_parameter (identifier) @var_name type: (type) @var_type)
+(typed_default_parameter name: (identifier) @var_name type: (type) @var_type)
+(assignment left: (identifier) @var_name type: (type) @var_type)
+(assignment
+  left: (identifier) @var_name
+  right: (call function: (identifier) @var_type)
+  (#match? @var_type "^[A-Z]"))
+[
+  (if_statement)
+  (elif_clause)
+  (for_statement)
+  (while_statement)
+  (except_clause)
+  (conditional_expression)
+  (boolean_operator)
+  (for_in_clause)
+  (if_clause)
+  (case_clause)
+] @branch
+"""
+
+
+class CppParser(QueryParser):
+    """
+    C++ functions, including out-of-class definitions ("void Foo::bar()"),
+    whose class comes from the qualified name. The first namespace of a file
+    stands in for its package; "using" declarations act as imports.
+    """
+
+    LANGUAGE = "cpp"
+    GRAMMAR = "tree_sitter_cpp"
+    QUERY = CPP_QUERY
+    PARAMETER_TYPES = ("parameter_declaration", "optional_parameter_declaration",
+                       "variadic_parameter_declaration")
+    CASE_LABELS = ("case_statement",)
+    INFERRED_TYPES = ("auto", "decltype")
+
+    def declaration_name(self, node, text) -> tuple:
+        class_name = ""
+        while node.type == "qualified_identifier":
+            scope = node.child_by_field_name("scope")
+            if scope is not None:
+                class_name = simple_type_name(text(scope))
+            node = node.child_by_field_name("name")
+        return text(node), class_name
+
+    def function_type(self, node_type: str, record: Dict[str, Any]) -> str:
+        if not record["class"]:
+            return "function"
+        if record["name"] == record["class"]:
+            return "constructor"
+        return "destructor" if record["name"].startswith("~") else "method"
+
+    def arity(self, params, text) -> int:
+        # "f(void)" declares no parameters
+        return sum(1 for c in params.named_children
+                   if c.type in self.PARAMETER_TYPES and text(c) != "void")
+
+    def import_names(self, node, text) -> List[str]:
+        name = text(node).replace("using", "", 1).strip(" ;\n\t")
+        if name.startswith("namespace "):
+            return [name[len("namespace "):].strip().replace("::", ".") + ".*"]
+        return [name.replace("::", ".")]
+
+    def package_name(self, package: str) -> str:
+        return package.replace("::", ".")
+
+    def receiver_text(self, receiver: str) -> str:
+        return receiver.replace("->", ".").replace("::", ".")
+
+
+class PythonParser(QueryParser):
+    """
+    Python functions and methods. Types come from annotations and from
+    constructor calls ("x = Foo()", "self.x = Foo()"); "self" is handled
+    like Java's "this". Modules have no package.
+    """
+
+    LANGUAGE = "python"
+    GRAMMAR = "tree_sitter_python"
+    QUERY = PYTHON_QUERY
+    PARAMETER_TYPES = ("identifier", "typed_parameter", "default_parameter", "typed_default_parameter",
+                       "list_splat_pattern", "dictionary_splat_pattern")
+
+    def function_type(self, node_type: str, record: Dict[str, Any]) -> str:
+        if not record["class"]:
+            return "function"
+        return "constructor" if record["name"] == "__init__" else "method"
+
+    def arity(self, params, text) -> int:
+        named = [c for c in params.named_children if c.type in self.PARAMETER_TYPES]
+        # Call sites never pass self/cls explicitly
+        if named and named[0].type == "identifier" and text(named[0]) in ("self", "cls"):
+            return len(named) - 1
+        return len(named)
+
+    def import_names(self, node, text) -> List[str]:
+        def dotted(n):
+            if n.type == "aliased_import":
+                n = n.child_by_field_name("name")
+            return text(n).lstrip(".")
+
+        names = [dotted(n) for n in node.children_by_field_name("name")]
+        if node.type == "import_statement":
+            return names
+        module = node.child_by_field_name("module_name")
+        prefix = dotted(module) + "." if module is not None and dotted(module) else ""
+        if any(c.type == "wildcard_import" for c in node.named_children):
+            return [prefix + "*"] if prefix else []
+        return [prefix + name for name in names]
+
+    def receiver_text(self, receiver: str) -> str:
+        if receiver == "self" or receiver.startswith("self."):
+            return "this" + receiver[4:]
+        return receiver
+
+
+# language -> parser class; grammars are only imported when a parser is created
+PARSERS = {
+    "java": JavaParser,
+    "cpp": CppParser,
+    "python": PythonParser,
+}
+
+EXTENSION_LANGUAGES = {
+    extension: language
+    for language, extensions in LANGUAGE_EXTENSIONS.items()
+    for extension in extensions
+}
+
+
+def language_of(file_path: str) -> Optional[str]:
+    return EXTENSION_LANGUAGES.get(os.path.splitext(file_path)[1].lower())
+
+
+class ParserRegistry:
+    """
+    Dispatches files to the parser of their language (by extension), so one
+    run can cover a polyglot repository. Parsers, and with them the
+    tree-sitter grammars, are created on first use.
+    """
+
+    def __init__(self, default_language: str = "java"):
+        self.default_language = default_language
+        self._parsers: Dict[str, QueryParser] = {}
+
+    def parser(self, language: str) -> QueryParser:
+        parser = self._parsers.get(language)
+        if parser is None:
+            cls = PARSERS.get(language)
+            if cls is None:
+                raise ValueError(f"Unsupported language: {language}")
+            parser = self._parsers[language] = cls()
+        return parser
+
+    def parser_for(self, file_path: str) -> QueryParser:
+        return self.parser(language_of(file_path) or self.default_language)
+
+    def parse_file_unit(self, file_path: str) -> Dict[str, Any]:
+        return self.parser_for(file_path).parse_file_unit(file_path)
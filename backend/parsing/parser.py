@@ -1,82 +1,265 @@
+import importlib
+import re
 from tree_sitter import Language, Parser
-import tree_sitter_java
 from typing import List, Dict, Any
 
-class JavaParser:
+try:
+    from tree_sitter import Query, QueryCursor  # tree-sitter >= 0.25
+except ImportError:  # older bindings expose Language.query / Query.matches
+    Query = QueryCursor = None
+
+# Bumped whenever the extracted records change, so cached parses are discarded
+PARSER_VERSION = 7
+
+# Declarations, call sites and the type information needed to resolve them
+# are matched by one compiled query, so a file is walked once, inside
+# tree-sitter, instead of by recursive Python traversal.
+JAVA_QUERY = """
+(package_declaration (_) @package)
+(import_declaration) @import
+[
+  (class_declaration name: (identifier) @type_name)
+  (interface_declaration name: (identifier) @type_name)
+  (enum_declaration name: (identifier) @type_name)
+  (record_declaration name: (identifier) @type_name)
+] @type
+(field_declaration type: (_) @field_type declarator: (variable_declarator name: (identifier) @field_name))
+(method_declaration name: (identifier) @name parameters: (formal_parameters) @params) @decl
+(constructor_declaration name: (identifier) @name parameters: (formal_parameters) @params) @decl
+(method_invocation object: (_)? @receiver name: (identifier) @call arguments: (argument_list) @args)
+(formal_parameter type: (_) @var_type name: (identifier) @var_name)
+(spread_parameter (_) @var_type (variable_declarator name: (identifier) @var_name))
+(local_variable_declaration type: (_) @var_type declarator: (variable_declarator name: (identifier) @var_name))
+[
+  (if_statement)
+  (for_statement)
+  (enhanced_for_statement)
+  (while_statement)
+  (do_statement)
+  (catch_clause)
+  (ternary_expression)
+  (switch_label)
+] @branch
+(binary_expression operator: ["&&" "||"] @branch)
+"""
+
+_TYPE_ARGUMENTS = re.compile(r"[<\[]")
+
+
+def simple_type_name(type_text: str) -> str:
+    """'java.util.List<Foo>[]' -> 'List', 'std::vector<int>' -> 'vector', 'Optional[Foo]' -> 'Optional'"""
+    base = _TYPE_ARGUMENTS.split(type_text, 1)[0].strip().strip("'\"")
+    return base.replace("::", ".").rsplit(".", 1)[-1]
+
+
+def _enclosing(containers: List[tuple], items: List[tuple]):
+    """
+    Sweeps items and (start_byte, end_byte, ...) containers, both sorted by
+    start byte, yielding (item, stack of containers enclosing it, outermost first).
+    """
+    stack = []
+    next_container = 0
+    for item in items:
+        pos = item[0]
+        while next_container < len(containers) and containers[next_container][0] <= pos:
+            stack.append(containers[next_container])
+            next_container += 1
+        stack = [c for c in stack if c[1] > pos]
+        yield item, stack
+
+
+class QueryParser:
+    """
+    Query-driven extraction shared by every language. A subclass names its
+    grammar module and a query using the common capture names:
+        @package @import @type/@type_name @field_type/@field_name
+        @decl/@name/@params @call/@receiver/@args @var_type/@var_name @branch
+    and overrides the hooks below where its syntax differs. The grammar
+    module is imported when the first parser of the language is created.
+    """
+
+    LANGUAGE = ""
+    GRAMMAR = ""  # module exposing language(), e.g. "tree_sitter_java"
+    QUERY = ""
+    PARAMETER_TYPES = ()
+    CASE_LABELS = ()  # branch nodes that are decisions only when labelled "case"
+    INFERRED_TYPES = ()  # declared types that say nothing, e.g. C++ "auto"
+
     def __init__(self):
-        self.JAVA_LANGUAGE = Language(tree_sitter_java.language())
-        self.parser = Parser(self.JAVA_LANGUAGE)
+        grammar = importlib.import_module(self.GRAMMAR)
+        self.language = Language(grammar.language())
+        self.parser = Parser(self.language)
+        # Compiled once per parser and reused for every file
+        if Query is not None:
+            self.query = Query(self.language, self.QUERY)
+        else:
+            self.query = self.language.query(self.QUERY)
 
     def parse_file(self, file_path: str) -> List[Dict[str, Any]]:
+        return self.parse_file_unit(file_path)["functions"]
+
+    def parse_file_unit(self, file_path: str) -> Dict[str, Any]:
+        """
+        Returns the whole compilation unit: package, imports, field types per
+        class and the function records.
+        """
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                code = f.read()
-            # print(f"Read {len(code)} bytes from {file_path}") # Debug
+            with open(file_path, "rb") as f:
+                source = f.read()
         except Exception as e:
             print(f"Error reading {file_path}: {e}")
-            return []
-
-        tree = self.parser.parse(bytes(code, "utf8"))
-        
-        functions = []
-        
-        def traverse(node):
-            if node.type == "method_declaration" or node.type == "constructor_declaration":
-                # Found a method
-                func_name = "anonymous"
-                # Find name node
-                for child in node.children:
-                    if child.type == "identifier":
-                        func_name = code[child.start_byte:child.end_byte]
-                        break
-                
-                # Extract calls
-                calls = self._extract_calls_manual(node, code)
-                
-                functions.append({
-                    "name": func_name,
-                    "type": "constructor" if node.type == "constructor_declaration" else "method",
-                    "start_line": node.start_point.row + 1,
-                    "end_line": node.end_point.row + 1,
-                    "code": code[node.start_byte:node.end_byte],
-                    "calls": calls
-                })
-            
-            # Recurse
-            for child in node.children:
-                traverse(child)
-
-        traverse(tree.root_node)
-        return functions
-
-    def _extract_calls_manual(self, node, code) -> List[str]:
-        calls = []
-        def traverse_calls(n):
-            if n.type == "method_invocation":
-                # Find name
-                for child in n.children:
-                    if child.type == "identifier":
-                        calls.append(code[child.start_byte:child.end_byte])
-                        break
-            for child in n.children:
-                traverse_calls(child)
-        traverse_calls(node)
-        return calls
-
-    def _extract_calls(self, node, code) -> List[str]:
-        calls = []
-        # Simple query for method invocations
-        query_scm = """
-        (method_invocation
-            name: (identifier) @call_name)
+            return {"language": self.LANGUAGE, "package": "", "imports": [], "fields": {}, "functions": []}
+
+        return self.parse_unit(source)
+
+    def parse_source(self, source: bytes) -> List[Dict[str, Any]]:
+        return self.parse_unit(source)["functions"]
+
+    def parse_unit(self, source: bytes) -> Dict[str, Any]:
         """
-        query = self.JAVA_LANGUAGE.query(query_scm)
-        for match in query.matches(node):
-            captures = match[1]
-            if "call_name" in captures:
-                call_node = captures["call_name"][0]
-                calls.append(code[call_node.start_byte:call_node.end_byte])
-        return calls
+        Extracts functions and their call sites from raw source bytes.
+        A function's calls include every invocation inside its body, nested
+        (anonymous/local class, closure) functions included.
+        """
+        tree = self.parser.parse(source)
+        text = lambda n: source[n.start_byte:n.end_byte].decode("utf-8", errors="replace")
+
+        package = ""
+        imports = []
+        types = []   # (start_byte, end_byte, name)
+        fields = []  # (start_byte, name, type)
+        decls = []   # (start_byte, end_byte, function record, node type)
+        calls = []   # (start_byte, name, receiver, argc)
+        var_decls = []  # (start_byte, name, type)
+        branches = []  # (start_byte,) decision points for cyclomatic complexity
+        for _, captures in self._matches(tree.root_node):
+            if "call" in captures:
+                receiver = captures.get("receiver")
+                calls.append((
+                    captures["call"][0].start_byte,
+                    text(captures["call"][0]),
+                    self.receiver_text(text(receiver[0])) if receiver else None,
+                    captures["args"][0].named_child_count,
+                ))
+            elif "branch" in captures:
+                node = captures["branch"][0]
+                # "default:" is not a decision; every "case" label is
+                if node.type not in self.CASE_LABELS or text(node).startswith("case"):
+                    branches.append((node.start_byte,))
+            elif "var_name" in captures:
+                type_name = simple_type_name(text(captures["var_type"][0]))
+                if type_name in self.INFERRED_TYPES:
+                    type_name = "var"  # what the symbol index treats as unknown
+                var_decls.append((captures["var_name"][0].start_byte, text(captures["var_name"][0]), type_name))
+            elif "decl" in captures:
+                node = captures["decl"][0]
+                name, class_name = self.declaration_name(captures["name"][0], text)
+                decls.append((node.start_byte, node.end_byte, {
+                    "name": name,
+                    "type": "method",
+                    "class": class_name,
+                    "arity": self.arity(captures["params"][0], text),
+                    "start_line": node.start_point[0] + 1,
+                    "end_line": node.end_point[0] + 1,
+                    "start_byte": node.start_byte,
+                    "end_byte": node.end_byte,
+                    # The body text itself is not kept (see storage.snippets)
+                    "loc": sum(1 for line in text(node).splitlines() if line.strip()),
+                    "complexity": 1,
+                    "calls": [],
+                    "call_sites": [],
+                    "locals": {}
+                }, node.type))
+            elif "field_name" in captures:
+                fields.append((captures["field_name"][0].start_byte, text(captures["field_name"][0]),
+                               simple_type_name(text(captures["field_type"][0]))))
+            elif "type" in captures:
+                node = captures["type"][0]
+                types.append((node.start_byte, node.end_byte, simple_type_name(text(captures["type_name"][0]))))
+            elif "import" in captures:
+                imports.extend(self.import_names(captures["import"][0], text))
+            elif "package" in captures:
+                package = package or self.package_name(text(captures["package"][0]))
+
+        for items in (types, decls, calls, var_decls, fields, branches):
+            items.sort(key=lambda item: item[0])
+
+        # Innermost enclosing type of every declaration and field (unless the
+        # declaration names its class itself, as in C++ "void Foo::bar()")
+        for decl, stack in _enclosing(types, decls):
+            record = decl[2]
+            record["class"] = record["class"] or (stack[-1][2] if stack else "")
+            record["type"] = self.function_type(decl[3], record)
+        field_types = {}
+        for (_, name, type_name), stack in _enclosing(types, fields):
+            if stack:
+                field_types.setdefault(stack[-1][2], {})[name] = type_name
+
+        # Parameters and locals belong to the innermost enclosing declaration
+        for (_, name, type_name), stack in _enclosing(decls, var_decls):
+            if stack:
+                stack[-1][2]["locals"][name] = type_name
+
+        # McCabe complexity: 1 + decision points, counted in the innermost declaration
+        for _, stack in _enclosing(decls, branches):
+            if stack:
+                stack[-1][2]["complexity"] += 1
+
+        # Calls belong to every enclosing declaration
+        for (_, name, receiver, argc), stack in _enclosing(decls, calls):
+            for decl in stack:
+                decl[2]["calls"].append(name)
+                decl[2]["call_sites"].append([name, receiver, argc])
+
+        return {
+            "language": self.LANGUAGE,
+            "package": package,
+            "imports": imports,
+            "fields": field_types,
+            "functions": [d[2] for d in decls]
+        }
+
+    # Language hooks
+
+    def declaration_name(self, node, text) -> tuple:
+        """(function name, class it is qualified with or "")"""
+        return text(node), ""
+
+    def function_type(self, node_type: str, record: Dict[str, Any]) -> str:
+        return "method" if record["class"] else "function"
+
+    def arity(self, params, text) -> int:
+        return sum(1 for c in params.named_children if c.type in self.PARAMETER_TYPES)
+
+    def import_names(self, node, text) -> List[str]:
+        return [text(node)]
+
+    def package_name(self, package: str) -> str:
+        return package
+
+    def receiver_text(self, receiver: str) -> str:
+        """Normalised so the symbol index sees Java-style "this" / "this.field"."""
+        return receiver
+
+    def _matches(self, node):
+        if QueryCursor is not None:
+            return QueryCursor(self.query).matches(node)
+        return self.query.matches(node)
+
+
+class JavaParser(QueryParser):
+    LANGUAGE = "java"
+    GRAMMAR = "tree_sitter_java"
+    QUERY = JAVA_QUERY
+    PARAMETER_TYPES = ("formal_parameter", "spread_parameter")
+    CASE_LABELS = ("switch_label",)
+
+    def function_type(self, node_type: str, record: Dict[str, Any]) -> str:
+        return "constructor" if node_type == "constructor_declaration" else "method"
+
+    def import_names(self, node, text) -> List[str]:
+        imp = text(node)
+        return [imp.replace("import", "", 1).replace("static ", "", 1).strip(" ;\n\t")]
 
 if __name__ == "__main__":
     # Test stub - wait for proper environment
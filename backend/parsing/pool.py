@@ -0,0 +1,125 @@
+import itertools
+import os
+from collections import deque
+from collections.abc import Sized
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Sequence
+
+from .languages import ParserRegistry
+
+# Order of the fields in a compact function record. Workers send tuples
+# instead of dicts so the per-record key strings are not pickled back.
+FUNCTION_FIELDS = ("name", "type", "class", "arity", "start_line", "end_line",
+                   "start_byte", "end_byte", "loc", "complexity", "calls", "call_sites", "locals")
+
+# Each worker process owns its own tree-sitter parsers (created once per
+# process, per language on first use)
+_WORKER_PARSER = None
+
+
+def _init_worker():
+    global _WORKER_PARSER
+    _WORKER_PARSER = ParserRegistry()
+
+
+def _pack(unit: Dict[str, Any]) -> tuple:
+    functions = [tuple(func[field] for field in FUNCTION_FIELDS) for func in unit["functions"]]
+    return unit["language"], unit["package"], unit["imports"], unit["fields"], functions
+
+
+def _unpack(file_path: str, record: tuple) -> Dict[str, Any]:
+    language, package, imports, fields, functions = record
+    return {
+        "file_path": file_path,
+        "language": language,
+        "package": package,
+        "imports": imports,
+        "fields": fields,
+        "functions": [dict(zip(FUNCTION_FIELDS, func)) for func in functions]
+    }
+
+
+def _parse_batch(paths: Sequence[str]) -> List[tuple]:
+    return [_pack(_WORKER_PARSER.parse_file_unit(path)) for path in paths]
+
+
+def _batched(files: Iterable[str], size: int) -> Iterator[List[str]]:
+    batch = []
+    for path in files:
+        batch.append(path)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ParallelParser:
+    """
+    Parsing stage backed by a process pool. Files are parsed by the
+    grammar of their extension, so a run may mix languages.
+    Files are sent to the workers in batches and the results come back in
+    input order, so the output is identical to parsing the files serially.
+    The input may be a stream (e.g. a scanner generator): batches are
+    submitted as they fill up, so parsing overlaps with producing the paths.
+    """
+
+    def __init__(self, workers: Optional[int] = None, batch_size: int = 64):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = max(1, batch_size)
+
+    def parse_files(
+        self,
+        files: Iterable[str],
+        progress: Optional[Callable[[int, Optional[int]], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns the parsed_data list: one {"file_path", "language", "package",
+        "imports", "fields", "functions"} dict per file.
+        progress(done, total) is called after every batch (total is None for
+        a stream); should_stop() is polled between batches and aborts the
+        stage (returning what was parsed so far).
+        """
+        total = len(files) if isinstance(files, Sized) else None
+        batches = _batched(files, self.batch_size)
+        # Two batches decide whether a pool is worth starting
+        head = list(itertools.islice(batches, 2))
+        batches = itertools.chain(head, batches)
+        if self.workers <= 1 or len(head) <= 1:
+            return self._parse_serial(batches, total, progress, should_stop)
+
+        parsed_data = []
+        in_flight = deque()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as pool:
+            def collect():
+                batch, future = in_flight.popleft()
+                for file_path, record in zip(batch, future.result()):
+                    parsed_data.append(_unpack(file_path, record))
+                if progress:
+                    progress(len(parsed_data), total)
+
+            for batch in batches:
+                if should_stop and should_stop():
+                    break
+                in_flight.append((batch, pool.submit(_parse_batch, batch)))
+                # Bounded look-ahead; collect in submission order so the
+                # output matches the serial path
+                while len(in_flight) > 2 * self.workers:
+                    collect()
+            while in_flight and not (should_stop and should_stop()):
+                collect()
+            if in_flight:
+                pool.shutdown(wait=False, cancel_futures=True)
+        return parsed_data
+
+    def _parse_serial(self, batches, total, progress, should_stop) -> List[Dict[str, Any]]:
+        parser = ParserRegistry()
+        parsed_data = []
+        for batch in batches:
+            if should_stop and should_stop():
+                break
+            parsed_data.extend({"file_path": f, **parser.parse_file_unit(f)} for f in batch)
+            if progress:
+                progress(len(parsed_data), total)
+        return parsed_data
@@ -0,0 +1,143 @@
+import threading
+import time
+import weakref
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+from ..graph.compact import CompactGraph
+from .lexical import LexicalIndex, snippet
+
+# Reciprocal rank fusion constant: dampens the weight of the very top ranks
+RRF_K = 60
+
+
+class QueryEngine:
+    """
+    Hybrid retrieval over one repository's functions:
+    - lexical: BM25 over names, file names and body tokens (LexicalIndex),
+      plus exact symbol hits, which always rank first;
+    - semantic: nearest neighbours in the repository's vector index, when
+      it was analysed with embed=True and the model can be loaded;
+    - graph: the fused candidates are re-ranked by call-graph proximity, so
+      a function called by or calling other good hits moves up.
+    Lexical indexes are built on first query and kept per graph (dropped
+    with it), each with an LRU of recent results.
+    """
+
+    def __init__(self, candidates: int = 50, graph_weight: float = 0.5, cache_size: int = 256):
+        self.candidates = candidates
+        self.graph_weight = graph_weight
+        self.cache_size = cache_size
+        self._indexes = weakref.WeakKeyDictionary()  # graph -> (LexicalIndex, result LRU)
+        self._lock = threading.Lock()
+
+    def index(self, graph: CompactGraph) -> LexicalIndex:
+        return self._entry(graph)[0]
+
+    def _entry(self, graph: CompactGraph):
+        with self._lock:
+            entry = self._indexes.get(graph)
+            if entry is None:
+                start = time.perf_counter()
+                entry = self._indexes[graph] = (LexicalIndex(graph), OrderedDict())
+                print(f"Built lexical index of {len(entry[0])} functions, {len(entry[0].vocab)} terms "
+                      f"in {time.perf_counter() - start:.2f}s", flush=True)
+            return entry
+
+    def query(self, state: Dict[str, Any], q: str, limit: int = 10, semantic: bool = True) -> Dict[str, Any]:
+        """
+        Ranked functions for q: {"relevant_nodes": [...], "retrievers": [...],
+        "cached": bool, "took_ms": float}. Each node carries its id, name,
+        file, lines, cluster, scores and a snippet around the first matching line.
+        """
+        start = time.perf_counter()
+        graph: CompactGraph = state["graph"]
+        index, cache = self._entry(graph)
+        key = (" ".join(q.split()).lower(), limit, semantic)
+        with self._lock:
+            result = cache.get(key)
+            if result is not None:
+                cache.move_to_end(key)
+        if result is not None:
+            return {**result, "cached": True, "took_ms": round(1000 * (time.perf_counter() - start), 2)}
+
+        exact = index.exact(q)
+        lexical = index.search(q, self.candidates)
+        rankings = [[i for i, _ in lexical]]
+        retrievers = ["lexical"]
+        vector = self._semantic(state, graph, q) if semantic else []
+        if vector:
+            rankings.append(vector)
+            retrievers.append("semantic")
+
+        # Reciprocal rank fusion: robust to BM25 scores and L2 distances having unrelated scales
+        fused: Dict[int, float] = {}
+        for ranking in rankings:
+            for rank, i in enumerate(ranking):
+                fused[i] = fused.get(i, 0.0) + 1.0 / (RRF_K + rank + 1)
+        scores = self._rerank(graph, fused) if fused else {}
+        if scores:
+            retrievers.append("graph")
+        best = max(scores.values(), default=1.0)
+        for i in exact:
+            scores[i] = scores.get(i, 0.0) + 2 * best
+        ranked = sorted(scores, key=lambda i: (-scores[i], i))[:limit]
+
+        lexical_scores = dict(lexical)
+        semantic_ranks = {i: rank for rank, i in enumerate(vector)}
+        nodes = []
+        for i, code in zip(ranked, graph.sources(ranked)):
+            text, offset = snippet(code, q)
+            attrs = graph.node_attributes(i)
+            nodes.append({
+                "id": graph.node_ids[i],
+                "name": attrs["name"],
+                "file": attrs["file"],
+                "start_line": attrs["start_line"],
+                "end_line": attrs["end_line"],
+                "cluster": attrs.get("cluster"),
+                "score": round(scores[i], 6),
+                "exact": i in exact,
+                "lexical_score": round(lexical_scores[i], 4) if i in lexical_scores else None,
+                "semantic_rank": semantic_ranks.get(i),
+                "snippet": text,
+                "snippet_line": attrs["start_line"] + offset,
+            })
+        result = {"relevant_nodes": nodes, "retrievers": retrievers}
+        with self._lock:
+            cache[key] = result
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        return {**result, "cached": False, "took_ms": round(1000 * (time.perf_counter() - start), 2)}
+
+    def _semantic(self, state: Dict[str, Any], graph: CompactGraph, q: str) -> List[int]:
+        """Node indices nearest to q in the vector index; empty without embeddings or their model."""
+        embeddings = state.get("embeddings")
+        if embeddings is None:
+            return []
+        try:
+            hits = embeddings.search_scored(q, self.candidates)
+        except ImportError as e:
+            print(f"Semantic search unavailable: {e}", flush=True)
+            return []
+        return [graph.index[node_id] for node_id, _ in hits if node_id in graph.index]
+
+    def _rerank(self, graph: CompactGraph, fused: Dict[int, float]) -> Dict[int, float]:
+        """
+        Boosts each candidate by the fused scores of the candidates it calls
+        or is called by, relative to the best candidate score.
+        """
+        candidates = np.fromiter(fused, dtype=np.int64, count=len(fused))
+        weights = np.zeros(graph.number_of_nodes(), dtype=np.float64)
+        weights[candidates] = list(fused.values())
+        rev_indptr, rev_indices, _ = graph.reverse()
+        best = weights.max()
+        scores = {}
+        for i in candidates.tolist():
+            neighbours = np.concatenate((graph.indices[graph.indptr[i]:graph.indptr[i + 1]],
+                                         rev_indices[rev_indptr[i]:rev_indptr[i + 1]]))
+            neighbours = neighbours[neighbours != i]
+            proximity = weights[np.unique(neighbours)].sum() / best if len(neighbours) else 0.0
+            scores[i] = fused[i] * (1 + self.graph_weight * min(proximity, 1.0))
+        return scores
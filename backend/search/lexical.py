@@ -0,0 +1,138 @@
+import math
+import os
+import re
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from ..graph.compact import CompactGraph
+
+IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+# Splits "parseHTTPRequest2" into "parse", "HTTP", "Request", "2"
+WORD = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+# Keywords and very common type names carry no meaning for search
+STOPWORDS = frozenset("""
+abstract assert auto bool boolean break byte case catch char class const continue def default
+del delete do double elif else enum except extends false final finally float for from friend
+if implements import in inline int interface is lambda long namespace new none not null object
+or override package pass private protected public raise return self short signed sizeof static
+std string struct super switch synchronized template this throw throws true try typedef typename
+unsigned using var virtual void volatile while with yield the a an of to and
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-cased search terms of a text: every identifier whole ("processorder")
+    and its camelCase/snake_case words ("process", "order"). Comments and
+    strings are tokenized the same way, so their words are searchable too.
+    """
+    tokens = []
+    for ident in IDENTIFIER.findall(text):
+        whole = ident.lower()
+        words = [w.lower() for w in WORD.findall(ident)]
+        if len(whole) > 1 and whole not in STOPWORDS:
+            tokens.append(whole)
+        if len(words) > 1:
+            tokens.extend(w for w in words if len(w) > 1 and w not in STOPWORDS and w != whole)
+    return tokens
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over the functions of one CompactGraph. A function's
+    document is its name (counted name_weight times), the name of its file
+    (the class, in Java) and the tokens of its body. Postings are kept as
+    term-major CSR arrays (postings_ptr/doc_ids/tfs), so scoring a query term
+    is a few vectorised numpy operations over its posting list.
+    """
+
+    def __init__(self, graph: CompactGraph, name_weight: int = 3, k1: float = 1.2, b: float = 0.75,
+                 chunk_size: int = 4096):
+        self.k1 = k1
+        self.b = b
+        n = graph.number_of_nodes()
+        self.n_docs = n
+        self.vocab: Dict[str, int] = {}
+        # Exact symbol lookup: lower-cased function name -> node indices
+        self.names: Dict[str, List[int]] = {}
+        for i, name in enumerate(graph.names):
+            self.names.setdefault(name.lower(), []).append(i)
+
+        file_tokens = [tokenize(os.path.splitext(os.path.basename(f))[0]) for f in graph.files]
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        tfs: List[int] = []
+        doc_len = np.zeros(n, dtype=np.float32)
+        for start in range(0, n, chunk_size):
+            idx = range(start, min(n, start + chunk_size))
+            for i, code in zip(idx, graph.sources(idx)):
+                counts: Dict[str, int] = {}
+                for token in tokenize(graph.names[i]):
+                    counts[token] = counts.get(token, 0) + name_weight
+                for token in file_tokens[graph.file_idx[i]]:
+                    counts[token] = counts.get(token, 0) + 1
+                for token in tokenize(code or ""):
+                    counts[token] = counts.get(token, 0) + 1
+                for token, count in counts.items():
+                    term = self.vocab.get(token)
+                    if term is None:
+                        term = self.vocab[token] = len(self.vocab)
+                    term_ids.append(term)
+                    doc_ids.append(i)
+                    tfs.append(count)
+                doc_len[i] = sum(counts.values())
+
+        # Doc-major lists -> term-major CSR
+        terms = np.array(term_ids, dtype=np.int32)
+        order = np.argsort(terms, kind="stable")
+        self.doc_ids = np.array(doc_ids, dtype=np.int32)[order]
+        self.tfs = np.array(tfs, dtype=np.float32)[order]
+        self.postings_ptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(self.vocab)), out=self.postings_ptr[1:])
+        avg = float(doc_len.mean()) if n else 1.0
+        # Per-document BM25 length normalisation, computed once
+        self.norm = (k1 * (1 - b + b * doc_len / max(avg, 1.0))).astype(np.float32)
+
+    def __len__(self) -> int:
+        return self.n_docs
+
+    def exact(self, query: str) -> List[int]:
+        """Functions named exactly like the query (ignoring case and a trailing "()")."""
+        return self.names.get(query.strip().rstrip("()").lower(), [])
+
+    def search(self, query: str, k: int = 50) -> List[Tuple[int, float]]:
+        """(node index, BM25 score) pairs, best first."""
+        scores = None
+        for token in dict.fromkeys(tokenize(query)):
+            term = self.vocab.get(token)
+            if term is None:
+                continue
+            lo, hi = self.postings_ptr[term], self.postings_ptr[term + 1]
+            docs, tf = self.doc_ids[lo:hi], self.tfs[lo:hi]
+            df = hi - lo
+            idf = math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            if scores is None:
+                scores = np.zeros(self.n_docs, dtype=np.float32)
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + self.norm[docs])
+        if scores is None:
+            return []
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.lexsort((hits, -scores[hits]))]
+        return [(int(i), float(scores[i])) for i in hits]
+
+
+def snippet(text: Optional[str], query: str, context: int = 2, max_chars: int = 400) -> Tuple[str, int]:
+    """
+    The lines of a function around its first line containing a query term,
+    and the offset of the first of them within the function (0: the signature).
+    """
+    if not text:
+        return "", 0
+    terms = set(tokenize(query))
+    lines = text.splitlines()
+    hit = next((pos for pos, line in enumerate(lines) if terms.intersection(tokenize(line))), 0)
+    start = max(0, hit - context)
+    return "\n".join(lines[start:hit + context + 1])[:max_chars], start
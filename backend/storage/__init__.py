@@ -0,0 +1,3 @@
+from .snapshot import (SNAPSHOT_VERSION, save_snapshot, load_snapshot, iter_snapshots,
+                       read_manifest, load_interface, snapshot_dir, snapshot_root)
+from .snippets import SnippetStore
@@ -0,0 +1,46 @@
+import json
+import os
+import numpy as np
+from typing import Any, List, Sequence
+
+# Everything is read back with allow_pickle=False: a snapshot file can never run code.
+
+
+def save_array(directory: str, name: str, array: np.ndarray):
+    np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+
+
+def load_array(directory: str, name: str, mmap: bool = True) -> np.ndarray:
+    """Large columns are memory-mapped, so loading costs no more than opening the file."""
+    return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None, allow_pickle=False)
+
+
+def save_strings(directory: str, name: str, values: Sequence[str]):
+    """
+    A string column as one UTF-8 blob (<name>.txt) plus character offsets
+    (<name>.offsets.npy): far smaller and faster to read than a numpy unicode array.
+    Undecodable bytes of file names (surrogate escapes) are written back as they were.
+    """
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum([len(v) for v in values], out=offsets[1:])
+    with open(os.path.join(directory, f"{name}.txt"), "w", encoding="utf-8", errors="surrogateescape",
+              newline="") as f:
+        f.write("".join(values))
+    save_array(directory, f"{name}.offsets", offsets)
+
+
+def load_strings(directory: str, name: str) -> List[str]:
+    with open(os.path.join(directory, f"{name}.txt"), encoding="utf-8", errors="surrogateescape", newline="") as f:
+        text = f.read()
+    offsets = load_array(directory, f"{name}.offsets", mmap=False).tolist()
+    return [text[a:b] for a, b in zip(offsets, offsets[1:])]
+
+
+def save_json(directory: str, name: str, value: Any):
+    with open(os.path.join(directory, f"{name}.json"), "w", encoding="utf-8") as f:
+        json.dump(value, f)
+
+
+def load_json(directory: str, name: str) -> Any:
+    with open(os.path.join(directory, f"{name}.json"), encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,204 @@
+import hashlib
+import os
+import shutil
+import time
+import numpy as np
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from ..graph.compact import CompactGraph
+from ..parsing.cache import DEFAULT_CACHE_DIR
+from . import columns
+from .snippets import SnippetStore
+
+# Bump when the layout below changes; snapshots of another version are ignored
+SNAPSHOT_VERSION = 5
+
+GRAPH_ARRAYS = ("file_idx", "start_line", "end_line", "start_byte", "end_byte",
+                "complexity", "loc", "cluster", "indptr", "indices", "weights")
+CLONE_ARRAYS = ("group", "pairs", "similarity")
+HISTORY_ARRAYS = ("churn", "churn_lines", "first_commit", "last_commit")
+
+
+def snapshot_root(cache_dir: Optional[str] = None) -> str:
+    cache_dir = cache_dir or os.environ.get("CODE_ARC_CACHE_DIR", DEFAULT_CACHE_DIR)
+    return os.path.join(cache_dir, "snapshots")
+
+
+def snapshot_dir(repo: str, cache_dir: Optional[str] = None) -> str:
+    key = hashlib.sha1(repo.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(snapshot_root(cache_dir), key)
+
+
+def save_snapshot(repo: str, state: Dict[str, Any], cache_dir: Optional[str] = None) -> str:
+    """
+    Writes one repository's analysis state as a snapshot directory:
+        manifest.json                 version, repo, path, summary, counts
+        nodes.txt / files.txt / ...   string columns (ids, names, kinds, files, file digests)
+        <column>.npy                  node columns, cluster labels and CSR edges
+        clusters.json                 cluster list as served by /clusters
+        cluster_levels.json           cluster hierarchy (ids, sizes, parents)
+        clone_*.npy                   clone group per node, clone pairs and similarities (optional)
+        history.json, history_*.npy   git history summary and per-node columns (optional)
+        interface.json                see GraphBuilder.interface (when a builder is present)
+        embeddings/                   see EmbeddingProcessor.save (optional)
+    The directory is written next to the old one and swapped in at the end,
+    so readers never see a half-written snapshot.
+    """
+    target = snapshot_dir(repo, cache_dir)
+    tmp = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    graph: CompactGraph = state["graph"]
+    columns.save_strings(tmp, "nodes", graph.node_ids)
+    columns.save_strings(tmp, "names", graph.names)
+    columns.save_strings(tmp, "kinds", graph.kinds)
+    columns.save_strings(tmp, "files", graph.files)
+    columns.save_strings(tmp, "file_digests", graph.file_digests)
+    for name in GRAPH_ARRAYS:
+        columns.save_array(tmp, name, getattr(graph, name))
+    columns.save_json(tmp, "clusters", state["clusters"])
+    columns.save_json(tmp, "cluster_levels", state.get("cluster_levels", []))
+    builder = state.get("builder")
+    if builder is not None:
+        columns.save_json(tmp, "interface", builder.interface())
+    clones = state.get("clones")
+    if clones is not None:
+        for name in CLONE_ARRAYS:
+            columns.save_array(tmp, f"clone_{name}", clones[name])
+    history = state.get("history")
+    if history is not None and graph.history is not None:
+        columns.save_json(tmp, "history", history)
+        for name in HISTORY_ARRAYS:
+            columns.save_array(tmp, f"history_{name}", graph.history[name])
+    else:
+        history = None
+
+    embeddings = state.get("embeddings")
+    if embeddings is not None:
+        embeddings.save(os.path.join(tmp, "embeddings"))
+
+    # The manifest goes last: a directory without one is never loaded
+    columns.save_json(tmp, "manifest", {
+        "version": SNAPSHOT_VERSION,
+        "repo": repo,
+        "path": state["path"],
+        "created_at": time.time(),
+        "summary": state["summary"],
+        "fingerprint": state.get("fingerprint"),
+        "workspace": state.get("workspace"),
+        "params": state.get("params"),
+        "node_count": graph.number_of_nodes(),
+        "edge_count": graph.number_of_edges(),
+        "embeddings": embeddings is not None,
+        "clones": clones is not None,
+        "history": history is not None,
+    })
+
+    old = f"{target}.old-{os.getpid()}"
+    if os.path.exists(target):
+        os.replace(target, old)
+    os.replace(tmp, target)
+    shutil.rmtree(old, ignore_errors=True)
+    return target
+
+
+def read_manifest(directory: str) -> Optional[Dict[str, Any]]:
+    """The manifest of a complete snapshot of this version, else None."""
+    try:
+        manifest = columns.load_json(directory, "manifest")
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("version") == SNAPSHOT_VERSION else None
+
+
+def load_interface(directory: str) -> Optional[Dict[str, Any]]:
+    """The snapshot's GraphBuilder.interface, without loading the graph."""
+    try:
+        return columns.load_json(directory, "interface")
+    except (OSError, ValueError):
+        return None
+
+
+def load_snapshot(directory: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    Reads a snapshot back as (repo, state). Numeric columns are memory-mapped
+    and embeddings are restored without loading the model. Returns None for
+    a missing, incomplete or other-version snapshot.
+    """
+    manifest = read_manifest(directory)
+    if manifest is None:
+        return None
+
+    arrays = {name: columns.load_array(directory, name) for name in GRAPH_ARRAYS}
+    graph = CompactGraph(
+        columns.load_strings(directory, "nodes"),
+        columns.load_strings(directory, "names"),
+        columns.load_strings(directory, "kinds"),
+        columns.load_strings(directory, "files"),
+        arrays["file_idx"], arrays["start_line"], arrays["end_line"],
+        arrays["start_byte"], arrays["end_byte"],
+        arrays["complexity"], arrays["loc"],
+        arrays["indptr"], arrays["indices"], arrays["weights"],
+    )
+    graph.cluster = np.array(arrays["cluster"])
+    graph.file_digests = columns.load_strings(directory, "file_digests")
+    # Source text comes from the root's snippet store, which outlives the process
+    graph.snippets = SnippetStore.for_root(manifest["path"])
+    graph.snippets.touch(graph.file_digests)
+
+    embeddings = None
+    if manifest.get("embeddings"):
+        from ..embeddings.processor import EmbeddingProcessor
+        meta = columns.load_json(os.path.join(directory, "embeddings"), "meta")
+        embeddings = EmbeddingProcessor(
+            model_name=meta["model_name"],
+            backend=meta["backend"],
+            model_file=meta["model_file"],
+            quantize=meta["quantize"],
+            index_kind=meta["index_kind"],
+        )
+        embeddings.load(os.path.join(directory, "embeddings"))
+
+    history = None
+    if manifest.get("history"):
+        history = columns.load_json(directory, "history")
+        graph.history = {name: np.array(columns.load_array(directory, f"history_{name}")) for name in HISTORY_ARRAYS}
+        graph.history["head_time"] = history["head_time"]
+
+    clones = None
+    if manifest.get("clones"):
+        clones = {name: np.array(columns.load_array(directory, f"clone_{name}")) for name in CLONE_ARRAYS}
+
+    return manifest["repo"], {
+        "path": manifest["path"],
+        "graph": graph,
+        "clones": clones,
+        "history": history,
+        "clusters": columns.load_json(directory, "clusters"),
+        "cluster_levels": columns.load_json(directory, "cluster_levels"),
+        "embeddings": embeddings,
+        "summary": manifest["summary"],
+        "fingerprint": manifest.get("fingerprint"),
+        "workspace": manifest.get("workspace"),
+        "params": manifest.get("params") or {},
+        "snapshot": directory,
+    }
+
+
+def iter_snapshots(cache_dir: Optional[str] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    (repo, state) for every loadable snapshot, oldest first. Workspace
+    shards are left out: their workspace loads them when a query needs them.
+    """
+    root = snapshot_root(cache_dir)
+    if not os.path.isdir(root):
+        return
+    entries = [os.path.join(root, d) for d in os.listdir(root) if "." not in d]
+    for directory in sorted(entries, key=lambda d: os.path.getmtime(d)):
+        manifest = read_manifest(directory)
+        if manifest is None or manifest.get("workspace"):
+            continue
+        loaded = load_snapshot(directory)
+        if loaded is not None:
+            yield loaded
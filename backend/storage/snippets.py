@@ -0,0 +1,297 @@
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from ..parsing.cache import DEFAULT_CACHE_DIR
+from . import columns
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Entry columns: where a frame sits in the blob, the size of its text and when a scan last referenced it
+OFFSET, LENGTH, SIZE, USED = range(4)
+ENTRY = np.dtype([("digest", "S40"), ("offset", "<i8"), ("length", "<i8"), ("size", "<i8"), ("used", "<i8")])
+
+_OPEN: Dict[str, "SnippetStore"] = {}
+_OPEN_LOCK = threading.Lock()
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive lock across processes: the server and CLI runs may share one cache directory."""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class SnippetStore:
+    """
+    Source text of an analysed tree, kept out of the Python heap: every
+    distinct file content is one zlib frame in a blob, memory-mapped for
+    reading (sources-<n>.bin, its entry table in sources-<n>.npy and the
+    current n in meta.json). Frames are keyed by content digest (see
+    parsing.cache.file_digest), and a graph looks its files up by the
+    digests it was built from (CompactGraph.file_digests), so
+    every graph, snapshot and repository key of the root reads the text
+    its byte offsets were recorded on, whatever was parsed since.
+    Decompressed files are kept in an LRU bounded by max_cache_bytes.
+    Writers hold a lock file, so processes sharing the cache directory can
+    all append. A frame no scan or snapshot has referenced for retention
+    seconds is dropped when such frames outweigh the live ones: the blob is
+    then rewritten under a new name, and readers still holding the old one
+    keep reading it.
+    """
+
+    def __init__(self, directory: str, max_cache_bytes: int = 16 << 20, level: int = 6,
+                 retention: float = 30 * 86400):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.lock_path = os.path.join(directory, "lock")
+        self.max_cache_bytes = max_cache_bytes
+        self.level = level
+        self.retention = retention
+        self.entries: Dict[str, tuple] = {}  # digest -> (offset, length, size, last used)
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.RLock()
+        self._blob_number: Optional[int] = None
+        self._blob = None
+        self._map = None
+        with self._lock, _file_lock(self.lock_path):
+            self._refresh()
+
+    @classmethod
+    def for_root(cls, root_path: str, cache_dir: Optional[str] = None) -> "SnippetStore":
+        """One store per analysed root, shared by every job and graph of that root."""
+        cache_dir = cache_dir or os.environ.get("CODE_ARC_CACHE_DIR", DEFAULT_CACHE_DIR)
+        key = hashlib.sha1(os.path.abspath(root_path).encode("utf-8")).hexdigest()[:16]
+        directory = os.path.join(cache_dir, f"{key}.snippets")
+        with _OPEN_LOCK:
+            store = _OPEN.get(directory)
+            if store is None:
+                store = _OPEN[directory] = cls(directory)
+            return store
+
+    def _path(self, blob: int, ext: str) -> str:
+        return os.path.join(self.directory, f"sources-{blob}.{ext}")
+
+    def _refresh(self):
+        """Reloads the entry table other processes may have extended (file lock held)."""
+        try:
+            blob = columns.load_json(self.directory, "meta")["blob"]
+            table = np.load(self._path(blob, "npy"), allow_pickle=False)
+        except (OSError, ValueError, KeyError):
+            blob, table = 0, np.empty(0, dtype=ENTRY)
+        if blob != self._blob_number:
+            self._close_map()
+            if self._blob is not None:
+                self._blob.close()
+            self._blob_number = blob
+            self._blob = open(self._path(blob, "bin"), "a+b")
+        size = os.fstat(self._blob.fileno()).st_size
+        rows = zip(table["digest"].tolist(), table["offset"].tolist(), table["length"].tolist(),
+                   table["size"].tolist(), table["used"].tolist())
+        # Frames past the end of the blob were lost with an interrupted write
+        self.entries = {d.decode("ascii"): (o, n, z, u) for d, o, n, z, u in rows if o + n <= size}
+
+    def __contains__(self, digest: str) -> bool:
+        return digest in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # Writing
+
+    def update(self, files: Dict[str, str]) -> int:
+        """
+        Stores the content of the files (path -> digest) whose digest is not
+        stored yet; a file whose content no longer has that digest is skipped.
+        Every digest given counts as used now. Returns how many files were stored.
+        """
+        now = int(time.time())
+        count = 0
+        with self._lock, _file_lock(self.lock_path):
+            self._refresh()
+            frames = []
+            for path, digest in files.items():
+                entry = self.entries.get(digest)
+                if entry is not None:
+                    self.entries[digest] = entry[:USED] + (now,)
+                    continue
+                try:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                except OSError:
+                    continue
+                if hashlib.sha1(data).hexdigest() != digest:
+                    continue  # changed again since it was scanned
+                frame = zlib.compress(data, self.level)
+                self.entries[digest] = (0, len(frame), len(data), now)
+                frames.append((digest, frame))
+                count += 1
+            self._append(frames)
+            self._maybe_compact(now)
+            self._save()
+        return count
+
+    def touch(self, digests: Iterable[str]):
+        """Marks stored digests as used now (e.g. by a snapshot that was loaded)."""
+        now = int(time.time())
+        with self._lock, _file_lock(self.lock_path):
+            self._refresh()
+            for digest in digests:
+                entry = self.entries.get(digest)
+                if entry is not None:
+                    self.entries[digest] = entry[:USED] + (now,)
+            self._save()
+
+    def _append(self, frames):
+        if not frames:
+            return
+        offset = self._blob.seek(0, os.SEEK_END)
+        for digest, frame in frames:
+            self.entries[digest] = (offset,) + self.entries[digest][LENGTH:]
+            offset += len(frame)
+        self._blob.write(b"".join(frame for _, frame in frames))
+        # The entry table that points at the frames is written after they are on disk
+        self._blob.flush()
+        os.fsync(self._blob.fileno())
+
+    def _save(self):
+        """Replaces the blob's entry table whole, then points meta.json at the blob."""
+        table = np.empty(len(self.entries), dtype=ENTRY)
+        table["digest"] = [d.encode("ascii") for d in self.entries]
+        for name, column in zip(("offset", "length", "size", "used"), (OFFSET, LENGTH, SIZE, USED)):
+            table[name] = [e[column] for e in self.entries.values()]
+        path = self._path(self._blob_number, "npy")
+        tmp = f"{path}.tmp-{os.getpid()}"
+        with open(tmp, "wb") as f:
+            np.save(f, table, allow_pickle=False)
+        os.replace(tmp, path)
+        meta = os.path.join(self.directory, "meta.json")
+        with open(f"{meta}.tmp-{os.getpid()}", "w") as f:
+            json.dump({"blob": self._blob_number}, f)
+        os.replace(f"{meta}.tmp-{os.getpid()}", meta)
+
+    def _maybe_compact(self, now: int):
+        expired = [d for d, e in self.entries.items() if e[USED] < now - self.retention]
+        dead = sum(self.entries[d][LENGTH] for d in expired)
+        live = sum(e[LENGTH] for e in self.entries.values()) - dead
+        if dead <= max(live, 1 << 20):
+            return
+        for digest in expired:
+            del self.entries[digest]
+            self._drop_cached(digest)
+        number = self._blob_number + 1
+        data = self._view()
+        entries = {}
+        with open(self._path(number, "bin"), "wb") as out:
+            for digest, (offset, length, size, used) in sorted(self.entries.items(), key=lambda kv: kv[1][OFFSET]):
+                entries[digest] = (out.tell(), length, size, used)
+                out.write(data[offset:offset + length])
+            out.flush()
+            os.fsync(out.fileno())
+        old = self._blob_number
+        self._close_map()
+        self._blob.close()
+        self._blob_number = number
+        self._blob = open(self._path(number, "bin"), "a+b")
+        self.entries = entries
+        self._save()
+        for ext in ("bin", "npy"):
+            try:
+                os.remove(self._path(old, ext))
+            except OSError:
+                pass  # still open in another process (Windows): left behind
+
+    # Reading
+
+    def _close_map(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def _view(self):
+        """The blob, mapped; remapped when frames were appended since."""
+        end = os.fstat(self._blob.fileno()).st_size
+        if self._map is None or len(self._map) < end:
+            self._close_map()
+            if end == 0:
+                return b""
+            self._map = mmap.mmap(self._blob.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def _drop_cached(self, digest: str):
+        data = self._cache.pop(digest, None)
+        if data is not None:
+            self._cache_bytes -= len(data)
+
+    def read(self, digest: str) -> Optional[bytes]:
+        """The file content with this digest, or None if it is not in the store."""
+        with self._lock:
+            data = self._cache.get(digest)
+            if data is not None:
+                self._cache.move_to_end(digest)
+                self.hits += 1
+                return data
+            entry = self.entries.get(digest)
+            if entry is None:
+                # Another process may have stored it since
+                with _file_lock(self.lock_path):
+                    self._refresh()
+                entry = self.entries.get(digest)
+                if entry is None:
+                    return None
+            offset, length = entry[OFFSET], entry[LENGTH]
+            data = zlib.decompress(self._view()[offset:offset + length])
+            self.misses += 1
+            if len(data) <= self.max_cache_bytes:
+                self._cache[digest] = data
+                self._cache_bytes += len(data)
+                while self._cache_bytes > self.max_cache_bytes:
+                    self._cache_bytes -= len(self._cache.popitem(last=False)[1])
+            return data
+
+    def snippet(self, digest: str, start_byte: int, end_byte: int) -> Optional[str]:
+        data = self.read(digest)
+        if data is None:
+            return None
+        return data[start_byte:end_byte].decode("utf-8", errors="replace")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "files": len(self.entries),
+                "source_bytes": sum(e[SIZE] for e in self.entries.values()),
+                "stored_bytes": sum(e[LENGTH] for e in self.entries.values()),
+                "blob_bytes": os.fstat(self._blob.fileno()).st_size,
+                "cached_files": len(self._cache),
+                "cached_bytes": self._cache_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
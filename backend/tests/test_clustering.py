@@ -0,0 +1,59 @@
+import pytest
+
+from backend.clustering.backends import BACKENDS
+from backend.clustering.engine import ClusteringEngine
+from backend.clustering.metrics import describe_clusters
+from backend.graph.compact import CompactGraph
+
+BACKEND_NAMES = [name for name in ("louvain", "lpa") if name in BACKENDS]
+
+
+def graph(n, edges=()):
+    nodes = {f"A.java::f{i}": {"name": f"f{i}", "file": "A.java"} for i in range(n)}
+    out = {}
+    for a, b in edges:
+        out.setdefault(f"A.java::f{a}", {})[f"A.java::f{b}"] = 1.0
+    return CompactGraph.from_edges(nodes, out)
+
+
+@pytest.mark.parametrize("backend", BACKEND_NAMES)
+@pytest.mark.parametrize("resolutions", [None, [0.5, 2.0]])
+def test_empty_graph(backend, resolutions):
+    engine = ClusteringEngine(backend=backend)
+    g = graph(0)
+    clusters = engine.cluster_graph(g, resolutions=resolutions)
+    assert clusters == []
+    assert engine.levels == [{"level": 0, "resolution": 1.0, "clusters": [], "parents": {}}]
+    engine.assign_clusters(g, clusters)
+    describe_clusters(g, clusters)
+
+
+@pytest.mark.parametrize("backend", BACKEND_NAMES)
+def test_edgeless_graph(backend):
+    engine = ClusteringEngine(backend=backend)
+    g = graph(4)
+    clusters = engine.cluster_graph(g)
+    assert sorted(node for c in clusters for node in c["nodes"]) == sorted(g.node_ids)
+    assert len(engine.levels) == 1
+    engine.assign_clusters(g, clusters)
+    describe_clusters(g, clusters)
+    assert (g.cluster >= 0).all()
+
+
+@pytest.mark.parametrize("backend", BACKEND_NAMES)
+def test_seeded_clusters_are_stable(backend):
+    # Two triangles joined by one call
+    edges = [(0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3), (2, 3)]
+    first = ClusteringEngine(backend=backend, seed=7).cluster_graph(graph(6, edges))
+    second = ClusteringEngine(backend=backend, seed=7).cluster_graph(graph(6, edges))
+    assert first == second
+    assert sorted(sorted(c["nodes"]) for c in first) == [
+        ["A.java::f0", "A.java::f1", "A.java::f2"], ["A.java::f3", "A.java::f4", "A.java::f5"]]
+
+
+def test_update_clusters_to_empty():
+    engine = ClusteringEngine(backend="lpa")
+    old = graph(3, [(0, 1), (1, 2)])
+    engine.assign_clusters(old, engine.cluster_graph(old))
+    clusters, changed = engine.update_clusters(graph(0), old, touched=old.node_ids, levels=engine.levels)
+    assert clusters == [] and changed == []
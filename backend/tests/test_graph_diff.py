@@ -0,0 +1,91 @@
+from backend.graph.compact import CompactGraph
+from backend.graph.diff import graph_diff
+
+
+def graph(names, edges, clusters=None):
+    """names: node ids in index order; edges: source -> targets; clusters: id -> cluster."""
+    nodes = {name: {"name": name, "file": "A.java"} for name in names}
+    g = CompactGraph.from_edges(nodes, {s: {t: 1.0 for t in targets} for s, targets in edges.items()})
+    for name, cluster in (clusters or {}).items():
+        g.cluster[g.index[name]] = cluster
+    return g
+
+
+def test_identical_graphs():
+    g = graph("abc", {"a": "bc", "b": "a"}, {"a": 0, "b": 0, "c": 1})
+    diff = graph_diff(g, g)
+    assert diff["nodes"]["added"] == diff["nodes"]["removed"] == 0
+    assert diff["links"]["added"] == diff["links"]["removed"] == 0
+    assert diff["clusters"]["migrated"] == 0
+    assert diff["clusters"]["merged"] == diff["clusters"]["appeared"] == diff["clusters"]["vanished"] == []
+    assert diff["cycles"]["new"] == diff["cycles"]["removed"] == 0
+
+
+def test_empty_graphs():
+    empty = graph("", {})
+    diff = graph_diff(empty, empty)
+    assert diff["nodes"] == {"old": 0, "new": 0, "added": 0, "removed": 0, "added_ids": [], "removed_ids": []}
+    assert diff["links"]["added_links"] == diff["links"]["removed_links"] == []
+    assert diff["clusters"]["matches"] == []
+    assert diff["cycles"]["new_cycles"] == diff["cycles"]["removed_cycles"] == []
+
+    full = graph("ab", {"a": "b", "b": "a"})
+    diff = graph_diff(empty, full)
+    assert diff["nodes"]["added_ids"] == ["a", "b"]
+    assert diff["links"]["added"] == 2
+    assert diff["cycles"]["new_cycles"] == [{"size": 2, "kind": "new", "functions": ["a", "b"]}]
+
+
+def test_nodes_and_links():
+    old = graph("abcd", {"a": "b", "b": "c", "d": "a"})
+    new = graph("abce", {"a": "bc", "e": "a"})
+    diff = graph_diff(old, new)
+    assert diff["nodes"]["added_ids"] == ["e"]
+    assert diff["nodes"]["removed_ids"] == ["d"]
+    links = diff["links"]
+    assert (links["added"], links["removed"]) == (2, 2)
+    assert (links["added_between_existing"], links["removed_between_existing"]) == (1, 1)
+    # Rewired calls come first
+    assert [(l["source"], l["target"]) for l in links["added_links"]] == [("a", "c"), ("e", "a")]
+    assert [(l["source"], l["target"]) for l in links["removed_links"]] == [("b", "c"), ("d", "a")]
+
+
+def test_limit_bounds_lists_not_counts():
+    old = graph("abcd", {})
+    new = graph("abcdefg", {"e": "fg", "f": "g"})
+    diff = graph_diff(old, new, limit=1)
+    assert diff["nodes"]["added"] == 3 and diff["nodes"]["added_ids"] == ["e"]
+    assert diff["links"]["added"] == 3 and len(diff["links"]["added_links"]) == 1
+
+
+def test_cycle_changes():
+    old = graph("abcdefghij", {"a": "b", "b": "a", "c": "d", "d": "c", "f": "g", "g": "h", "h": "f"})
+    new = graph("abcdefghij", {"a": "be", "b": "a", "e": "a", "c": "d", "f": "g", "g": "f", "i": "j", "j": "i"})
+    cycles = graph_diff(old, new)["cycles"]
+    assert (cycles["old_count"], cycles["new_count"]) == (3, 3)
+    # {a, b} grew by e, {i, j} is new; {f, g} was already one cycle
+    assert cycles["new_cycles"] == [
+        {"size": 3, "kind": "grown", "functions": ["a", "b", "e"]},
+        {"size": 2, "kind": "new", "functions": ["i", "j"]},
+    ]
+    # {f, g, h} lost h, {c, d} is gone; {a, b} is still one cycle
+    assert cycles["removed_cycles"] == [
+        {"size": 3, "kind": "split", "functions": ["f", "g", "h"]},
+        {"size": 2, "kind": "removed", "functions": ["c", "d"]},
+    ]
+
+
+def test_cluster_migrations():
+    old = graph("abcdefg", {}, {"a": 0, "b": 0, "c": 1, "d": 1, "e": 2, "f": 2, "g": 3})
+    new = graph("abcdef", {}, {"a": 0, "b": 0, "c": 0, "d": 0, "e": 1, "f": 2})
+    clusters = graph_diff(old, new, [{"id": "0", "name": "core"}], [{"id": 0, "name": "core+io"}])["clusters"]
+    assert clusters["matches"][0] == {"old": "0", "new": "0", "old_name": "core", "new_name": "core+io",
+                                      "shared": 2, "jaccard": 0.5}
+    assert [(m["old"], m["new"]) for m in clusters["matches"]] == [("0", "0"), ("1", "0"), ("2", "1")]
+    # Old clusters 0 and 1 both went to 0; of 2, f did not follow e
+    assert clusters["merged"] == ["0"]
+    assert clusters["migrated"] == 1
+    assert clusters["moved"] == [{"id": "f", "old": "2", "new": "2"}]
+    assert clusters["flows"] == [{"old": "2", "new": "2", "functions": 1}]
+    assert clusters["appeared"] == ["2"]
+    assert clusters["vanished"] == ["3"]
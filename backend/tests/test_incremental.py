@@ -0,0 +1,105 @@
+import os
+
+import pytest
+
+from backend.graph.builder import GraphBuilder
+from backend.jobs import Job, run_analysis
+from backend.parsing import ParseCache
+
+PARAMS = {"workers": 1, "snapshot": False, "cluster_backend": "lpa"}
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    monkeypatch.setenv("CODE_ARC_CACHE_DIR", str(tmp_path / "cache"))
+    root = tmp_path / "repo"
+    root.mkdir()
+    return root
+
+
+def write(path, text, stamp):
+    # Same-size edits must not look unchanged to the size/mtime check
+    path.write_text(text)
+    os.utime(path, (stamp, stamp))
+
+
+def analyse(repo_key, root, state=None, **params):
+    return run_analysis(Job(repo_key, {**PARAMS, **params, "path": str(root)}), state or {})
+
+
+def test_cache_partition_and_digests(repo):
+    a, b = repo / "A.java", repo / "B.java"
+    write(a, "class A { void f(){} }", 1000)
+    write(b, "class B { void g(){} }", 1000)
+    files = [str(a), str(b)]
+
+    cache = ParseCache.for_root(str(repo))
+    cached, stale = cache.partition(files)
+    assert cached == {} and stale == files
+    cache.update([{"file_path": f, "functions": []} for f in stale])
+    cache.close()
+
+    write(b, "class B { void h(){} }", 2000)
+    cache = ParseCache.for_root(str(repo))
+    cached, stale = cache.partition(files)
+    assert list(cached) == [str(a)] and stale == [str(b)]
+    assert set(cache.digests) == set(files)
+    cache.close()
+
+
+def test_builder_changed_files():
+    builder = GraphBuilder(root="/r")
+    builder.build_graph([{"file_path": "/r/A.java", "functions": []}, {"file_path": "/r/B.java", "functions": []}],
+                        digests={"/r/A.java": "1", "/r/B.java": "2"})
+    changed, removed = builder.changed_files({"/r/A.java": "1", "/r/B.java": "3", "/r/C.java": "4"})
+    assert changed == ["/r/B.java", "/r/C.java"] and removed == []
+    changed, removed = builder.changed_files({"/r/A.java": "1"})
+    assert changed == [] and removed == ["/r/B.java"]
+
+
+def test_incremental_reanalysis(repo):
+    a = repo / "A.java"
+    write(a, "class A { void f(){ g(); } void g(){} }", 1000)
+    write(repo / "B.java", "class B { void k(){} }", 1000)
+    state = analyse("a", repo)
+    assert state["summary"]["changed_files"] == 2
+
+    write(a, "class A { void f(){ h(); } void h(){} }", 2000)
+    (repo / "B.java").unlink()
+    state = analyse("a", repo, state)
+    assert sorted(state["graph"].node_ids) == ["A.java::f", "A.java::h"]
+    assert state["summary"]["changed_files"] == 1 and state["summary"]["deleted_files"] == 1
+
+
+def test_shared_cache_does_not_hide_changes(repo):
+    # Another repository key on the same path refreshes the cache in between
+    a = repo / "A.java"
+    write(a, "class A { void f(){ g(); } void g(){} void h(){} }", 1000)
+    state = analyse("a", repo)
+
+    write(a, "class A { void f(){ h(); } void h(){} }", 2000)
+    analyse("b", repo)
+    state = analyse("a", repo, state)
+    assert sorted(state["graph"].node_ids) == ["A.java::f", "A.java::h"]
+    assert state["summary"]["changed_files"] == 1
+
+    write(a, "class A { void f(){ k(); } void k(){} }", 3000)
+    analyse("b", repo)
+    state = analyse("a", repo, state, update={"changed": [str(a)]})
+    assert sorted(state["graph"].node_ids) == ["A.java::f", "A.java::k"]
+    assert state["delta"]["files"]["changed"] == [str(a)]
+
+
+def test_cache_committed_after_graph(repo, monkeypatch):
+    a = repo / "A.java"
+    write(a, "class A { void f(){} }", 1000)
+
+    def fail(self, *args, **kwargs):
+        raise RuntimeError("graph stage failed")
+
+    monkeypatch.setattr(GraphBuilder, "build_graph", fail)
+    with pytest.raises(RuntimeError):
+        analyse("a", repo)
+    cache = ParseCache.for_root(str(repo))
+    assert cache.partition([str(a)])[1] == [str(a)]
+    cache.close()
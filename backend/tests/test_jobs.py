@@ -0,0 +1,41 @@
+import threading
+
+from backend.jobs import JobManager
+
+
+def test_queued_jobs_of_one_repo_do_not_hold_workers():
+    release = threading.Event()
+    order = []
+
+    def runner(job, state):
+        if job.repo == "a":
+            release.wait(10)
+        order.append((job.repo, job.params["n"]))
+        return {"summary": {"n": job.params["n"], "previous": state.get("summary", {}).get("n")}}
+
+    jobs = JobManager(runner, max_workers=2)
+    burst = [jobs.submit("a", {"n": n}) for n in range(4)]
+    other = jobs.submit("b", {"n": 0})
+    assert other.done.wait(5), "a job of another repository waited behind a's queue"
+    assert all(job.status == "QUEUED" for job in burst[1:])
+
+    release.set()
+    for job in burst:
+        assert job.done.wait(5)
+    assert [n for repo, n in order if repo == "a"] == [0, 1, 2, 3]
+    # Serialised: every job saw the state its predecessor left
+    assert [job.result["previous"] for job in burst] == [None, 0, 1, 2]
+    jobs.shutdown()
+
+
+def test_cancelled_queued_job_is_skipped():
+    release = threading.Event()
+    jobs = JobManager(lambda job, state: release.wait(10) and {"summary": {}}, max_workers=1)
+    first = jobs.submit("a", {})
+    second = jobs.submit("a", {})
+    third = jobs.submit("a", {})
+    jobs.cancel(second.id)
+    release.set()
+    assert third.done.wait(5)
+    assert (first.status, second.status, third.status) == ("COMPLETED", "CANCELLED", "COMPLETED")
+    jobs.shutdown()
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from backend.graph.compact import CompactGraph
+from backend.impact.reachability import ReachabilityIndex
+
+
+def random_graph(seed, n=60, m=120):
+    """Mostly forward edges plus a few back edges, so there are cycles as well as long chains."""
+    rng = np.random.default_rng(seed)
+    nodes = {f"f{i}": {"name": f"f{i}", "file": f"F{i % 7}.java"} for i in range(n)}
+    edges = {}
+    for _ in range(m):
+        a, b = rng.integers(0, n, 2).tolist()
+        if a == b:
+            continue
+        if a > b and rng.random() > 0.15:
+            a, b = b, a
+        edges.setdefault(f"f{a}", {})[f"f{b}"] = float(rng.choice([1.0, 0.5, 0.25]))
+    return CompactGraph.from_edges(nodes, edges)
+
+
+def oracle(graph, seeds, direction, depth=None, min_weight=0.0):
+    """Plain BFS over the adjacency lists."""
+    n = graph.number_of_nodes()
+    adjacency = [[] for _ in range(n)]
+    for s, t, w in zip(graph.edge_sources().tolist(), graph.indices.tolist(), graph.weights.tolist()):
+        if w < min_weight:
+            continue
+        if direction == "downstream":
+            adjacency[s].append(t)
+        else:
+            adjacency[t].append(s)
+    seen = set(seeds)
+    frontier = list(seen)
+    level = 0
+    while frontier and (depth is None or level < depth):
+        frontier = [t for s in frontier for t in adjacency[s] if t not in seen]
+        seen.update(frontier)
+        frontier = list(set(frontier))
+        level += 1
+    return sorted(seen - set(seeds))
+
+
+MODES = {
+    "bitsets": {},
+    "hubs": {"max_bitset_components": 0},
+    "few_hubs": {"max_bitset_components": 0, "max_hub_bytes": 64},
+    "no_hubs": {"max_bitset_components": 0, "max_hub_bytes": 0},
+}
+
+
+@pytest.mark.parametrize("mode", list(MODES))
+@pytest.mark.parametrize("seed", range(5))
+def test_affected_matches_bfs(mode, seed):
+    graph = random_graph(seed)
+    index = ReachabilityIndex(graph, **MODES[mode])
+    rng = np.random.default_rng(100 + seed)
+    for _ in range(10):
+        seeds = sorted(set(rng.integers(0, graph.number_of_nodes(), rng.integers(1, 4)).tolist()))
+        for direction in ("downstream", "upstream"):
+            assert index.affected(seeds, direction).tolist() == oracle(graph, seeds, direction)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_limited_queries_match_bfs(seed):
+    graph = random_graph(seed)
+    index = ReachabilityIndex(graph)
+    for start in range(0, graph.number_of_nodes(), 7):
+        for direction in ("downstream", "upstream"):
+            for depth in (1, 2, 3):
+                assert index.affected([start], direction, depth=depth).tolist() == \
+                    oracle(graph, [start], direction, depth=depth)
+            assert index.affected([start], direction, min_weight=0.5).tolist() == \
+                oracle(graph, [start], direction, min_weight=0.5)
+
+
+def test_cycle_members_are_affected_but_seeds_are_not():
+    nodes = {name: {"name": name, "file": "A.java"} for name in "abcd"}
+    graph = CompactGraph.from_edges(nodes, {"a": {"b": 1.0}, "b": {"c": 1.0}, "c": {"a": 1.0, "d": 1.0}})
+    for kwargs in MODES.values():
+        index = ReachabilityIndex(graph, **kwargs)
+        assert index.affected([0]).tolist() == [1, 2, 3]
+        assert index.affected([3], "upstream").tolist() == [0, 1, 2]
+        assert index.affected([]).tolist() == []
+
+
+def test_empty_graph():
+    index = ReachabilityIndex(CompactGraph.from_edges({}, {}))
+    assert index.affected([]).size == 0
@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+import pytest
+
+from backend.jobs import Job, run_analysis
+from backend.storage import load_snapshot, read_manifest, save_snapshot
+from backend.storage.snapshot import GRAPH_ARRAYS
+
+
+@pytest.fixture
+def state(tmp_path, monkeypatch):
+    monkeypatch.setenv("CODE_ARC_CACHE_DIR", str(tmp_path / "cache"))
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "A.java").write_text("class A { void f(){ g(); B.h(); } void g(){} }")
+    params = {"path": str(repo), "workers": 1, "cluster_backend": "lpa"}
+    return run_analysis(Job("repo", params), {})
+
+
+def test_round_trip(state):
+    repo, loaded = load_snapshot(state["snapshot"])
+    assert repo == "repo"
+    graph, restored = state["graph"], loaded["graph"]
+    assert restored.node_ids == graph.node_ids
+    assert restored.files == graph.files and restored.file_digests == graph.file_digests
+    for name in GRAPH_ARRAYS:
+        np.testing.assert_array_equal(getattr(restored, name), getattr(graph, name))
+    assert loaded["clusters"] == state["clusters"]
+    assert loaded["cluster_levels"] == state["cluster_levels"]
+    assert loaded["summary"] == state["summary"] and loaded["fingerprint"] == state["fingerprint"]
+    assert restored.source("A.java::f") == "void f(){ g(); B.h(); }"
+
+
+def test_incomplete_snapshot_is_ignored(state):
+    os.remove(os.path.join(state["snapshot"], "manifest.json"))
+    assert read_manifest(state["snapshot"]) is None
+    assert load_snapshot(state["snapshot"]) is None
+
+
+@pytest.mark.skipif(os.name == "nt", reason="file names are UTF-16 on Windows")
+def test_undecodable_file_names(tmp_path, monkeypatch):
+    monkeypatch.setenv("CODE_ARC_CACHE_DIR", str(tmp_path / "cache"))
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    name = os.fsdecode(b"B\xff.java")
+    with open(os.path.join(str(repo), name), "w") as f:
+        f.write("class B { static void h(){} }")
+    state = run_analysis(Job("repo", {"path": str(repo), "workers": 1, "cluster_backend": "lpa"}), {})
+    assert state.get("snapshot")
+
+    _, loaded = load_snapshot(state["snapshot"])
+    assert loaded["graph"].node_ids == [f"{name}::h"]
+    assert loaded["graph"].files == state["graph"].files
+    save_snapshot("copy", loaded)
@@ -0,0 +1,99 @@
+import hashlib
+import multiprocessing
+import os
+
+import pytest
+
+from backend.jobs import Job, run_analysis
+from backend.storage import snippets as snippets_module
+from backend.storage.snippets import SnippetStore
+
+
+def digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def store_files(directory, paths):
+    SnippetStore(directory).update({p: digest(open(p, "rb").read()) for p in paths})
+
+
+def test_frames_are_keyed_by_content(tmp_path):
+    path = tmp_path / "A.java"
+    path.write_bytes(b"class A { void f(){} }")
+    store = SnippetStore(str(tmp_path / "store"))
+    assert store.update({str(path): digest(b"class A { void f(){} }")}) == 1
+    path.write_bytes(b"class A { void g(){} }")
+    assert store.update({str(path): digest(b"class A { void g(){} }")}) == 1
+    # Unchanged content is not stored twice; a stale digest is not stored at all
+    assert store.update({str(path): digest(b"class A { void g(){} }")}) == 0
+    assert store.update({str(path): digest(b"something else")}) == 0
+
+    reopened = SnippetStore(str(tmp_path / "store"))
+    assert reopened.read(digest(b"class A { void f(){} }")) == b"class A { void f(){} }"
+    assert reopened.snippet(digest(b"class A { void g(){} }"), 15, 18) == "g()"
+    assert reopened.read(digest(b"something else")) is None
+
+
+def test_older_graph_keeps_its_text(tmp_path, monkeypatch):
+    monkeypatch.setenv("CODE_ARC_CACHE_DIR", str(tmp_path / "cache"))
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    path = repo / "A.java"
+    path.write_text("class A { void f(){ g(); } void g(){} }")
+    params = {"path": str(repo), "workers": 1, "snapshot": False, "cluster_backend": "lpa"}
+    old = run_analysis(Job("a", params), {})["graph"]
+
+    path.write_text("class A { void f(){ h(); } void h(){} void g(){} }")
+    os.utime(path, (5000, 5000))
+    new = run_analysis(Job("b", params), {})["graph"]
+    assert old.source("A.java::f") == "void f(){ g(); }"
+    assert new.source("A.java::f") == "void f(){ h(); }"
+
+    # Without a store the file is only used while it still has the parsed content
+    old.snippets = None
+    assert old.source("A.java::f") is None
+    new.snippets = None
+    assert new.source("A.java::f") == "void f(){ h(); }"
+
+
+def test_processes_share_a_store(tmp_path):
+    files = []
+    for i in range(40):
+        path = tmp_path / f"F{i}.java"
+        path.write_text(f"class F{i} {{ void f{i}(){{}} }}" * (i + 1))
+        files.append(str(path))
+    directory = str(tmp_path / "store")
+    SnippetStore(directory)
+    processes = [multiprocessing.get_context("spawn").Process(target=store_files, args=(directory, files[k::4]))
+                 for k in range(4)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+        assert p.exitcode == 0
+
+    store = SnippetStore(directory)
+    assert len(store) == len(files)
+    for path in files:
+        data = open(path, "rb").read()
+        assert store.read(digest(data)) == data
+
+
+def test_unused_frames_are_compacted_away(tmp_path, monkeypatch):
+    old, new = tmp_path / "old.bin", tmp_path / "new.bin"
+    old.write_bytes(os.urandom(3 << 20))
+    new.write_bytes(b"kept")
+    store = SnippetStore(str(tmp_path / "store"), retention=60)
+    store.update({str(old): digest(old.read_bytes()), str(new): digest(b"kept")})
+    reader = SnippetStore(str(tmp_path / "store"))
+
+    now = snippets_module.time.time()
+    monkeypatch.setattr(snippets_module.time, "time", lambda: now + 3600)
+    store.update({str(new): digest(b"kept")})
+    assert digest(old.read_bytes()) not in store
+    assert os.path.getsize(tmp_path / "store" / "sources-1.bin") < 1 << 10
+    assert not os.path.exists(tmp_path / "store" / "sources-0.bin")
+
+    # A store opened before the compaction still reads the blob it mapped
+    assert reader.read(digest(old.read_bytes())) == old.read_bytes()
+    assert SnippetStore(str(tmp_path / "store")).read(digest(b"kept")) == b"kept"
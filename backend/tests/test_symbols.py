@@ -0,0 +1,32 @@
+import pytest
+
+from backend.graph.symbols import SymbolIndex
+
+
+def index(order, max_fanout=3):
+    symbols = SymbolIndex(max_fanout=max_fanout)
+    for package in order:
+        symbols.add(f"{package}/Impl.java::run", package, "Impl", "run", 0)
+    return symbols
+
+
+PACKAGES = ["com.a.x", "org.b", "com.a.y", "com.c", "net.d", "com.a.x.deep"]
+
+
+@pytest.mark.parametrize("order", [PACKAGES, PACKAGES[::-1]])
+def test_ambiguous_calls_are_capped_in_rank_order(order):
+    targets = index(order).resolve("run", None, 0, {"package": "com.a.x.caller", "class": "Caller"})
+    assert [t for t, _ in targets] == ["com.a.x.deep/Impl.java::run", "com.a.x/Impl.java::run",
+                                       "com.a.y/Impl.java::run"]
+    assert sum(w for _, w in targets) == pytest.approx(1.0)
+
+
+def test_unambiguous_call_has_full_weight():
+    symbols = index(["com.a"])
+    assert symbols.resolve("run", None, 0, {"package": "org.z", "class": "Caller"}) == [("com.a/Impl.java::run", 1.0)]
+
+
+def test_arity_filters_before_the_cap():
+    symbols = index(["p1", "p2", "p3", "p4"], max_fanout=2)
+    symbols.add("p5/Impl.java::run", "p5", "Impl", "run", 2)
+    assert symbols.resolve("run", None, 2, {"package": "q", "class": "Caller"}) == [("p5/Impl.java::run", 1.0)]
@@ -0,0 +1,78 @@
+import hashlib
+import json
+
+import numpy as np
+import pytest
+
+from backend.embeddings import store as store_module
+from backend.embeddings.store import VectorStore
+
+
+def key(text):
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+def rows(n, dim=4, start=0):
+    return np.arange(start * dim, (start + n) * dim, dtype=np.float32).reshape(n, dim)
+
+
+def test_append_and_reopen(tmp_path):
+    store = VectorStore(str(tmp_path))
+    store.append([key("a"), key("b")], rows(2))
+    store.append([key("b"), key("c"), key("c")], rows(3, start=2))
+    assert len(store) == 3
+
+    reopened = VectorStore(str(tmp_path))
+    assert reopened.keys == [key("a"), key("b"), key("c")]
+    np.testing.assert_array_equal(reopened.get([key("c"), key("a")]), np.stack([rows(1, start=3)[0], rows(1)[0]]))
+    assert reopened.missing([key("a"), key("d")]) == [key("d")]
+
+
+def test_interrupted_append_is_ignored_and_overwritten(tmp_path):
+    store = VectorStore(str(tmp_path))
+    store.append([key("a")], rows(1))
+    # A crash after the data files were written but before meta.json
+    with open(tmp_path / "vectors.f32", "ab") as f:
+        f.write(rows(2, start=5).tobytes())
+    with open(tmp_path / "keys.bin", "ab") as f:
+        f.write(key("x") + key("y"))
+
+    reopened = VectorStore(str(tmp_path))
+    assert reopened.keys == [key("a")]
+    reopened.append([key("b")], rows(1, start=1))
+    again = VectorStore(str(tmp_path))
+    assert again.keys == [key("a"), key("b")]
+    np.testing.assert_array_equal(again.vectors, rows(2))
+
+
+def test_crash_while_writing_meta_keeps_old_count(tmp_path, monkeypatch):
+    store = VectorStore(str(tmp_path))
+    store.append([key("a")], rows(1))
+
+    def crash(obj, f):
+        f.write('{"dim": ')
+        raise OSError("disk full")
+
+    monkeypatch.setattr(store_module.json, "dump", crash)
+    with pytest.raises(OSError):
+        store.append([key("b")], rows(1, start=1))
+    monkeypatch.undo()
+
+    assert json.loads((tmp_path / "meta.json").read_text()) == {"dim": 4, "count": 1}
+    assert VectorStore(str(tmp_path)).keys == [key("a")]
+
+
+def test_dimension_mismatch(tmp_path):
+    store = VectorStore(str(tmp_path))
+    store.append([key("a")], rows(1))
+    with pytest.raises(ValueError):
+        store.append([key("b")], rows(1, dim=3))
+
+
+def test_for_path_shares_one_store(tmp_path):
+    first = VectorStore.for_path(str(tmp_path / "model"))
+    second = VectorStore.for_path(str(tmp_path / "model" / "."))
+    assert first is second
+    first.append([key("a")], rows(1))
+    second.append([key("a"), key("b")], rows(2))
+    assert len(VectorStore(str(tmp_path / "model"))) == 2
@@ -0,0 +1,356 @@
+import hashlib
+import os
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+
+from ..graph import export
+from ..graph.symbols import SymbolIndex
+from ..jobs.manager import Job
+from ..jobs.pipeline import run_analysis
+from ..parsing.cache import DEFAULT_CACHE_DIR
+from ..storage import columns
+from ..storage.snapshot import snapshot_dir, read_manifest, load_interface, load_snapshot
+
+WORKSPACE_VERSION = 1
+
+# Workspace node ids are "<shard>:<node id within the shard>"
+SHARD_SEPARATOR = ":"
+
+# A directory containing one of these is a repository or build module
+MODULE_MARKERS = (".git", "pom.xml", "build.gradle", "build.gradle.kts", "CMakeLists.txt",
+                  "pyproject.toml", "setup.py")
+
+WORKSPACE_STAGES = ("shards", "join")
+
+
+def qualify(shard: str, node_id: str) -> str:
+    return f"{shard}{SHARD_SEPARATOR}{node_id}"
+
+
+def split_qualified(qualified_id: str):
+    """'svc/users:src/Foo.java::run' -> ('svc/users', 'src/Foo.java::run')"""
+    shard, sep, node_id = qualified_id.partition(SHARD_SEPARATOR)
+    return (shard, node_id) if sep else (None, qualified_id)
+
+
+def workspace_root(cache_dir: Optional[str] = None) -> str:
+    cache_dir = cache_dir or os.environ.get("CODE_ARC_CACHE_DIR", DEFAULT_CACHE_DIR)
+    return os.path.join(cache_dir, "workspaces")
+
+
+def discover_shards(root: str, max_depth: int = 3) -> Dict[str, str]:
+    """
+    Repositories and build modules below root, one shard each, named by
+    their "/"-separated path relative to root. A directory with a
+    MODULE_MARKERS entry is a shard and is not descended into.
+    """
+    shards = {}
+    pending = [(root, 0)]
+    while pending:
+        path, depth = pending.pop()
+        try:
+            entries = sorted(os.scandir(path), key=lambda e: e.name)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith(".") or not entry.is_dir():
+                continue
+            if any(os.path.exists(os.path.join(entry.path, m)) for m in MODULE_MARKERS):
+                name = os.path.relpath(entry.path, root).replace(os.sep, "/")
+                shards[name] = os.path.abspath(entry.path)
+            elif depth + 1 < max_depth:
+                pending.append((entry.path, depth + 1))
+    return dict(sorted(shards.items()))
+
+
+class Workspace:
+    """
+    Several repositories (or modules) analysed together. Each shard is an
+    ordinary analysis with its own parse cache and snapshot; the workspace
+    only adds the call edges between shards, found by joining the shards'
+    interfaces (definitions and unresolved call sites, see
+    GraphBuilder.interface). Shard graphs are loaded from their snapshots
+    when a query reaches them, at most max_loaded at a time.
+    """
+
+    def __init__(self, name: str, shards: Dict[str, str], params: Optional[Dict[str, Any]] = None,
+                 cache_dir: Optional[str] = None, max_loaded: int = 8):
+        bad = [shard for shard in shards if not shard or SHARD_SEPARATOR in shard]
+        if bad:
+            raise ValueError(f"Invalid shard names: {', '.join(map(repr, bad))}")
+        self.name = name
+        self.shards = dict(sorted(shards.items()))  # shard -> path
+        self.params = dict(params or {})            # analysis parameters for every shard
+        self.cache_dir = cache_dir
+        self.max_loaded = max_loaded
+        key = hashlib.sha1(name.encode("utf-8")).hexdigest()[:16]
+        self.directory = os.path.join(workspace_root(cache_dir), key)
+        self.summaries: Dict[str, Dict[str, Any]] = {}
+        self.built_at = None
+        self._set_cross_edges([], [], np.zeros(0))
+        self._loaded: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Building
+
+    def shard_key(self, shard: str) -> str:
+        """Repository key the shard's snapshot is stored under."""
+        return f"workspace:{self.name}/{shard}"
+
+    def build(self, job: Job) -> Dict[str, Any]:
+        """
+        Job runner: analyses every shard, then joins them. A shard whose files
+        and parameters are unchanged since its snapshot is only scanned.
+        """
+        job.start_stage("shards", total=len(self.shards))
+        for k, (shard, path) in enumerate(self.shards.items()):
+            job.check_cancelled()
+            directory = snapshot_dir(self.shard_key(shard), self.cache_dir)
+            manifest = read_manifest(directory)
+            previous = {}
+            if manifest is not None:
+                previous = {"path": manifest["path"], "fingerprint": manifest.get("fingerprint"),
+                            "summary": manifest["summary"], "snapshot": directory}
+            params = {**self.params, "path": path, "workspace": self.name,
+                      "skip_unchanged": True, "snapshot": True}
+            state = run_analysis(job.child(self.shard_key(shard), params), previous)
+            self.summaries[shard] = state["summary"]
+            if state.get("graph") is not None:
+                self.evict(shard)  # a loaded copy is out of date
+            job.update_stage("shards", k + 1)
+        job.finish_stage("shards")
+
+        job.start_stage("join")
+        self.join()
+        job.finish_stage("join")
+        self.built_at = time.time()
+        self.save()
+        return self.summary()
+
+    def join(self):
+        """
+        Cross-shard call edges: the call sites each shard left unresolved,
+        resolved against the definitions of the other shards. Only the
+        interfaces are read, never the shard graphs, and only definitions
+        some unresolved call could reach are indexed.
+        """
+        sites = {}
+        wanted = set()
+        for shard in self.shards:
+            interface = load_interface(snapshot_dir(self.shard_key(shard), self.cache_dir)) or {}
+            sites[shard] = (interface.get("units", {}), interface.get("unresolved", []))
+            wanted.update(site[2] for site in sites[shard][1])
+
+        symbols = SymbolIndex(max_fanout=self.params.get("max_fanout", 5))
+        for shard in self.shards:
+            interface = load_interface(snapshot_dir(self.shard_key(shard), self.cache_dir)) or {}
+            for node_id, package, class_name, name, arity, language in interface.get("definitions", []):
+                if name in wanted:
+                    symbols.add(qualify(shard, node_id), package, class_name, name, arity, language)
+
+        weights = {}
+        for shard, (units, unresolved) in sites.items():
+            for node_id, file_path, name, receiver_type, argc in unresolved:
+                unit = units.get(file_path, {})
+                scope = {"language": unit.get("language", "java"), "package": unit.get("package", ""),
+                         "imports": unit.get("imports", []), "class": ""}
+                source = qualify(shard, node_id)
+                for target, weight in symbols.resolve_external(name, receiver_type, argc, scope):
+                    if split_qualified(target)[0] != shard:
+                        weights[(source, target)] = weights.get((source, target), 0.0) + weight
+
+        edges = sorted(weights)
+        self._set_cross_edges([s for s, _ in edges], [t for _, t in edges],
+                              np.array([weights[e] for e in edges], dtype=np.float32))
+
+    def _set_cross_edges(self, sources: List[str], targets: List[str], weights: np.ndarray):
+        self.cross_sources = sources
+        self.cross_targets = targets
+        self.cross_weights = weights
+        self._out: Dict[str, List[int]] = {}  # qualified id -> cross edge positions
+        self._in: Dict[str, List[int]] = {}
+        for k, (s, t) in enumerate(zip(sources, targets)):
+            self._out.setdefault(s, []).append(k)
+            self._in.setdefault(t, []).append(k)
+
+    # Persistence
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        columns.save_strings(self.directory, "cross_sources", self.cross_sources)
+        columns.save_strings(self.directory, "cross_targets", self.cross_targets)
+        columns.save_array(self.directory, "cross_weights", self.cross_weights)
+        # Written last, as for snapshots
+        columns.save_json(self.directory, "manifest", {
+            "version": WORKSPACE_VERSION,
+            "name": self.name,
+            "shards": self.shards,
+            "params": self.params,
+            "max_loaded": self.max_loaded,
+            "summaries": self.summaries,
+            "built_at": self.built_at,
+        })
+
+    @classmethod
+    def load(cls, directory: str, cache_dir: Optional[str] = None) -> Optional["Workspace"]:
+        """The workspace saved in directory (no shard is loaded), or None."""
+        try:
+            manifest = columns.load_json(directory, "manifest")
+        except (OSError, ValueError):
+            return None
+        if manifest.get("version") != WORKSPACE_VERSION:
+            return None
+        workspace = cls(manifest["name"], manifest["shards"], manifest.get("params"),
+                        cache_dir=cache_dir, max_loaded=manifest.get("max_loaded", 8))
+        workspace.summaries = manifest.get("summaries", {})
+        workspace.built_at = manifest.get("built_at")
+        try:
+            workspace._set_cross_edges(columns.load_strings(directory, "cross_sources"),
+                                       columns.load_strings(directory, "cross_targets"),
+                                       columns.load_array(directory, "cross_weights", mmap=False))
+        except OSError:
+            pass  # saved before its first join
+        return workspace
+
+    # Queries
+
+    def shard_state(self, shard: str) -> Optional[Dict[str, Any]]:
+        """The shard's analysis state, loaded from its snapshot on first use."""
+        with self._lock:
+            state = self._loaded.get(shard)
+            if state is not None:
+                self._loaded.move_to_end(shard)
+                return state
+        if shard not in self.shards:
+            return None
+        loaded = load_snapshot(snapshot_dir(self.shard_key(shard), self.cache_dir))
+        if loaded is None:
+            return None
+        state = loaded[1]
+        with self._lock:
+            self._loaded[shard] = state
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+        return state
+
+    def evict(self, shard: str):
+        with self._lock:
+            self._loaded.pop(shard, None)
+
+    def loaded_shards(self) -> List[str]:
+        with self._lock:
+            return list(self._loaded)
+
+    def cross_links(self, positions: Iterable[int]) -> List[Dict[str, Any]]:
+        return [
+            {"source": self.cross_sources[k], "target": self.cross_targets[k],
+             "weight": float(self.cross_weights[k]), "cross_shard": True}
+            for k in positions
+        ]
+
+    def shard_page(self, shard: str, offset: int, limit: Optional[int], fields) -> Optional[Dict[str, Any]]:
+        """
+        export.graph_page of one shard with workspace ids, plus the cross-shard
+        links leaving the nodes on the page. Only this shard is loaded.
+        """
+        state = self.shard_state(shard)
+        if state is None:
+            return None
+        graph = state["graph"]
+        page = export.graph_page(graph, offset, graph.number_of_nodes() if limit is None else limit, fields)
+        for node in page["nodes"]:
+            if "id" in node:
+                node["id"] = qualify(shard, node["id"])
+            node["shard"] = shard
+        for link in page["links"]:
+            link["source"] = qualify(shard, link["source"])
+            link["target"] = qualify(shard, link["target"])
+        on_page = (qualify(shard, graph.node_ids[i]) for i in range(page["offset"], page["offset"] + len(page["nodes"])))
+        page["links"] += self.cross_links(k for qid in on_page for k in self._out.get(qid, ()))
+        return page
+
+    def transitive_impact(self, engine, targets: Iterable[str], direction: str = "both",
+                          min_weight: float = 0.0) -> Dict[str, Any]:
+        """
+        ImpactEngine.transitive_impact across shards, with workspace ids.
+        Each shard is searched with its own reachability index; nodes reached
+        through a cross-shard edge seed the next shard, until nothing new is
+        reached. Only shards the impact actually reaches are loaded.
+        """
+        result = {"targets": [], "unknown": []}
+        seeds: Dict[str, List[str]] = {}
+        for qualified_id in dict.fromkeys(targets):
+            shard, node_id = split_qualified(qualified_id)
+            state = self.shard_state(shard) if shard in self.shards else None
+            if state is None or node_id not in state["graph"]:
+                result["unknown"].append(qualified_id)
+                continue
+            result["targets"].append(qualified_id)
+            seeds.setdefault(shard, []).append(node_id)
+
+        touched = set(seeds)
+        for side in ("upstream", "downstream"):
+            if direction not in (side, "both"):
+                continue
+            cross = self._in if side == "upstream" else self._out
+            far_end = self.cross_sources if side == "upstream" else self.cross_targets
+            reached = {shard: set(ids) for shard, ids in seeds.items()}
+            frontier = {shard: list(ids) for shard, ids in seeds.items()}
+            affected = []
+            while frontier:
+                shard, local_seeds = frontier.popitem()
+                state = self.shard_state(shard)
+                if state is None:
+                    continue  # shard without a snapshot (never built)
+                touched.add(shard)
+                graph = state["graph"]
+                found = engine.transitive_impact(graph, local_seeds, side, None, min_weight)[side]
+                new = [n for n in found if n not in reached[shard]]
+                reached[shard].update(new)
+                affected.extend(qualify(shard, n) for n in new)
+                for node_id in local_seeds + new:
+                    for k in cross.get(qualify(shard, node_id), ()):
+                        if self.cross_weights[k] < min_weight:
+                            continue
+                        other, other_id = split_qualified(far_end[k])
+                        if other_id in reached.setdefault(other, set()):
+                            continue
+                        reached[other].add(other_id)
+                        affected.append(far_end[k])
+                        frontier.setdefault(other, []).append(other_id)
+            result[side] = affected
+        result["shards"] = sorted(touched)
+        return result
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "shard_count": len(self.shards),
+            "node_count": sum(s.get("node_count", 0) for s in self.summaries.values()),
+            "edge_count": sum(s.get("edge_count", 0) for s in self.summaries.values()),
+            "cross_edge_count": len(self.cross_sources),
+            "built_at": self.built_at,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **self.summary(),
+            "shards": [
+                {"shard": shard, "path": path, **self.summaries.get(shard, {})}
+                for shard, path in self.shards.items()
+            ],
+            "loaded_shards": self.loaded_shards(),
+        }
+
+
+def iter_workspaces(cache_dir: Optional[str] = None) -> Iterator[Workspace]:
+    root = workspace_root(cache_dir)
+    if not os.path.isdir(root):
+        return
+    for entry in sorted(os.listdir(root)):
+        workspace = Workspace.load(os.path.join(root, entry), cache_dir)
+        if workspace is not None:
+            yield workspace
@@ -6,6 +6,7 @@ import { Code, Info, Zap, GitBranch, Layers, Search, X, GripVertical } from 'luc
 function App() {
   const [graphData, setGraphData] = useState({ nodes: [], links: [] });
   const [selectedNode, setSelectedNode] = useState(null);
+  const [nodeSource, setNodeSource] = useState(null);
   const [clusters, setClusters] = useState([]);
   const [searchQuery, setSearchQuery] = useState('');
   const [searchResults, setSearchResults] = useState([]);
@@ -24,6 +25,7 @@ function App() {
   useEffect(() => {
     const fetchData = async () => {
         try {
+            // Source code is fetched per node when one is selected (/node/{id}/source)
             const res = await fetch('http://localhost:8005/graph');
             const data = await res.json();
             console.log("Graph data received:", data);
@@ -38,12 +40,70 @@ function App() {
     };
     
     fetchData();
+
+    // Watch mode (POST /watch): apply graph deltas as files change. Without
+    // a watcher the request fails once and the EventSource stays closed.
+    const events = new EventSource('http://localhost:8005/watch/events');
+    events.addEventListener('reload', () => fetchData());
+    events.addEventListener('delta', (e) => {
+      const delta = JSON.parse(e.data);
+      const removed = new Set(delta.nodes.removed);
+      const upserts = new Map([...delta.nodes.added, ...delta.nodes.updated].map(n => [n.id, n]));
+      const endpoint = (end) => (typeof end === 'object' ? end.id : end);
+      const linkKey = (l) => `${endpoint(l.source)}->${endpoint(l.target)}`;
+      const replaced = new Set([...delta.links.removed, ...delta.links.added].map(linkKey));
+
+      setGraphData(prev => {
+        // Existing node objects are updated in place so they keep their layout position
+        const pending = new Map(upserts);
+        const nodes = prev.nodes.filter(n => !removed.has(n.id)).map(n => {
+          const update = pending.get(n.id);
+          pending.delete(n.id);
+          return update ? Object.assign(n, update) : n;
+        });
+        nodes.push(...pending.values());
+        const links = prev.links.filter(l =>
+          !removed.has(endpoint(l.source)) && !removed.has(endpoint(l.target)) && !replaced.has(linkKey(l))
+        );
+        return { nodes, links: links.concat(delta.links.added) };
+      });
+
+      const gone = new Set(delta.clusters.removed);
+      const changed = new Map(delta.clusters.updated.map(c => [c.id, c]));
+      setClusters(prev => {
+        const pending = new Map(changed);
+        const next = prev.filter(c => !gone.has(c.id)).map(c => {
+          const update = pending.get(c.id);
+          pending.delete(c.id);
+          return update ? { ...c, ...update } : c;
+        });
+        return next.concat([...pending.values()]);
+      });
+    });
+    events.onerror = () => {
+      if (events.readyState === EventSource.CLOSED) events.close();
+    };
+    return () => events.close();
   }, []);
 
+  // Source of the selected node only; refetched when an update moves its lines
+  useEffect(() => {
+    if (!selectedNode) return;
+    const controller = new AbortController();
+    setNodeSource(null);
+    fetch(`http://localhost:8005/node/${encodeURIComponent(selectedNode.id)}/source`, { signal: controller.signal })
+      .then(res => (res.ok ? res.json() : null))
+      .then(data => setNodeSource(data?.code ?? ''))
+      .catch(e => {
+        if (e.name !== 'AbortError') setNodeSource('');
+      });
+    return () => controller.abort();
+  }, [selectedNode?.id, selectedNode?.start_line, selectedNode?.end_line]);
+
   const handleQuery = async (text) => {
     const res = await fetch(`http://localhost:8005/query?q=${encodeURIComponent(text)}`, { method: 'POST' });
     const data = await res.json();
-    return data.response;
+    return data.response ?? data.detail;
   };
 
   // Panel resize handlers
@@ -274,7 +334,7 @@ function App() {
                                   className="text-xs text-white/85 font-mono mt-1 p-3 rounded-xl overflow-auto max-h-32"
                                   style={{ background: 'rgba(0,0,0,0.3)', border: '1px solid rgba(255,255,255,0.05)' }}
                                 >
-                                    <code>{selectedNode.code || "// Source not available"}</code>
+                                    <code>{nodeSource === null ? "// Loading..." : nodeSource || "// Source not available"}</code>
                                 </pre>
                             </div>
                         </div>
@@ -0,0 +1,70 @@
+"""
+Benchmark: recall@k and query latency of the ANN index kinds against the
+exact flat index, on synthetic clustered vectors (embedding-like: unit norm,
+grouped around topic centres).
+
+    python -m tools.bench_index [--n 50000] [--dim 384] [--queries 500] [--k 10]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from backend.embeddings.index import INDEX_KINDS, VectorIndex
+
+
+def synthetic(n: int, dim: int, centres: int, rng) -> np.ndarray:
+    topics = rng.standard_normal((centres, dim)).astype(np.float32)
+    data = topics[rng.integers(0, centres, n)] + 0.35 * rng.standard_normal((n, dim)).astype(np.float32)
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+
+def perturbed(data: np.ndarray, n: int, rng) -> np.ndarray:
+    """Queries near stored vectors, as with searches for a variant of existing code."""
+    q = data[rng.integers(0, len(data), n)] + 0.05 * rng.standard_normal((n, data.shape[1])).astype(np.float32)
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def run(kind, ids, data, queries, k, filters=None):
+    index = VectorIndex(data.shape[1], kind)
+    start = time.perf_counter()
+    index.add(ids, data, [{"repo": f"r{i % 4}"} for i in range(len(ids))])
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = [index.search(q, k, filters)[0] for q in queries]
+    latency = (time.perf_counter() - start) / len(queries)
+    return build, latency, [[node_id for node_id, _ in r] for r in results]
+
+
+def recall(results, truth) -> float:
+    hits = sum(len(set(r) & set(t)) for r, t in zip(results, truth))
+    return hits / max(1, sum(len(t) for t in truth))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=50000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--kinds", default=",".join(INDEX_KINDS))
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = synthetic(args.n, args.dim, max(1, args.n // 200), rng)
+    queries = perturbed(data, args.queries, rng)
+    ids = [f"n{i}" for i in range(args.n)]
+    print(f"{args.n} vectors, dim {args.dim}, {args.queries} queries, k={args.k}")
+
+    for filters in (None, {"repo": "r1"}):
+        _, flat_latency, truth = run("flat", ids, data, queries, args.k, filters)
+        print(f"\nfilters={filters}")
+        print(f"{'kind':8} {'build s':>8} {'query ms':>9} {'speedup':>8} {'recall@k':>9}")
+        for kind in args.kinds.split(","):
+            build, latency, results = run(kind, ids, data, queries, args.k, filters)
+            print(f"{kind:8} {build:8.2f} {latency * 1000:9.3f} {flat_latency / latency:7.1f}x {recall(results, truth):9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: query-based JavaParser vs the previous recursive-traversal parser.
+
+    python -m tools.bench_parser [path] [--repeat N]
+"""
+import argparse
+import os
+import time
+
+from tree_sitter import Language, Parser
+import tree_sitter_java
+
+from backend.ingestion import scan_codebase
+from backend.parsing import JavaParser
+
+
+class LegacyJavaParser:
+    """The recursive traverse + per-method re-walk implementation, kept for comparison."""
+
+    def __init__(self):
+        self.JAVA_LANGUAGE = Language(tree_sitter_java.language())
+        self.parser = Parser(self.JAVA_LANGUAGE)
+
+    def parse_file(self, file_path):
+        with open(file_path, "r", encoding="utf-8") as f:
+            code = f.read()
+        tree = self.parser.parse(bytes(code, "utf8"))
+        functions = []
+
+        def traverse(node):
+            if node.type == "method_declaration" or node.type == "constructor_declaration":
+                func_name = "anonymous"
+                for child in node.children:
+                    if child.type == "identifier":
+                        func_name = code[child.start_byte:child.end_byte]
+                        break
+                functions.append({
+                    "name": func_name,
+                    "type": "constructor" if node.type == "constructor_declaration" else "method",
+                    "start_line": node.start_point.row + 1,
+                    "end_line": node.end_point.row + 1,
+                    "code": code[node.start_byte:node.end_byte],
+                    "calls": self._extract_calls_manual(node, code)
+                })
+            for child in node.children:
+                traverse(child)
+
+        traverse(tree.root_node)
+        return functions
+
+    def _extract_calls_manual(self, node, code):
+        calls = []
+        def traverse_calls(n):
+            if n.type == "method_invocation":
+                for child in n.children:
+                    if child.type == "identifier":
+                        calls.append(code[child.start_byte:child.end_byte])
+                        break
+            for child in n.children:
+                traverse_calls(child)
+        traverse_calls(node)
+        return calls
+
+
+def bench(parser, files, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [parser.parse_file(f) for f in files]
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("path", nargs="?", default=os.path.join("test_data", "complex"))
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    files = scan_codebase(args.path, "java")
+    legacy_time, legacy = bench(LegacyJavaParser(), files, args.repeat)
+    query_time, current = bench(JavaParser(), files, args.repeat)
+
+    n_funcs = sum(len(r) for r in current)
+    same_decls = [[(f["name"], f["start_line"], f["end_line"]) for f in r] for r in legacy] == \
+                 [[(f["name"], f["start_line"], f["end_line"]) for f in r] for r in current]
+    print(f"{len(files)} files, {n_funcs} functions, best of {args.repeat} runs")
+    print(f"legacy traversal: {legacy_time * 1000:8.2f} ms")
+    print(f"compiled query:   {query_time * 1000:8.2f} ms  ({legacy_time / query_time:.1f}x)")
+    print(f"identical declarations: {same_decls}")
+
+
+if __name__ == "__main__":
+    main()
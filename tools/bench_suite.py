@@ -0,0 +1,199 @@
+"""
+Scaling benchmark of the analysis stages on synthetic Java corpora
+(see tools/gen_corpus.py), with machine-readable results and a comparison
+mode that flags regressions between two runs.
+
+    python -m tools.bench_suite run --sizes 1000,10000,100000 --out bench.json [--workers 1] [--repeat 3]
+    python -m tools.bench_suite compare base.json bench.json [--threshold 0.15] [--min-seconds 0.05]
+
+Per stage (scan, parse, graph, cluster, clones, embed) and corpus size: median wall
+seconds over --repeat runs, CPU seconds, items/sec, peak Python allocations
+(tracemalloc, with --memory; it slows the stages down) and the process peak RSS
+after the stage. compare exits with status 1 when a stage got slower (or,
+with memory figures on both sides, bigger) by more than the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from backend.ingestion import scan_codebase
+from backend.parsing import ParallelParser
+from backend.graph.builder import GraphBuilder
+from backend.clustering.engine import ClusteringEngine
+from backend.clones.detector import CloneDetector
+from backend.jobs.tracing import cpu_seconds, peak_rss_bytes
+from tools.gen_corpus import generate
+
+def measure(fn, repeat: int, memory: bool):
+    """Runs fn repeat times; returns (last result, stats of the runs)."""
+    walls, cpus, py_peak = [], [], None
+    result = None
+    for _ in range(repeat):
+        if memory:
+            tracemalloc.start()
+        cpu = cpu_seconds()
+        start = time.perf_counter()
+        result = fn()
+        walls.append(time.perf_counter() - start)
+        cpus.append(cpu_seconds() - cpu)
+        if memory:
+            py_peak = max(py_peak or 0, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    return result, {
+        "wall_s": round(statistics.median(walls), 4),
+        "wall_min_s": round(min(walls), 4),
+        "cpu_s": round(statistics.median(cpus), 4),
+        "py_peak_bytes": py_peak,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def embed_stage(graph):
+    """EmbeddingProcessor over every function body, or None without its dependencies."""
+    try:
+        import sentence_transformers  # noqa: F401 (loaded lazily by the processor)
+        from backend.embeddings.processor import EmbeddingProcessor
+    except ImportError as e:
+        print(f"  embed: skipped ({e})", flush=True)
+        return None
+    n = graph.number_of_nodes()
+    bodies = [{"id": graph.node_ids[i], "code": code or "", "file": graph.file_of(i), "cluster": None}
+              for i, code in zip(range(n), graph.sources(range(n)))]
+    return lambda: EmbeddingProcessor().generate_embeddings(bodies)
+
+
+def run_size(methods: int, args) -> list:
+    corpus = os.path.join(args.corpus_dir, f"java-{methods}-s{args.seed}")
+    manifest = generate(corpus, methods, call_density=args.call_density, collisions=args.collisions,
+                        seed=args.seed)
+    print(f"{methods} methods: {manifest['files']} files, {manifest['calls']} calls", flush=True)
+    results = []
+
+    def record(stage, stats, items):
+        wall = stats["wall_s"]
+        results.append({"methods": methods, "stage": stage, "items": items,
+                        "items_per_s": round(items / wall, 1) if wall > 0 else None, **stats})
+        print(f"  {stage:8} {wall:9.3f} s  {stats['cpu_s']:9.3f} cpu s  {items / max(wall, 1e-9):12.0f} items/s", flush=True)
+
+    files, stats = measure(lambda: scan_codebase(corpus, "java"), args.repeat, args.memory)
+    record("scan", stats, len(files))
+
+    parser = ParallelParser(workers=args.workers)
+    parsed, stats = measure(lambda: parser.parse_files(files), args.repeat, args.memory)
+    record("parse", stats, len(files))
+
+    def build():
+        builder = GraphBuilder(root=corpus)
+        builder.build_graph(parsed)
+        return builder.compact()
+    graph, stats = measure(build, args.repeat, args.memory)
+    record("graph", stats, graph.number_of_nodes())
+
+    engine = ClusteringEngine(seed=0)
+    clusters, stats = measure(lambda: engine.cluster_graph(graph), args.repeat, args.memory)
+    record("cluster", stats, graph.number_of_nodes())
+
+    # A fresh detector per run: its per-file signature cache would hide the work
+    _, stats = measure(lambda: CloneDetector(workers=args.workers).detect(graph), args.repeat, args.memory)
+    record("clones", stats, graph.number_of_nodes())
+
+    if args.embed:
+        fn = embed_stage(graph)
+        if fn is not None:
+            _, stats = measure(fn, 1, args.memory)
+            record("embed", stats, graph.number_of_nodes())
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def cmd_run(args):
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        results.extend(run_size(size, args))
+    report = {
+        "meta": {
+            "created_at": time.time(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "params": {k: v for k, v in vars(args).items() if k != "func"},
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"wrote {args.out}")
+
+
+def cmd_compare(args):
+    with open(args.base, encoding="utf-8") as f:
+        base = {(r["methods"], r["stage"]): r for r in json.load(f)["results"]}
+    with open(args.new, encoding="utf-8") as f:
+        new = {(r["methods"], r["stage"]): r for r in json.load(f)["results"]}
+
+    regressions = 0
+    print(f"{'methods':>8} {'stage':8} {'base s':>9} {'new s':>9} {'change':>8}  {'memory':>8}")
+    for key in sorted(base.keys() & new.keys()):
+        b, n = base[key], new[key]
+        change = n["wall_s"] / b["wall_s"] - 1 if b["wall_s"] > 0 else 0.0
+        slower = change > args.threshold and n["wall_s"] - b["wall_s"] > args.min_seconds
+        memory = ""
+        bigger = False
+        if b.get("py_peak_bytes") and n.get("py_peak_bytes"):
+            mem_change = n["py_peak_bytes"] / b["py_peak_bytes"] - 1
+            memory = f"{mem_change:+.0%}"
+            bigger = mem_change > args.threshold
+        flag = "  REGRESSION" if slower or bigger else ""
+        regressions += bool(flag)
+        print(f"{key[0]:8} {key[1]:8} {b['wall_s']:9.3f} {n['wall_s']:9.3f} {change:+8.0%}  {memory:>8}{flag}")
+    for key in sorted(base.keys() ^ new.keys()):
+        print(f"{key[0]:8} {key[1]:8} only in {'base' if key in base else 'new'}")
+    print(f"{regressions} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run")
+    run.add_argument("--sizes", default="1000,10000", help="comma-separated method counts (1k to 500k)")
+    run.add_argument("--out", default="bench.json")
+    run.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "code_arc_corpora"))
+    run.add_argument("--workers", type=int, default=1, help="parse workers (1: serial JavaParser)")
+    run.add_argument("--repeat", type=int, default=1)
+    run.add_argument("--call-density", type=float, default=3.0)
+    run.add_argument("--collisions", type=float, default=0.1)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--memory", action="store_true", help="trace peak Python allocations per stage")
+    run.add_argument("--embed", action="store_true", help="also time EmbeddingProcessor")
+    run.set_defaults(func=cmd_run)
+
+    compare = sub.add_parser("compare")
+    compare.add_argument("base")
+    compare.add_argument("new")
+    compare.add_argument("--threshold", type=float, default=0.15, help="relative slowdown that counts")
+    compare.add_argument("--min-seconds", type=float, default=0.05, help="ignore smaller absolute slowdowns")
+    compare.set_defaults(func=cmd_compare)
+
+    args = ap.parse_args()
+    sys.exit(args.func(args) or 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Deterministic generator of synthetic Java repositories for benchmarks.
+The same parameters and seed always produce byte-identical files.
+
+    python -m tools.gen_corpus OUT --methods 100000 [--call-density 3] [--collisions 0.1] [--seed 0]
+
+Layout: src/main/java/com/synth/p<k>/<Class>.java, methods_per_class methods per
+class, classes_per_package classes per package. Each method makes on average
+call_density calls: most stay in their class, some go to other classes of the
+package (static calls) and cross_package of them through imported, typed
+fields. A share of collisions of the method names come from a small pool
+shared by all classes ("process", "handle", ...), so call resolution sees
+many homonyms, as in real code.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+from typing import Any, Dict, List, Tuple
+
+TOPICS = ("order", "user", "invoice", "payment", "account", "ledger", "report", "audit", "session",
+          "catalog", "cart", "shipment", "stock", "price", "tax", "notify", "auth", "token", "search", "index")
+ROLES = ("Service", "Repository", "Controller", "Validator", "Mapper", "Client", "Handler", "Builder")
+VERBS = ("load", "save", "find", "check", "build", "apply", "compute", "merge", "send", "parse", "render", "sync")
+SHARED_NAMES = ("process", "handle", "update", "validate", "execute", "init", "reset", "refresh")
+
+MANIFEST = "corpus.json"
+
+
+def _plan(methods: int, methods_per_class: int, classes_per_package: int, collisions: float,
+          rng: random.Random) -> List[Tuple[int, str, List[Tuple[str, int]]]]:
+    """[(package index, class name, [(method name, arity)])]"""
+    classes = []
+    n_classes = max(1, -(-methods // methods_per_class))
+    for c in range(n_classes):
+        package = c // classes_per_package
+        topic = TOPICS[package % len(TOPICS)]
+        name = f"{topic.capitalize()}{rng.choice(ROLES)}{c}"
+        count = min(methods_per_class, methods - c * methods_per_class)
+        members = []
+        used = set()
+        for m in range(count):
+            if rng.random() < collisions:
+                method = rng.choice(SHARED_NAMES)
+            else:
+                method = f"{rng.choice(VERBS)}{topic.capitalize()}{m}"
+            if method in used:
+                method = f"{method}{m}"
+            used.add(method)
+            members.append((method, rng.randint(0, 2)))
+        classes.append((package, name, members))
+    return classes
+
+
+def _args(arity: int) -> str:
+    return ", ".join(f"a{i}" for i in range(arity))
+
+
+def _params(arity: int) -> str:
+    return ", ".join(f"int a{i}" for i in range(arity))
+
+
+def generate(root: str, methods: int, methods_per_class: int = 12, classes_per_package: int = 25,
+             call_density: float = 3.0, collisions: float = 0.1, cross_package: float = 0.15,
+             seed: int = 0) -> Dict[str, Any]:
+    """
+    Writes the corpus under root (replacing it) and returns its manifest.
+    An existing corpus with the same parameters is reused as is.
+    """
+    params = {"methods": methods, "methods_per_class": methods_per_class,
+              "classes_per_package": classes_per_package, "call_density": call_density,
+              "collisions": collisions, "cross_package": cross_package, "seed": seed}
+    try:
+        with open(os.path.join(root, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("params") == params:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    shutil.rmtree(root, ignore_errors=True)
+
+    rng = random.Random(seed)
+    classes = _plan(methods, methods_per_class, classes_per_package, collisions, rng)
+    by_package: Dict[int, List[int]] = {}
+    for c, (package, _, _) in enumerate(classes):
+        by_package.setdefault(package, []).append(c)
+
+    calls_total = 0
+    for c, (package, name, members) in enumerate(classes):
+        peers = by_package[package]
+        # Typed fields to classes of other packages, used for cross-package calls
+        foreign = [f for f in (rng.randrange(len(classes)) for _ in range(2)) if classes[f][0] != package]
+        lines = [f"package com.synth.p{package};", ""]
+        lines += [f"import com.synth.p{classes[f][0]}.{classes[f][1]};" for f in foreign]
+        lines += ["", f"public class {name} {{"]
+        lines += [f"    private {classes[f][1]} dep{k};" for k, f in enumerate(foreign)]
+
+        for method, arity in members:
+            body = []
+            for _ in range(int(rng.expovariate(1.0 / call_density)) if call_density > 0 else 0):
+                roll = rng.random()
+                if roll < cross_package and foreign:
+                    k = rng.randrange(len(foreign))
+                    target, target_arity = rng.choice(classes[foreign[k]][2])
+                    call = f"dep{k}.{target}({_args(target_arity)});"
+                elif roll < cross_package + 0.25 and len(peers) > 1:
+                    other = classes[rng.choice(peers)]
+                    target, target_arity = rng.choice(other[2])
+                    call = f"{other[1]}.{target}({_args(target_arity)});"
+                else:
+                    target, target_arity = rng.choice(members)
+                    call = f"{target}({_args(target_arity)});"
+                calls_total += 1
+                # Some branching, so complexity varies
+                if rng.random() < 0.3:
+                    body.append(f"        if (a0 > {rng.randint(0, 9)}) {{ {call} }}" if arity else
+                                f"        for (int i = 0; i < {rng.randint(1, 9)}; i++) {{ {call} }}")
+                else:
+                    body.append(f"        {call}")
+            lines.append(f"    public static void {method}({_params(arity)}) {{")
+            lines += body
+            lines.append("    }")
+        lines.append("}")
+
+        directory = os.path.join(root, "src", "main", "java", "com", "synth", f"p{package}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{name}.java"), "w", encoding="utf-8", newline="\n") as f:
+            f.write("\n".join(lines) + "\n")
+
+    manifest = {"params": params, "files": len(classes), "packages": len(by_package),
+                "methods": sum(len(m) for _, _, m in classes), "calls": calls_total}
+    with open(os.path.join(root, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("out")
+    ap.add_argument("--methods", type=int, default=10000)
+    ap.add_argument("--methods-per-class", type=int, default=12)
+    ap.add_argument("--classes-per-package", type=int, default=25)
+    ap.add_argument("--call-density", type=float, default=3.0, help="mean calls per method")
+    ap.add_argument("--collisions", type=float, default=0.1, help="share of methods with a shared name")
+    ap.add_argument("--cross-package", type=float, default=0.15, help="share of calls to other packages")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    manifest = generate(args.out, args.methods, args.methods_per_class, args.classes_per_package,
+                        args.call_density, args.collisions, args.cross_package, args.seed)
+    print(json.dumps(manifest, indent=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import requests
 import os
+import time
 
 BASE_URL = "http://localhost:8005"
 TEST_DATA_PATH = os.path.abspath("test_data/demo")
@@ -12,7 +13,16 @@ def trigger_analysis():
             "language": "java"
         })
         response.raise_for_status()
-        print("Analysis Result:", response.json())
+        job_id = response.json()["job_id"]
+        print(f"Submitted job {job_id}")
+
+        # Analysis runs in the background; poll until it finishes
+        while True:
+            job = requests.get(f"{BASE_URL}/jobs/{job_id}").json()
+            if job["status"] not in ("QUEUED", "RUNNING"):
+                break
+            time.sleep(0.5)
+        print("Analysis Result:", job["status"], job["result"] or job["error"])
         
         # Check graph
         graph_res = requests.get(f"{BASE_URL}/graph")